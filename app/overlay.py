@@ -0,0 +1,148 @@
+import json
+import numpy as np
+import streamlit as st
+import streamlit.components.v1 as components
+from typing import Any, Dict, Optional, Tuple
+from lib import results
+from lib.car_counter import CarCounter
+from lib.counting import PASS_COLORS
+from lib.zones import to_px
+
+# boxes enviadas ao navegador por vez (~30 bytes de JSON cada): acima disso o
+# overlay vai em trechos, não o vídeo inteiro a cada rerun
+MAX_ROWS = 100_000
+
+# O vídeo original é exibido pelo st.video e um canvas sobre ele (na página,
+# fora do iframe do componente) desenha linha, semáforo e boxes do frame atual.
+_SCRIPT = """
+<script>
+const D   = %s;
+const doc = window.parent.document;
+const video = doc.querySelector('video[data-testid="stVideo"]') || doc.querySelector('video');
+if (video) {
+    const old = doc.getElementById('traffic-overlay');
+    if (old) old.remove();
+    const canvas = doc.createElement('canvas');
+    canvas.id = 'traffic-overlay';
+    Object.assign(canvas.style, {position: 'absolute', pointerEvents: 'none'});
+    video.parentElement.style.position = 'relative';
+    video.parentElement.appendChild(canvas);
+    const ctx = canvas.getContext('2d');
+
+    const lower = (x) => {
+        let lo = 0, hi = D.f.length;
+        while (lo < hi) { const m = (lo + hi) >> 1; if (D.f[m] < x) lo = m + 1; else hi = m; }
+        return lo;
+    };
+
+    const draw = () => {
+        if (!canvas.isConnected) return;
+        const cw = video.clientWidth, ch = video.clientHeight;
+        if (canvas.width !== cw || canvas.height !== ch) { canvas.width = cw; canvas.height = ch; }
+        canvas.style.left = video.offsetLeft + 'px';
+        canvas.style.top  = video.offsetTop + 'px';
+        ctx.clearRect(0, 0, cw, ch);
+
+        // object-fit: contain
+        const s  = Math.min(cw / D.W, ch / D.H);
+        const ox = (cw - D.W * s) / 2, oy = (ch - D.H * s) / 2;
+        const frame = Math.floor(video.currentTime * D.fps + 1e-6);
+        const green = D.cycle > 0 && (Math.floor(frame / D.fps) %% D.cycle) < D.green;
+
+        ctx.lineWidth   = 2;
+        ctx.strokeStyle = green ? 'rgb(0,255,0)' : 'rgb(255,0,0)';
+        ctx.beginPath();
+        ctx.moveTo(ox + D.line[0] * s, oy + D.line[1] * s);
+        ctx.lineTo(ox + D.line[2] * s, oy + D.line[3] * s);
+        ctx.stroke();
+
+        ctx.font = '12px sans-serif';
+        ctx.strokeStyle = ctx.fillStyle = 'rgb(0,255,255)';
+        for (const z of D.zones) {
+            ctx.beginPath();
+            z.points.forEach(([x, y], i) => i ? ctx.lineTo(ox + x * s, oy + y * s) : ctx.moveTo(ox + x * s, oy + y * s));
+            if (z.points.length > 2) ctx.closePath();
+            ctx.stroke();
+            ctx.fillText(z.name, ox + z.points[0][0] * s, oy + z.points[0][1] * s);
+        }
+        if (frame < D.f0 || frame >= D.f1) {
+            // fora do trecho enviado: só linha e zonas, e um aviso
+            ctx.fillStyle = 'rgb(255,255,0)';
+            ctx.fillText(D.note, ox + 8, oy + 16);
+        }
+        for (let i = lower(frame), end = lower(frame + 1); i < end; i++) {
+            const b = D.b.slice(6 * i, 6 * i + 6);
+            ctx.strokeStyle = ctx.fillStyle = D.colors[b[5] + 1];
+            ctx.strokeRect(ox + b[0] * s, oy + b[1] * s, (b[2] - b[0]) * s, (b[3] - b[1]) * s);
+            ctx.fillText('ID' + b[4], ox + b[0] * s, oy + b[1] * s - 4);
+        }
+        window.requestAnimationFrame(draw);
+    };
+    window.requestAnimationFrame(draw);
+}
+</script>
+"""
+
+def _css(bgr) -> str:
+    b, g, r = bgr
+    return f"rgb({r},{g},{b})"
+
+def _clock(seconds: float) -> str:
+    m, s = divmod(int(seconds), 60)
+    return f"{m // 60}:{m % 60:02d}:{s:02d}" if m >= 60 else f"{m}:{s:02d}"
+
+def _window(info: Dict[str, int], fps: float) -> Optional[Tuple[int, int]]:
+    """
+    Trecho [f0, f1) de frames enviado ao navegador: None (o vídeo inteiro)
+    se cabe em MAX_ROWS boxes; senão, trechos de minutos inteiros com
+    ~MAX_ROWS boxes em média, escolhidos na página.
+    """
+    frames = info["frames"]
+    if info["rows"] <= MAX_ROWS:
+        return None
+    per_s  = info["rows"] / max(frames, 1) * fps
+    span   = int(max(60, MAX_ROWS / per_s // 60 * 60) * fps)
+    starts = list(range(0, frames, span))
+    f0 = st.select_slider("Trecho com anotações", starts, format_func=lambda f: _clock(f / fps))
+    return f0, min(f0 + span, frames)
+
+def overlay_video(video: str, result_path: str, meta: Dict[str, Any], config: Dict[str, Any]):
+    """
+    Vídeo original com as anotações do modo overlay desenhadas no navegador.
+    Vídeos longos vão em trechos (só as boxes do trecho são lidas e enviadas),
+    e o vídeo começa no início do trecho.
+    """
+    info = results.overlay_info(result_path)
+    fps  = meta.get("fps")
+    if info is None or not meta.get("width") or not fps:
+        st.video(video)
+        return
+    window  = _window(info, fps)
+    overlay = results.load_overlay(result_path, window)
+    f0, f1  = window or (0, np.iinfo(np.int32).max)
+    if len(overlay) > MAX_ROWS:
+        # trecho denso demais mesmo assim: corta no frame da MAX_ROWS-ésima box
+        f1 = int(overlay["frame"].sort_values(kind="stable").iloc[MAX_ROWS])
+        overlay = overlay[overlay["frame"] < f1]
+    st.video(video, start_time=int(f0 / fps))
+    if window is not None:
+        st.caption(f"Anotações de {_clock(f0 / fps)} a {_clock(f1 / fps)}.")
+
+    W, H   = meta["width"], meta["height"]
+    p1, p2 = CarCounter._compute_line(config["points"], W, H)
+    overlay = overlay.sort_values("frame", kind="stable")
+    data = {
+        "fps": fps, "W": W, "H": H,
+        "f0": f0, "f1": f1,
+        "note": f"Anotações só de {_clock(f0 / fps)} a {_clock(f1 / fps)}",
+        "line": [*p1, *p2],
+        "cycle": config["green_duration"] + config["red_duration"],
+        "green": config["green_duration"],
+        "colors": [_css(c) for c in PASS_COLORS],
+        "zones": [{"name": str(z["name"]), "points": to_px(z["points"], W, H).tolist()}
+                  for z in config.get("zones") or []],
+        # colunar: frame de cada box e [x1,y1,x2,y2,id,pass] achatado
+        "f": overlay["frame"].tolist(),
+        "b": overlay[["x1", "y1", "x2", "y2", "id", "pass"]].to_numpy(np.int64).ravel().tolist(),
+    }
+    components.html(_SCRIPT % json.dumps(data, separators=(",", ":")), height=0)
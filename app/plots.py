@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-from typing import List
+from typing import Dict, List, Optional
 from lib.utils import infos
+from lib import rollups as rollups_
 
 color_mapping = {
     'detected': '#1f77b4',
@@ -26,15 +27,19 @@ order_mapping = {
     'red_total': 0
 }
 
-def plot_traffic_data_total(df: pd.DataFrame, total_columns: List[str]):
+def plot_traffic_data_total(df: pd.DataFrame, total_columns: List[str],
+                            rollups: Optional[Dict[str, pd.DataFrame]] = None):
     if not total_columns:
         st.warning("Nenhuma coluna de totais selecionada para visualização")
         
     total_columns_ordered = sorted(total_columns, key=lambda x: order_mapping[x], reverse=True)
     
+    # no máximo rollups_.MAX_POINTS pontos, enviados uma única vez para todas as camadas
+    data = rollups_.for_area(df, rollups or {})[['time', *total_columns_ordered]]
+    
     charts = []
     for col in total_columns_ordered:
-        chart = alt.Chart(df).mark_area(
+        chart = alt.Chart().mark_area(
             opacity=0.6,
             line=True
         ).encode(
@@ -44,7 +49,7 @@ def plot_traffic_data_total(df: pd.DataFrame, total_columns: List[str]):
         )
         charts.append(chart)
     
-    area_chart = alt.layer(*charts).properties(
+    area_chart = alt.layer(*charts, data=data).properties(
         width=700,
         height=400,
         title='Dados de Tráfego Acumulados'
@@ -68,27 +73,36 @@ def plot_traffic_data_total(df: pd.DataFrame, total_columns: List[str]):
     
     st.altair_chart(combined_chart, use_container_width=True)      
 
-def plot_traffic_data_total_instant(df: pd.DataFrame, instant_columns: List[str]):
+def plot_traffic_data_total_instant(df: pd.DataFrame, instant_columns: List[str],
+                                    rollups: Optional[Dict[str, pd.DataFrame]] = None):
     if not instant_columns:
         st.warning("Nenhuma coluna instantânea selecionada para visualização")
         return
     instant_columns_ordered = sorted(instant_columns, key=lambda x: order_mapping[x], reverse=True)
     
+    # resolução mais fina que cabe em rollups_.MAX_POINTS barras
+    data, label = rollups_.for_bars(df, rollups or {})
+    spans = 'end' in data.columns
+    data  = data[['time', *(['end'] if spans else []), *instant_columns_ordered]]
+    
     charts = []
     for col in instant_columns_ordered:
-        chart = alt.Chart(df).mark_bar(
-            opacity=0.8
-        ).encode(
+        encoding = dict(
             x=alt.X('time:Q', title='Tempo (segundos)'),
-            y=alt.Y(f'{col}:Q', title='Por segundo'),
+            y=alt.Y(f'{col}:Q', title=f'Por {label.lower()}'),
             color=alt.value(color_mapping[col])
         )
+        if spans:
+            encoding['x2'] = alt.X2('end:Q')
+        chart = alt.Chart().mark_bar(
+            opacity=0.8
+        ).encode(**encoding)
         charts.append(chart)
     
-    bar_chart = alt.layer(*charts).properties(
+    bar_chart = alt.layer(*charts, data=data).properties(
         width=700,
         height=400,
-        title='Dados de Tráfego por Segundo'
+        title=f'Dados de Tráfego por {label}'
     ).interactive()
     
     legend_data = pd.DataFrame({
@@ -1,39 +1,60 @@
 import streamlit as st
-from lib.car_counter import CarCounter
-from lib import utils
+from lib import utils, results
 import os
-import uuid
-from app.utils import redirect
 import json
+from app.utils import redirect, load_counter, model_status, cache_status, get_job_queue, job_status, active_jobs
 from lib.utils import infos
 
-video_path = None
+zones_example = """[
+    {"name": "Faixa 1", "points": [[0.20, 0.70], [0.50, 0.70]]},
+    {"name": "Cruzamento", "points": [[0.40, 0.30], [0.70, 0.30], [0.70, 0.60], [0.40, 0.60]]}
+]"""
+
+output_modes = {"full": "Completo", "preview": "Prévia", "events": "Eventos", "overlay": "Sobreposição"}
+
+profile_modes = {None: "Desligado", "timers": "Etapas", "cprofile": "Etapas + cProfile"}
 
-#FIXME: Redirect to results page after processing
 redirect()
 
 def free_video_file():
-    if video_path is not None:
-        try:
-            os.remove(video_path)
-        except Exception as e:
-            print(f"Error deleting temporary file: {e}")
+    # upload anterior desta sessão: vídeo e miniatura em .uploads/
+    upload = st.session_state.pop("upload", None)
+    if upload is not None:
+        for path in (upload["path"], os.path.splitext(upload["path"])[0] + ".jpg"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error deleting temporary file: {e}")
 
 st.title("Novo Processamento de Video 📹")
 
-cc = CarCounter(model_path='yolov8n.pt', verbose=1, streamlit=True)
+cc = load_counter()
+model_status(cc)
+cache_status()
+
+jobs = get_job_queue()
+
+# job acompanhado por esta sessão; o query param sobrevive a recarregar a página
+job_id = st.session_state.get("job") or st.query_params.get("job")
+if job_id:
+    job_status(jobs, job_id)
+active_jobs(jobs)
 
 video_file = st.file_uploader("Escolha um arquivo de vídeo", type=["mp4"], on_change=free_video_file)
 
 if video_file is not None:
-    process_id = str(uuid.uuid4())
+    # gravado em disco uma única vez por upload; os reruns (sliders) reaproveitam
+    # o arquivo e a miniatura em memória, sem reler nem decodificar o vídeo
+    upload = st.session_state.get("upload")
+    if upload is None or upload["file_id"] != video_file.file_id or not os.path.exists(upload["path"]):
+        path   = utils.store_upload(video_file)
+        upload = {"file_id": video_file.file_id, "path": path, "image": utils.preview_frame(path)}
+        st.session_state["upload"] = upload
     
-    video_path = f".temp/{process_id}.mp4"
-    
-    with open(video_path, "wb") as f:
-        f.write(video_file.read())
-    
-    image = utils.select_random_frame(video_path)
+    video_path = upload["path"]
+    image      = upload["image"]
     
     main_cols = st.columns(2)
     
@@ -51,10 +72,34 @@ if video_file is not None:
         
         points = ((x1, y1), (x2, y2))
         
+        # ROI
+        use_roi = sett_cols[0].toggle("Recortar Região (ROI)", value=False, help=infos["roi"])
+        roi = None
+        if use_roi:
+            roi_x = sett_cols[0].slider("ROI X", min_value=0.0, max_value=1.0, value=(0.0, 1.0))
+            roi_y = sett_cols[0].slider("ROI Y", min_value=0.0, max_value=1.0, value=(0.30, 0.80))
+            roi = ((roi_x[0], roi_y[0]), (roi_x[1], roi_y[1]))
+        
+        # Zonas
+        use_zones = sett_cols[0].toggle("Zonas Adicionais", value=False, help=infos["zones"])
+        zones = []
+        if use_zones:
+            zones_text = sett_cols[0].text_area("Zonas (JSON)", value=zones_example, height=200)
+            try:
+                zones = json.loads(zones_text)
+                assert all(len(z["points"]) >= 2 for z in zones)
+            except Exception:
+                sett_cols[0].error('Use uma lista [{"name": ..., "points": [[x, y], ...]}] com ao menos 2 pontos por zona.')
+                zones = []
+        
         # Tracker Config
         conf = sett_cols[1].slider("Confiança", min_value=0.0, max_value=1.0, value=0.25, help=infos["conf"])
         iou  = sett_cols[1].slider("IOU", min_value=0.0, max_value=1.0, value=0.45, help=infos["iou"])
         tracker_model = sett_cols[1].selectbox("Modelo de Tracker", ["botsort", "bytetrack"], index=0, help=infos["tracker_model"])
+        output_mode = sett_cols[1].selectbox("Vídeo de Saída", list(output_modes), index=0,
+                                             format_func=output_modes.get, help=infos["output_mode"])
+        profile = sett_cols[1].selectbox("Perfil de Desempenho", list(profile_modes), index=0,
+                                         format_func=profile_modes.get, help=infos["profile"])
         
         # Extra
         sett_cols[2].info("Defina o intervalo de tempo em segundos para o sinal verde e vermelho.")
@@ -63,38 +108,25 @@ if video_file is not None:
         process_btn = sett_cols[2].button("Processar Video", type="primary")
         
         if process_btn:
-            process_id = f"{str(len(os.listdir(".videos")) + 1).zfill(2)} {video_name}"
+            process_id = results.next_result_id(video_name)
+            config = results.load_config(
+                points=points,
+                roi=roi,
+                conf=conf,
+                iou=iou,
+                tracker_model=tracker_model,
+                green_duration=green_duration,
+                red_duration=red_duration,
+                output_mode=output_mode,
+                zones=zones,
+                profile=profile
+            )
             
-            os.makedirs(f".videos/{process_id}", exist_ok=True)
-            with st.spinner("Processando..."):
-                output = f".videos/{process_id}/video.mp4"
-                df, stats, video_out = cc.process(
-                    video_path,
-                    points,
-                    output=output,
-                    conf=conf,
-                    iou=iou,
-                    tracker_model=tracker_model, # type:ignore
-                    green_duration=green_duration,
-                    red_duration=red_duration
-                )
-                df.to_csv(f".videos/{process_id}/detections.csv", index=False)
-                stats.to_csv(f".videos/{process_id}/stats.csv", index=False)
-                
-                with open(f".videos/{process_id}/config.json", "w") as f:
-                    json.dump({
-                        "points": points,
-                        "conf": conf,
-                        "iou": iou,
-                        "tracker_model": tracker_model,
-                        "green_duration": green_duration,
-                        "red_duration": red_duration
-                    }, f, indent=4)
-                
-                st.success("Processamento concluído!")
-                st.balloons()
-                st.session_state["redirect"] = process_id
-                st.rerun()
+            os.makedirs(f"{results.RESULTS_DIR}/{process_id}", exist_ok=True)
+            job_id = jobs.submit(video_path, process_id, config)
+            st.session_state["job"] = job_id
+            st.query_params["job"] = job_id
+            st.rerun()
                         
     with main_cols[0]:
-        st.image(utils.plot_line_image(image,points), caption="Frame Selecionado", use_container_width=False)
\ No newline at end of file
+        st.image(utils.plot_line_image(image,points,roi,zones), caption="Frame Selecionado", use_container_width=False)
\ No newline at end of file
@@ -1,8 +1,8 @@
 import streamlit as st
-import pandas as pd # type:ignore
-from app.utils import get_column_ratios, dowload_container
+from app.utils import get_column_ratios, dowload_container, recount_panel, profile_panel
 from app.plots import plot_traffic_data_total, plot_traffic_data_total_instant, show_metrics
-import json
+from app.overlay import overlay_video
+from lib import results
 
 total_columns = ['detected_total', 'green_total', 'red_total', 'passed_total']
 instant_columns = ['detected', 'green', 'red', 'passed']
@@ -13,16 +13,39 @@ def show_results(video_id, path="videos"):
     
     st.title("Resultados")
     
-    df_stats = pd.read_csv(f"{result_path}/stats.csv")
+    # meta.json, stats e rollups vêm do cache enquanto os arquivos não mudam
+    meta     = results.read_meta(result_path)
+    config   = meta["config"]
+    df_stats = results.load_stats(result_path)
     
-    cols = st.columns(get_column_ratios(f"{result_path}/video.mp4"))
+    cols = st.columns(get_column_ratios(meta["width"], meta["height"]))
     
     with cols[0]:
-        st.video(f"{result_path}/video.mp4")
+        # overlay: vídeo original, anotado no navegador; events: só os trechos com passagens
+        events = results.load_events(result_path)
+        if results.overlay_info(result_path) is not None:
+            overlay_video(f"{result_path}/video.mp4", result_path, meta, config)
+        else:
+            st.video(f"{result_path}/video.mp4")
+        if meta.get("video_stale"):
+            st.caption("Vídeo gerado com a configuração anterior à última recontagem.")
+        if events is not None:
+            st.caption(f"{len(events)} trechos com passagens: " + ", ".join(
+                f"{int(e['start'])//60}:{int(e['start'])%60:02d}" for e in events))
     
     with cols[1]:
-        with open(f"{result_path}/config.json", "r") as f:
-            config = json.load(f)
+        rollups = results.load_rollups(result_path, config, df_stats)
+        
+        # zonas extras: os mesmos gráficos, com as estatísticas da zona escolhida
+        zone_stats = results.load_zone_stats(result_path)
+        zones      = config.get("zones") or []
+        if zone_stats is not None and zones:
+            options = [-1, *range(len(zones))]
+            zone = st.selectbox("Zona", options, format_func=lambda z: "Linha principal" if z < 0 else zones[z]["name"])
+            if zone >= 0:
+                df_stats = zone_stats[zone_stats["zone"] == zone].drop(columns="zone").reset_index(drop=True)
+                rollups  = results.load_zone_rollups(result_path, config, zone)
+        
         show_metrics(df_stats, config)
         
         tab1, tab2 = st.tabs(["Valores Totais", "Valores por Segundo"])
@@ -30,14 +53,16 @@ def show_results(video_id, path="videos"):
         with tab1:
             selected_total = st.multiselect(
                 "Colunas Totais Para Visualização", total_columns, default=total_columns)
-            plot_traffic_data_total(df_stats, selected_total)
+            plot_traffic_data_total(df_stats, selected_total, rollups)
         
         with tab2:
             selected_instant = st.multiselect(
                 "Colunas Instantâneas Para Visualização", instant_columns, default=instant_columns)
-            plot_traffic_data_total_instant(df_stats, selected_instant)
+            plot_traffic_data_total_instant(df_stats, selected_instant, rollups)
             
     with cols[2]:
         dowload_container(result_path, hortizontal=False)
+        recount_panel(result_path, meta)
+        profile_panel(result_path)
         
         
\ No newline at end of file
@@ -1,7 +1,85 @@
 # Em app/utils.py:
 import streamlit as st
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
 import cv2
+import json
+import os
+import time
+import pandas as pd # type:ignore
+from lib.car_counter import CarCounter
+from lib.models import registry
+from lib.jobs import JobQueue
+from lib import recount, results, tracks
+
+MODEL_PATH = 'yolov8n.pt'
+
+def load_counter(model_path: str = MODEL_PATH) -> CarCounter:
+    """
+    CarCounter leve a cada rerun; o modelo vem do registro do processo e é
+    carregado e aquecido uma única vez, compartilhado entre reruns e sessões.
+    """
+    if not registry.stats:
+        with st.spinner("Carregando modelo..."):
+            return CarCounter(model_path=model_path, verbose=1, streamlit=True, shared=True)
+    return CarCounter(model_path=model_path, verbose=1, streamlit=True, shared=True)
+
+def model_status(cc: CarCounter, model_path: str = MODEL_PATH):
+    stats = registry.stats.get((model_path, cc.device, cc.fp16))
+    if stats is not None:
+        st.caption(f"Modelo `{model_path}` ({cc.device}) carregado em {stats['load_s']:.2f}s · "
+                   f"reutilizado {int(stats['hits'])}x")
+
+def cache_status(tracks_dir: str = tracks.TRACKS_DIR):
+    metrics = tracks.load_metrics(tracks_dir)
+    if metrics:
+        used = sum(size for size, _ in tracks.usage(tracks_dir).values())
+        st.caption(f"Cache de detecções: {metrics.get('hits', 0)} acertos · {metrics.get('resumes', 0)} retomadas · "
+                   f"{metrics.get('misses', 0)} faltas · {used/1e6:.0f} de {tracks.MAX_BYTES/1e6:.0f} MB")
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    """
+    Fila de processamentos única por servidor, com workers em segundo plano.
+    """
+    return JobQueue(model_path=MODEL_PATH).start()
+
+def _format_progress(job: dict) -> str:
+    done, total = job['frames_done'], job['frames_total']
+    eta = f" · ETA {int(job['eta'])//60}min {int(job['eta'])%60:02d}s" if job['eta'] is not None else ""
+    return f"{done}/{total or '?'} frames · {job['fps']:.1f} frames/s{eta}"
+
+@st.fragment(run_every=1.0)
+def job_status(jobs: JobQueue, job_id: str):
+    """
+    Acompanha um job; ao concluir redireciona para a página de resultados.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        st.session_state.pop("job", None)
+        st.query_params.pop("job", None)
+        return
+
+    if job['status'] == 'queued':
+        st.info(f"Vídeo {job['result_id']} na fila ({jobs.position(job_id)} à frente)...")
+    elif job['status'] == 'running':
+        total = job['frames_total'] or 1
+        st.progress(min(job['frames_done'] / total, 1.0), text=f"Processando {job['result_id']}: {_format_progress(job)}")
+    else:
+        st.session_state.pop("job", None)
+        st.query_params.pop("job", None)
+        if job['status'] == 'done':
+            st.session_state["redirect"] = job['result_id']
+            st.rerun()
+        else:
+            st.error(f"Falha ao processar {job['result_id']}: {job['error']}")
+
+def active_jobs(jobs: JobQueue):
+    pending = jobs.list()
+    if pending:
+        with st.sidebar:
+            st.subheader("Processamentos")
+            for job in pending:
+                st.caption(f"{job['result_id']} · {'na fila' if job['status'] == 'queued' else _format_progress(job)}")
 
 def redirect():
     try:
@@ -26,9 +104,10 @@ def get_video_dimensions(video_path: str) -> Tuple[int, int]:
     cap.release()
     return width, height
 
-def get_column_ratios(video_path: str) -> List[int]:
+def get_column_ratios(width: Optional[int], height: Optional[int]) -> List[int]:
 
-    width, height = get_video_dimensions(video_path)
+    if not width or not height:
+        return [2, 2, 1]
     aspect_ratio = width / height
     
     if aspect_ratio < 0.8:
@@ -36,25 +115,109 @@ def get_column_ratios(video_path: str) -> List[int]:
     
     return [2, 2, 1]
             
+def _file_reader(path: str) -> Callable[[], bytes]:
+    # lido só quando o usuário clica, não a cada rerun
+    def read() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
 def dowload_container(result_path, hortizontal=True):
     downloads = [
         {"icon" : "📹" , "ext" : ".mp4",  "label" : "Download Video (mp4)", "path" : f"{result_path}/video.mp4"},
-        {"icon" : "🔎" , "ext" : ".csv",  "label" : "Download Detecções (csv)", "path" : f"{result_path}/detections.csv"},
-        {"icon" : "📊" , "ext" : ".csv",  "label" : "Download Estatísticas (csv)", "path" : f"{result_path}/stats.csv"},
+        {"icon" : "🔎" , "ext" : ".csv",  "label" : "Download Detecções (csv)", "path" : f"{result_path}/detections.csv", "name" : "detections"},
+        {"icon" : "📊" , "ext" : ".csv",  "label" : "Download Estatísticas (csv)", "path" : f"{result_path}/stats.csv", "name" : "stats"},
+        {"icon" : "🗃️" , "ext" : ".parquet", "label" : "Download Detecções (parquet)", "path" : f"{result_path}/detections.parquet"},
+        {"icon" : "🖼️" , "ext" : ".parquet", "label" : "Download Sobreposição (parquet)", "path" : f"{result_path}/video.overlay.parquet"},
         {"icon" : "⚙️" , "ext" : ".json", "label" : "Download Configuração (json)", "path" : f"{result_path}/config.json"},
     ]
+    # CSVs só existem em pastas antigas ou depois de exportados
+    downloads = [d for d in downloads if "name" in d or os.path.exists(d["path"])]
     
     cols = st.columns(len(downloads) if hortizontal else 1)
     
     for i, download in enumerate(downloads):
         with cols[i if hortizontal else 0]:
+            if "name" in download and not results.csv_ready(result_path, download["name"]):
+                if st.button(download["label"].replace("Download", "Exportar"), icon=download["icon"],
+                             use_container_width=True, key=f"export_{download['name']}"):
+                    with st.spinner("Exportando CSV..."):
+                        results.export_csv(result_path, download["name"])
+                    st.rerun()
+                continue
             st.download_button(
                 label=download["label"],
-                data=open(download["path"], "rb"),
+                data=_file_reader(download["path"]),
                 file_name=download["label"].replace(" ", "_").lower() + download["ext"],
                 mime="application/octet-stream",
                 use_container_width=True,
                 icon=download["icon"],
             )
-    
-    
\ No newline at end of file
+
+def recount_panel(result_path: str, meta: dict):
+    """
+    Nova linha/semáforo/zonas para o resultado, recontados a partir dos
+    tracks em cache, sem rodar o modelo.
+    """
+    with st.expander("Recontar"):
+        if not tracks.exists(meta.get("tracks")):
+            st.caption("Sem tracks em cache para este resultado: processe o vídeo novamente.")
+            return
+        config = meta["config"]
+        (x1, y1), (x2, y2) = config["points"]
+        x1 = st.slider("Ponto 1 X", 0.0, 1.0, float(x1), key="recount_x1")
+        y1 = st.slider("Ponto 1 Y", 0.0, 1.0, float(y1), key="recount_y1")
+        x2 = st.slider("Ponto 2 X", 0.0, 1.0, float(x2), key="recount_x2")
+        y2 = st.slider("Ponto 2 Y", 0.0, 1.0, float(y2), key="recount_y2")
+        green = st.slider("Duração Sinal Verde", 0, 40, int(config["green_duration"]), key="recount_green")
+        red   = st.slider("Duração Sinal Vermelho", 0, 40, int(config["red_duration"]), key="recount_red")
+        zones_text = st.text_area("Zonas (JSON)", value=json.dumps(config.get("zones") or []), key="recount_zones")
+
+        with open(tracks.meta_path(meta["tracks"]), "r") as f:
+            source = recount.source_video(result_path, json.load(f), config)
+        render = st.checkbox("Regerar vídeo", value=False, disabled=source is None,
+                             help="Redesenha o vídeo com a nova configuração (decodifica o vídeo, sem inferência)."
+                                  if source else "Vídeo original indisponível.")
+
+        if st.button("Recontar", icon="🔁", use_container_width=True):
+            try:
+                zones = json.loads(zones_text)
+                assert all(len(z["points"]) >= 2 for z in zones)
+            except Exception:
+                st.error('Use uma lista [{"name": ..., "points": [[x, y], ...]}] com ao menos 2 pontos por zona.')
+                return
+            t0 = time.perf_counter()
+            with st.spinner("Recontando..."):
+                recount.recount(result_path, ((x1, y1), (x2, y2)), green, red, zones, render_video=render)
+            st.toast(f"Recontado em {time.perf_counter() - t0:.1f}s")
+            st.rerun()
+
+
+def profile_panel(result_path: str):
+    """
+    Tempo por etapa, contadores e memória da execução (profile.json), se perfilada.
+    """
+    profile = results.load_profile(result_path)
+    if profile is None:
+        return
+    with st.expander("Perfil de Desempenho"):
+        st.caption(f"{profile['frames']} frames em {profile['wall_s']:.1f}s · {profile['fps']:.1f} frames/s")
+        stages = pd.DataFrame([
+            {"Etapa": name, "ms/frame": stage["ms_per_frame"], "Chamadas": stage["calls"], "% do tempo": 100 * stage["share"]}
+            for name, stage in sorted(profile["stages"].items())
+        ])
+        st.dataframe(stages, hide_index=True, use_container_width=True,
+                     column_config={"ms/frame": st.column_config.NumberColumn(format="%.2f"),
+                                    "% do tempo": st.column_config.NumberColumn(format="%.0f%%")})
+        st.caption(" · ".join(f"{name}: {value}" for name, value in profile["counters"].items()))
+        memory = profile["memory"]
+        if memory.get("peak_rss_mb") is not None:
+            cuda = f" · GPU {memory['cuda_peak_mb']:.0f} MB" if memory.get("cuda_peak_mb") is not None else ""
+            st.caption(f"Pico de memória: {memory['peak_rss_mb']:.0f} MB{cuda}")
+        if profile.get("pipeline"):
+            st.caption(f"Pipeline: gargalo em {profile['pipeline']['bottleneck']}")
+        if os.path.exists(f"{result_path}/profile.prof"):
+            st.download_button("Download cProfile (prof)", data=_file_reader(f"{result_path}/profile.prof"),
+                               file_name="profile.prof", mime="application/octet-stream",
+                               use_container_width=True, icon="⏱️",
+                               help="Abra com snakeviz ou python -m pstats.")
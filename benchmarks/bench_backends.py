@@ -0,0 +1,58 @@
+"""
+Benchmark dos backends de inferência (lib.backends) em um vídeo de amostra:
+frames/s de CarCounter.process (sem vídeo de saída) e concordância dos
+totais com o backend torch/fp32. Os artefatos exportados ficam em cache ao
+lado dos pesos, logo só a primeira execução paga a exportação.
+
+Uso: python -m benchmarks.bench_backends VIDEO [--model yolov8n.pt] [--backends onnx openvino] [--precisions fp32 int8]
+"""
+import argparse
+import time
+from lib import backends, results
+from lib.car_counter import CarCounter
+
+TOTALS = ['detected_total', 'green_total', 'red_total']
+
+
+def run(video: str, config: dict, model: str, backend: str, precision: str):
+    cc = CarCounter(model_path=model, backend=backend, precision=precision)
+    t0 = time.perf_counter()
+    result = cc.process(video, output=None, **results.process_kwargs(config))
+    elapsed = time.perf_counter() - t0
+    last = result.stats.iloc[-1] if len(result.stats) else None
+    totals = {col: int(last[col]) if last is not None else 0 for col in TOTALS}
+    return result.info['frames'] / elapsed, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('video')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--config', default='.example/config.json')
+    parser.add_argument('--backends', nargs='+', default=[b for b in backends.available() if b != 'torch'])
+    parser.add_argument('--precisions', nargs='+', default=['fp32', 'int8'])
+    args = parser.parse_args()
+
+    config = results.load_config(args.config)
+    ref_fps, ref = run(args.video, config, args.model, 'torch', 'fp32')
+
+    print(f"{'backend':>12} {'precisão':>8} {'frames/s':>9} {'speedup':>8} " +
+          " ".join(f"{c:>15}" for c in TOTALS) + "  concordância")
+    print(f"{'torch':>12} {'fp32':>8} {ref_fps:>9.1f} {1.0:>7.2f}x " +
+          " ".join(f"{ref[c]:>15}" for c in TOTALS) + "  referência")
+    for backend in args.backends:
+        if backend not in backends.available():
+            print(f"{backend:>12} {'-':>8} runtime não instalado ({backends.BACKENDS[backend][2]})")
+            continue
+        for precision in args.precisions:
+            if precision not in backends.PRECISIONS[backend]:
+                continue
+            fps, totals = run(args.video, config, args.model, backend, precision)
+            # concordância: 1 - maior erro relativo entre os totais
+            err = max(abs(totals[c] - ref[c]) / max(ref[c], 1) for c in TOTALS)
+            print(f"{backend:>12} {precision:>8} {fps:>9.1f} {fps/ref_fps:>7.2f}x " +
+                  " ".join(f"{totals[c]:>15}" for c in TOTALS) + f"  {1-err:>11.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Tempo de CarCounter.process com o cache de detecções (lib.tracks): primeira
+execução (falta), repetição (acerto, com e sem vídeo de saída) e retomada de
+uma execução interrompida na metade, e se as contagens coincidem; e o custo
+dos checkpoints (tracks + estado do tracker) a cada --checkpoint s.
+
+Uso: python -m benchmarks.bench_cache VIDEO [--stride 1] [--pipelined] [--checkpoint 1.0]
+"""
+import argparse
+import tempfile
+import time
+from lib import results
+from lib.car_counter import CarCounter
+
+
+class _Stop(Exception):
+    pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('video')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--config', default='.example/config.json')
+    parser.add_argument('--stride', type=int, default=1)
+    parser.add_argument('--pipelined', action='store_true')
+    parser.add_argument('--checkpoint', type=float, default=1.0)
+    args = parser.parse_args()
+
+    config = results.load_config(args.config, output_mode='full')
+    kwargs = {**results.process_kwargs(config), 'stride': args.stride, 'pipelined': args.pipelined}
+    cc     = CarCounter(model_path=args.model)
+
+    def stop_half(done, total):
+        if done >= total // 2:
+            raise _Stop()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        def run(name, cache_dir, output=None, **extra):
+            t0 = time.perf_counter()
+            result = cc.process(args.video, output=output, tracks_dir=cache_dir, **kwargs, **extra)
+            rows.append((name, time.perf_counter() - t0, result.info['cache'],
+                         int(result.stats['passed_total'].iloc[-1]) if len(result.stats) else 0))
+            return result
+
+        run('falta', f"{tmp}/a", output=f"{tmp}/miss.mp4", checkpoint_s=float('inf'))
+        ckpt = run(f"falta, ckpt {args.checkpoint:g}s", f"{tmp}/c", output=f"{tmp}/ckpt.mp4",
+                   checkpoint_s=args.checkpoint).info['checkpoints']
+        run('acerto + vídeo', f"{tmp}/a", output=f"{tmp}/hit.mp4")
+        run('acerto', f"{tmp}/a")
+        try:
+            cc.process(args.video, output=None, tracks_dir=f"{tmp}/b", progress=stop_half, **kwargs)
+        except _Stop:
+            pass
+        run('retomada (50%)', f"{tmp}/b")
+
+    base = rows[0][1]
+    print(f"{'execução':>18} | {'cache':>6} | {'tempo (s)':>9} | {'speedup':>7} | {'passagens':>9}")
+    for name, secs, status, passed in rows:
+        print(f"{name:>18} | {status:>6} | {secs:>9.2f} | {base/secs:>6.1f}x | {passed:>9}")
+    print(f"checkpoints: {ckpt['count']} em {ckpt['seconds']*1e3:.1f} ms "
+          f"({100*ckpt['seconds']/rows[1][1]:.2f}% do processamento)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Escalabilidade do processamento em blocos (lib.chunked) de 1 a N workers,
+comparando os totais com uma execução sequencial de CarCounter.process.
+
+Uso: python -m benchmarks.bench_chunked VIDEO [--workers 1 2 4 8] [--overlap 2.0]
+"""
+import argparse
+import time
+from lib import results
+from lib.car_counter import CarCounter
+from lib.chunked import TOLERANCE, process_chunked
+
+TOTALS = ['detected_total', 'green_total', 'red_total']
+
+
+def totals(stats):
+    last = stats.iloc[-1] if len(stats) else None
+    return {col: int(last[col]) if last is not None else 0 for col in TOTALS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('video')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--config', default='.example/config.json')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--overlap', type=float, default=2.0)
+    args = parser.parse_args()
+
+    config = results.load_config(args.config)
+
+    t0 = time.perf_counter()
+    stats = CarCounter(model_path=args.model).process(
+        args.video, output=None, **results.process_kwargs(config)).stats
+    t_seq = time.perf_counter() - t0
+    ref = totals(stats)
+    print(f"sequencial: {t_seq:.1f}s {ref}")
+
+    print(f"{'workers':>7} {'tempo (s)':>9} {'speedup':>8} " +
+          " ".join(f"{c:>15}" for c in TOTALS) + "  tolerância")
+    for n in args.workers:
+        t0 = time.perf_counter()
+        _, stats, _ = process_chunked(args.video, config, workers=n,
+                                      overlap_s=args.overlap, model_path=args.model)
+        t = time.perf_counter() - t0
+        got = totals(stats)
+        rel = {c: abs(got[c] - ref[c]) / max(ref[c], 1) for c in TOTALS}
+        ok  = all(v <= TOLERANCE for v in rel.values())
+        print(f"{n:>7} {t:>9.1f} {t_seq/t:>7.2f}x " +
+              " ".join(f"{got[c]:>8} ({rel[c]:>4.1%})" for c in TOTALS) +
+              f"  {'ok' if ok else 'FORA'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Tempo de CarCounter.process e tamanho da saída em cada modo de vídeo
+(lib.encoding), comparados a processar sem vídeo (output=None): a diferença
+é o custo de anotar e codificar.
+
+Uso: python -m benchmarks.bench_encoding VIDEO [--modes full preview events overlay] [--fourcc mp4v]
+"""
+import argparse
+import os
+import tempfile
+import time
+from lib import encoding, results
+from lib.car_counter import CarCounter
+
+
+def output_size(output: str) -> int:
+    """
+    Bytes do vídeo e dos arquivos auxiliares (overlay/events) gerados.
+    """
+    paths = [output, encoding.overlay_path(output), encoding.events_path(output)]
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('video')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--config', default='.example/config.json')
+    parser.add_argument('--modes', nargs='+', default=list(encoding.OUTPUT_MODES), choices=encoding.OUTPUT_MODES)
+    parser.add_argument('--fourcc', default=encoding.FOURCC, help="codec (h264 exige um OpenCV com encoder H.264)")
+    parser.add_argument('--pipelined', action='store_true')
+    args = parser.parse_args()
+
+    encoding.FOURCC = args.fourcc
+    config = results.load_config(args.config)
+    kwargs = {**results.process_kwargs(config), 'pipelined': args.pipelined}
+    cc     = CarCounter(model_path=args.model)
+
+    t0 = time.perf_counter()
+    cc.process(args.video, output=None, **kwargs)
+    base = time.perf_counter() - t0
+
+    print(f"{'modo':>8} | {'tempo (s)':>9} | {'custo do vídeo (s)':>18} | {'saída (MB)':>10}")
+    print(f"{'nenhum':>8} | {base:>9.2f} | {0.0:>18.2f} | {0.0:>10.2f}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes:
+            output = f"{tmp}/{mode}/video.mp4"
+            os.makedirs(os.path.dirname(output))
+            t0 = time.perf_counter()
+            cc.process(args.video, output=output, **{**kwargs, 'output_mode': mode})
+            t = time.perf_counter() - t0
+            print(f"{mode:>8} | {t:>9.2f} | {t-base:>18.2f} | {output_size(output)/1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Pico de memória (RSS) de uma execução longa sintética de CarCounter.process,
+sem modelo: só o acúmulo das detecções e o cálculo das estatísticas.
+
+  dicts:  lista de dicts por box + DataFrame no final (implementação original)
+  arrays: arrays por frame concatenados no final + compute_stats_from_detections
+  sink:   DetectionSink em Parquet + StatsAccumulator (implementação atual)
+
+Cada modo roda em um subprocesso próprio para medir o pico isoladamente.
+
+Uso: python -m benchmarks.bench_memory [--frames 100000] [--per-frame 40] [--modes dicts arrays sink]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd # type:ignore
+from lib.counting import TrackState
+from lib.sink import DetectionSink, StatsAccumulator
+from lib.car_counter import CarCounter, DETECTION_COLUMNS
+
+FPS, LIFE = 30.0, 150
+
+
+def synthetic_frames(frames: int, per_frame: int):
+    """
+    ~`per_frame` tracks vivos por frame, cada um vivendo LIFE frames e
+    passando na linha no meio da vida (1 em cada 5 no vermelho).
+    """
+    slot  = np.arange(per_frame)
+    shift = slot*LIFE//per_frame
+    for f in range(frames):
+        tid  = ((f + shift)//LIFE)*per_frame + slot + 1
+        age  = (f + shift) % LIFE
+        sign = np.where(tid % 5 == 0, -1, 1)
+        # passagens novas neste frame (no frame 0, todas as já passadas)
+        new  = (age >= LIFE//2) if f == 0 else (age == LIFE//2)
+        yield {
+            'time': np.full(per_frame, f / FPS),
+            'id': tid,
+            'x1': (tid*37) % 1920,
+            'y1': age*7,
+            'pass': np.where(age >= LIFE//2, sign, 0),
+        }, int((new & (sign == 1)).sum()), int((new & (sign == -1)).sum())
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss é em KiB no Linux e em bytes no macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024**2 if sys.platform == 'darwin' else 1024)
+
+
+def run(mode: str, frames: int, per_frame: int):
+    base = peak_rss_mb()
+    t0   = time.perf_counter()
+    if mode == 'dicts':
+        records = []
+        for dets, _, _ in synthetic_frames(frames, per_frame):
+            for row in zip(*(dets[c].tolist() for c in DETECTION_COLUMNS)):
+                records.append(dict(zip(DETECTION_COLUMNS, row)))
+        stats = CarCounter.compute_stats_from_detections(pd.DataFrame(records))
+    elif mode == 'arrays':
+        blocks = [dets for dets, _, _ in synthetic_frames(frames, per_frame)]
+        df = pd.DataFrame({c: np.concatenate([b[c] for b in blocks]) for c in DETECTION_COLUMNS})
+        stats = CarCounter.compute_stats_from_detections(df)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            sink, acc, state = DetectionSink(f"{tmp}/detections.parquet"), StatsAccumulator(), TrackState()
+            for dets, dg, dr in synthetic_frames(frames, per_frame):
+                state.observe(dets['id'])
+                acc.update(dets['time'][0], len(dets['id']), len(state), dg, dr)
+                sink.append(dets)
+            sink.close()
+            stats = acc.to_frame()
+    elapsed = time.perf_counter() - t0
+    print(f"{mode:>7} | {frames*per_frame:>10} | {elapsed:>8.1f} | {base:>9.0f} | {peak_rss_mb():>9.0f} | "
+          f"{peak_rss_mb()-base:>10.0f} | {int(stats['passed_total'].iloc[-1])}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--frames', type=int, default=100_000)
+    parser.add_argument('--per-frame', type=int, default=40)
+    parser.add_argument('--modes', nargs='+', default=['dicts', 'arrays', 'sink'])
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.run, args.frames, args.per_frame)
+        return
+
+    print(f"{'modo':>7} | {'detecções':>10} | {'tempo(s)':>8} | {'base(MB)':>9} | {'pico(MB)':>9} | "
+          f"{'acúmulo(MB)':>10} | passagens")
+    for mode in args.modes:
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_memory', '--run', mode,
+                        '--frames', str(args.frames), '--per-frame', str(args.per_frame)],
+                       check=True, env=dict(os.environ))
+
+
+if __name__ == '__main__':
+    main()
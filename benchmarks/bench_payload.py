@@ -0,0 +1,72 @@
+"""
+Tamanho do JSON enviado ao navegador pelos gráficos da página de resultados,
+para vídeos de durações crescentes: estatísticas por frame inteiras
+(implementação original, um conjunto de dados por camada) vs. rollups.
+
+Uso: python -m benchmarks.bench_payload [--minutes 1 10 60 240]
+"""
+import argparse
+import time
+import altair as alt # type:ignore
+import pandas as pd # type:ignore
+import streamlit as st
+from app import plots
+from lib import rollups
+from lib.car_counter import CarCounter
+from benchmarks.bench_stats import synthetic_detections
+
+FPS = 30.0
+
+
+def legacy_chart(df: pd.DataFrame, columns, mark: str) -> alt.LayerChart:
+    """
+    Reprodução das camadas originais: alt.Chart(df) completo em cada uma.
+    """
+    charts = [getattr(alt.Chart(df), mark)().encode(x='time:Q', y=f'{col}:Q') for col in columns]
+    return alt.layer(*charts)
+
+
+def payload(render) -> int:
+    """
+    Bytes dos gráficos passados a st.altair_chart por `render`.
+    """
+    sizes = []
+    original, st.altair_chart = st.altair_chart, lambda chart, **_: sizes.append(len(chart.to_json()))
+    try:
+        render()
+    finally:
+        st.altair_chart = original
+    return sum(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--minutes', type=float, nargs='+', default=[1, 10, 60, 240])
+    args = parser.parse_args()
+
+    # o limite padrão (5000 linhas) impediria medir a versão original
+    alt.data_transformers.disable_max_rows()
+
+    print(f"{'minutos':>7} | {'linhas':>7} | {'original (KB)':>13} | {'rollups (KB)':>12} | {'rollups (s)':>11}")
+    for minutes in args.minutes:
+        # 1 detecção por frame é o bastante para ter uma linha de stats por frame
+        stats = CarCounter.compute_stats_from_detections(
+            synthetic_detections(int(minutes*60*FPS), per_frame=1, fps=FPS))
+
+        old = payload(lambda: [
+            st.altair_chart(legacy_chart(stats, rollups.TOTAL_COLUMNS, 'mark_area')),
+            st.altair_chart(legacy_chart(stats, rollups.INSTANT_COLUMNS, 'mark_bar')),
+        ])
+
+        t0 = time.perf_counter()
+        levels = rollups.build_rollups(stats, cycle=25)
+        t_build = time.perf_counter() - t0
+        new = payload(lambda: [
+            plots.plot_traffic_data_total(stats, rollups.TOTAL_COLUMNS, levels),
+            plots.plot_traffic_data_total_instant(stats, rollups.INSTANT_COLUMNS, levels),
+        ])
+        print(f"{minutes:>7g} | {len(stats):>7} | {old/1e3:>13.0f} | {new/1e3:>12.0f} | {t_build:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Tempo para trocar a linha/semáforo de um resultado: processar o vídeo de
+novo (CarCounter.process) contra recontar os tracks em cache (lib.recount),
+com e sem regerar o vídeo, e se as estatísticas das duas vias coincidem.
+
+Uso: python -m benchmarks.bench_recount VIDEO [--points 0.1 0.4 0.9 0.6] [--green 30] [--red 10]
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from lib import recount, results
+from lib.car_counter import CarCounter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('video')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--config', default='.example/config.json')
+    parser.add_argument('--points', type=float, nargs=4, default=[0.1, 0.4, 0.9, 0.6])
+    parser.add_argument('--green', type=int, default=30)
+    parser.add_argument('--red', type=int, default=10)
+    args = parser.parse_args()
+
+    config = results.load_config(args.config, output_mode='full')
+    new    = {'points': (tuple(args.points[:2]), tuple(args.points[2:])),
+              'green_duration': args.green, 'red_duration': args.red}
+    cc     = CarCounter(model_path=args.model)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        result_path = f"{tmp}/result"
+        os.makedirs(result_path)
+        result = cc.process(args.video, output=f"{result_path}/video.mp4", tracks_dir=f"{tmp}/tracks",
+                            **results.process_kwargs(config))
+        results.save_results(result_path, result.detections, result.stats, config, info=result.info, catalog=False)
+
+        t0 = time.perf_counter()
+        ref = cc.process(args.video, output=f"{tmp}/ref.mp4", **results.process_kwargs({**config, **new}))
+        t_process = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        recount.recount(result_path, **new, catalog=False)
+        t_recount = time.perf_counter() - t0
+        same = np.array_equal(results.load_stats(result_path).iloc[:, 1:].to_numpy(),
+                              ref.stats.iloc[:, 1:].to_numpy())
+
+        t0 = time.perf_counter()
+        recount.recount(result_path, **new, render_video=True, video_path=args.video, catalog=False)
+        t_render = time.perf_counter() - t0
+
+    print(f"{'via':>20} | {'tempo (s)':>9} | {'speedup':>7}")
+    print(f"{'process':>20} | {t_process:>9.2f} | {1.0:>6.1f}x")
+    print(f"{'recontagem':>20} | {t_recount:>9.2f} | {t_process/t_recount:>6.1f}x")
+    print(f"{'recontagem + vídeo':>20} | {t_render:>9.2f} | {t_process/t_render:>6.1f}x")
+    print(f"estatísticas iguais: {'sim' if same else 'NÃO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark de CarCounter.compute_stats_from_detections: versão original
+(loop por instante, O(frames x detecções)) vs. versão vetorizada.
+
+Antes de medir confere que a versão vetorizada reproduz exatamente
+.example/stats.csv a partir de .example/detections.csv.
+
+Uso: python -m benchmarks.bench_stats [--rows 2000000] [--legacy-rows 200000]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd # type:ignore
+from lib.car_counter import CarCounter
+
+
+def legacy_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reprodução da implementação original (loop sobre os instantes).
+    """
+    df = df.sort_values('time')
+    times = df['time'].unique()
+    first_appear = df.groupby('id')['time'].min()
+    events = (
+        df[df['pass'] != 0]
+          .sort_values('time')
+          .drop_duplicates('id', keep='first')[['time','pass']]
+    )
+    green_ct = events[events['pass']==1]['time'].value_counts()
+    red_ct   = events[events['pass']==-1]['time'].value_counts()
+
+    rows, cum_g, cum_r = [], 0, 0
+    for t in times:
+        det     = int((df['time']==t).sum())
+        det_tot = int((first_appear <= t).sum())
+        g       = int(green_ct.get(t,0))
+        r       = int(red_ct.get(t,0))
+        cum_g  += g
+        cum_r  += r
+        rows.append({
+            'time': t, 'detected': det, 'detected_total': det_tot,
+            'green': g, 'green_total': cum_g, 'red': r, 'red_total': cum_r,
+            'passed': g+r, 'passed_total': cum_g+cum_r
+        })
+    return pd.DataFrame(rows)
+
+
+def synthetic_detections(rows: int, per_frame: int = 40, fps: float = 30.0, seed: int = 0) -> pd.DataFrame:
+    """
+    Detecções sintéticas: ~`per_frame` tracks vivos por frame, cada um
+    vivendo ~150 frames e passando na linha no meio da vida.
+    """
+    rng    = np.random.default_rng(seed)
+    frames = rows // per_frame
+    life   = 150
+    idx    = np.repeat(np.arange(frames), per_frame)
+    slot   = np.tile(np.arange(per_frame), frames)
+    gen    = (idx + slot*life//per_frame) // life
+    tid    = gen*per_frame + slot + 1
+    age    = (idx + slot*life//per_frame) % life
+    light  = np.where(rng.random(tid.max()+1) < 0.8, 1, -1)
+    passed = np.where(age >= life//2, light[tid], 0)
+    return pd.DataFrame({
+        'time': idx / fps,
+        'id': tid,
+        'x1': rng.integers(0, 1920, len(idx)),
+        'y1': rng.integers(0, 1080, len(idx)),
+        'pass': passed
+    })
+
+
+def timeit(fn, *args):
+    t0  = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--legacy-rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    # regressão contra o exemplo versionado
+    det = pd.read_csv('.example/detections.csv')
+    pd.testing.assert_frame_equal(CarCounter.compute_stats_from_detections(det),
+                                  pd.read_csv('.example/stats.csv'))
+    print("OK: .example/stats.csv reproduzido")
+
+    small = synthetic_detections(args.legacy_rows)
+    old, t_old = timeit(legacy_stats, small)
+    new, t_new = timeit(CarCounter.compute_stats_from_detections, small)
+    pd.testing.assert_frame_equal(new, old, check_dtype=False)
+    print(f"{len(small):>9} linhas | original {t_old:8.3f}s | vetorizado {t_new:6.3f}s | {t_old/t_new:7.1f}x")
+
+    big = synthetic_detections(args.rows)
+    _, t_new = timeit(CarCounter.compute_stats_from_detections, big)
+    print(f"{len(big):>9} linhas | vetorizado {t_new:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark do armazenamento das detecções: CSV (formato antigo) vs. Parquet
+com tipos compactos (lib.results.save_results). Mede tempo de escrita,
+tamanho em disco e tempo de carga da tabela inteira e só da coluna `time`.
+
+Uso: python -m benchmarks.bench_storage [--rows 2000000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd # type:ignore
+from lib import results
+from lib.car_counter import CarCounter
+from benchmarks.bench_stats import synthetic_detections
+
+
+def timeit(fn, *args, **kwargs):
+    t0  = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    df    = synthetic_detections(args.rows)
+    stats = CarCounter.compute_stats_from_detections(df)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_dir, pq_dir = f"{tmp}/csv", f"{tmp}/parquet"
+        os.makedirs(csv_dir)
+
+        def write_csv():
+            df.to_csv(f"{csv_dir}/detections.csv", index=False)
+            stats.to_csv(f"{csv_dir}/stats.csv", index=False)
+
+        _, w_csv = timeit(write_csv)
+        _, w_pq  = timeit(results.save_results, pq_dir, df, stats, results.CONFIG_DEFAULTS)
+
+        s_csv = os.path.getsize(f"{csv_dir}/detections.csv")
+        s_pq  = os.path.getsize(f"{pq_dir}/detections.parquet")
+
+        _, l_csv = timeit(results.load_detections, csv_dir)
+        loaded, l_pq = timeit(results.load_detections, pq_dir)
+        _, c_csv = timeit(results.load_detections, csv_dir, columns=['time'])
+        _, c_pq  = timeit(results.load_detections, pq_dir, columns=['time'])
+
+        # tipos compactos não alteram o resultado (tempos são múltiplos de 1/fps)
+        pd.testing.assert_frame_equal(loaded, df, check_dtype=False, atol=1e-4)
+
+    print(f"{len(df)} linhas de detecção")
+    print(f"{'':>10} | {'escrita (s)':>11} | {'tamanho (MB)':>12} | {'carga (s)':>9} | {'só time (s)':>11}")
+    print(f"{'csv':>10} | {w_csv:>11.3f} | {s_csv/1e6:>12.1f} | {l_csv:>9.3f} | {c_csv:>11.3f}")
+    print(f"{'parquet':>10} | {w_pq:>11.3f} | {s_pq/1e6:>12.1f} | {l_pq:>9.3f} | {c_pq:>11.3f}")
+    print(f"{'ganho':>10} | {w_csv/w_pq:>10.1f}x | {s_csv/s_pq:>11.1f}x | {l_csv/l_pq:>8.1f}x | {c_csv/c_pq:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark dos modos de stride de CarCounter.process: velocidade vs. acurácia
+da contagem em relação ao processamento de todos os frames, usando as
+configurações de .example/config.json.
+
+Uso: python -m benchmarks.bench_stride VIDEO [--model yolov8n.pt] [--strides 2 3 5]
+"""
+import argparse
+import json
+import time
+from lib.car_counter import CarCounter
+
+
+def run(cc: CarCounter, video: str, config: dict, **kwargs):
+    t0 = time.perf_counter()
+    stats = cc.process(
+        video,
+        config['points'],
+        output=None,
+        conf=config['conf'],
+        iou=config['iou'],
+        tracker_model=config['tracker_model'],
+        green_duration=config['green_duration'],
+        red_duration=config['red_duration'],
+        **kwargs
+    ).stats
+    last = stats.iloc[-1] if len(stats) else None
+    g = int(last['green_total']) if last is not None else 0
+    r = int(last['red_total']) if last is not None else 0
+    return time.perf_counter() - t0, g, r
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('video')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--config', default='.example/config.json')
+    parser.add_argument('--strides', type=int, nargs='+', default=[2, 3, 5])
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    cc = CarCounter(model_path=args.model)
+
+    t_base, g_base, r_base = run(cc, args.video, config)
+    print(f"{'modo':<14} {'tempo (s)':>9} {'speedup':>8} {'verde':>6} {'vermelho':>8} {'erro':>6}")
+    print(f"{'stride=1':<14} {t_base:>9.1f} {1.0:>7.1f}x {g_base:>6} {r_base:>8} {0:>6}")
+
+    modes = [(f"stride={s}", dict(stride=s)) for s in args.strides]
+    modes += [(f"adaptive<={s}", dict(stride=s, adaptive=True)) for s in args.strides]
+    for name, kwargs in modes:
+        t, g, r = run(cc, args.video, config, **kwargs)
+        err = abs(g - g_base) + abs(r - r_base)
+        print(f"{name:<14} {t:>9.1f} {t_base/t:>7.1f}x {g:>6} {r:>8} {err:>6}")
+
+
+if __name__ == '__main__':
+    main()
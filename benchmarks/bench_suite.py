@@ -0,0 +1,318 @@
+"""
+Suíte reprodutível de desempenho e acurácia da contagem, com clipes
+sintéticos (benchmarks.synthetic) gerados na hora, sem vídeos externos nem
+GPU: com o detector de teste (--model stub, padrão) mede o pipeline em si;
+com pesos (--model yolov8n.pt) inclui a inferência real, mas os retângulos
+sintéticos não são veículos para o YOLO e a acurácia deixa de valer.
+
+  process:  frames/s ponta a ponta (mediana de --repeat execuções), ms/frame
+            por etapa (lib.profiling) e pico de RSS, um subprocesso por
+            cenário; contagem final contra o gabarito do clipe
+  frame:    µs/frame de CarCounter._process_frame com tracks perfeitos, sem
+            e com desenho
+  stats:    ms de compute_stats_from_detections sobre as detecções de um
+            clipe longo
+
+O resultado (com versão do código, das bibliotecas e da máquina) vai para um
+JSON; --compare ANTIGO.json mostra a variação de cada métrica e termina com
+código 1 se algo piorar mais que --tolerance ou se a contagem errar.
+
+Uso: python -m benchmarks.bench_suite [--quick] [--out bench.json] [--compare antigo.json] [--model stub]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd # type:ignore
+from importlib import metadata
+from typing import Any, Dict, List, Optional, Tuple
+from benchmarks.synthetic import StubDetector, TrafficScene
+from lib import encoding
+from lib.car_counter import CarCounter, DETECTION_COLUMNS
+from lib.counting import LineCounter, TrackState
+
+# cenário: (parâmetros de TrafficScene, argumentos de process)
+SCENARIOS: Dict[str, Tuple[Dict[str,Any], Dict[str,Any]]] = {
+    'light':     ({'density': 12}, {}),
+    'dense':     ({'density': 40, 'lanes': 10}, {}),
+    'no_video':  ({'density': 12}, {'output': None}),
+    'stride3':   ({'density': 12}, {'stride': 3}),
+    'adaptive':  ({'density': 12}, {'stride': 3, 'adaptive': True}),
+    'roi':       ({'density': 12, 'roi': (0.3, 0.7)}, {}),
+    'pipelined': ({'density': 12}, {'pipelined': True}),
+}
+
+COUNTS = ('detected', 'green', 'red', 'passed')
+
+# versões gravadas junto do resultado
+PACKAGES = ('numpy', 'pandas', 'opencv-python', 'torch', 'ultralytics')
+
+# etapas abaixo disso (ms/frame) variam mais por ruído que por código: não reprovam o --compare
+MIN_STAGE_MS = 0.1
+
+
+def make_scene(params: Dict[str,Any], seconds: float) -> TrafficScene:
+    return TrafficScene(seconds=seconds, **params)
+
+
+def make_counter(model: str) -> CarCounter:
+    if model == 'stub':
+        return CarCounter(model=StubDetector())
+    return CarCounter(model_path=model, backend='torch')
+
+
+def totals(stats: pd.DataFrame) -> Dict[str,int]:
+    if stats.empty:
+        return {k: 0 for k in COUNTS}
+    last = stats.iloc[-1]
+    return {k: int(last[f'{k}_total']) for k in COUNTS}
+
+
+def run_process(name: str, model: str, seconds: float, repeat: int, warmup: int) -> Dict[str,Any]:
+    """
+    Um cenário de process (no subprocesso): `warmup` execuções descartadas e
+    `repeat` medidas no mesmo clipe.
+    """
+    scene_params, process_params = SCENARIOS[name]
+    scene = make_scene(scene_params, seconds)
+    cc    = make_counter(model)
+    runs: List[Dict[str,Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        video = scene.render(f"{tmp}/clip.mp4")
+        kwargs = {'output': f"{tmp}/out.mp4", 'roi': scene.roi, 'green_duration': scene.green,
+                  'red_duration': scene.red, **process_params}
+        for i in range(warmup + repeat):
+            result = cc.process(video, scene.points, profile='timers', **kwargs)
+            if i >= warmup:
+                runs.append({**result.info['profile'], 'counts': totals(result.stats)})
+
+    stages = {stage: statistics.median(r['stages'][stage]['ms_per_frame'] for r in runs if stage in r['stages'])
+              for stage in runs[-1]['stages']}
+    truth  = scene.ground_truth()
+    counts = runs[-1]['counts']
+    return {
+        'frames': runs[-1]['frames'],
+        'cars': len(scene.cars),
+        'fps': statistics.median(r['fps'] for r in runs),
+        'fps_runs': [r['fps'] for r in runs],
+        'ms_per_frame': stages,
+        'peak_rss_mb': max(r['memory']['peak_rss_mb'] or 0.0 for r in runs),
+        'counts': counts,
+        'truth': truth,
+        'exact': counts == truth,
+        'same_counts': all(r['counts'] == counts for r in runs),
+    }
+
+
+def run_frame(seconds: float, repeat: int) -> Dict[str,Any]:
+    """
+    CarCounter._process_frame sobre os tracks perfeitos do clipe (sem
+    detector nem decodificação), sem e com desenho.
+    """
+    scene   = make_scene(SCENARIOS['dense'][0], seconds)
+    results = scene.results()
+    W, H    = scene.size
+    cc      = CarCounter(model=StubDetector())
+    p1, p2  = CarCounter._compute_line(scene.points, W, H)
+    cycle   = scene.green + scene.red
+    canvas  = np.zeros((H, W, 3), dtype=np.uint8)
+    out: Dict[str,Any] = {'frames': len(results), 'boxes': int(sum(len(r.boxes.id.cpu().numpy()) for r in results))}
+    for annotate in (False, True):
+        times = []
+        for _ in range(repeat):
+            line, state = LineCounter(p1, p2), TrackState()
+            green = red = 0
+            t0 = time.perf_counter()
+            for idx, result in enumerate(results):
+                _, _, inc_g, inc_r = cc._process_frame(result, idx, scene.fps, line, cycle, scene.green, state,
+                                                       frame=canvas, annotate=annotate)
+                green += inc_g
+                red   += inc_r
+            times.append(time.perf_counter() - t0)
+        key = 'draw' if annotate else 'count'
+        out[key] = {'us_per_frame': 1e6 * statistics.median(times) / len(results)}
+    truth = scene.ground_truth()
+    out['counts'] = {'green': green, 'red': red}
+    out['exact']  = out['counts'] == {'green': truth['green'], 'red': truth['red']}
+    return out
+
+
+def run_stats(seconds: float, repeat: int) -> Dict[str,Any]:
+    """
+    compute_stats_from_detections sobre as detecções de um clipe longo.
+    """
+    scene  = make_scene(SCENARIOS['dense'][0], seconds)
+    W, H   = scene.size
+    p1, p2 = CarCounter._compute_line(scene.points, W, H)
+    line, state = LineCounter(p1, p2), TrackState()
+    blocks = []
+    cc     = CarCounter(model=StubDetector())
+    for idx, result in enumerate(scene.results()):
+        dets, _, _, _ = cc._process_frame(result, idx, scene.fps, line, scene.green + scene.red, scene.green,
+                                          state, annotate=False)
+        blocks.append(dets)
+    df = pd.DataFrame({c: np.concatenate([b[c] for b in blocks]) for c in DETECTION_COLUMNS})
+
+    times = []
+    for _ in range(repeat):
+        t0    = time.perf_counter()
+        stats = CarCounter.compute_stats_from_detections(df)
+        times.append(time.perf_counter() - t0)
+    counts, truth = totals(stats), scene.ground_truth()
+    return {'rows': len(df), 'ms': 1e3 * statistics.median(times), 'counts': counts, 'truth': truth,
+            'exact': counts == truth}
+
+
+def package_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def environment(model: str) -> Dict[str,Any]:
+    try:
+        commit = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                                text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'model': model,
+        'python': platform.python_version(),
+        **{name: package_version(name) for name in PACKAGES},
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def flatten(result: Dict[str,Any]) -> Dict[str,float]:
+    """
+    Métricas comparáveis do JSON: 'process.light.fps', 'frame.draw.us_per_frame'...
+    """
+    flat = {}
+    for name, sc in result['process'].items():
+        flat[f'process.{name}.fps'] = sc['fps']
+        flat[f'process.{name}.peak_rss_mb'] = sc['peak_rss_mb']
+        for stage, ms in sc['ms_per_frame'].items():
+            flat[f'process.{name}.ms_per_frame.{stage}'] = ms
+    for key in ('count', 'draw'):
+        if key in result.get('frame', {}):
+            flat[f'frame.{key}.us_per_frame'] = result['frame'][key]['us_per_frame']
+    if 'stats' in result:
+        flat['stats.ms'] = result['stats']['ms']
+    return flat
+
+
+def compare(old: Dict[str,Any], new: Dict[str,Any], tolerance: float) -> bool:
+    """
+    Tabela de variação entre dois resultados; False se alguma métrica piorou
+    mais que `tolerance` (fração). Só frames/s é melhor quando sobe.
+    """
+    a, b = flatten(old), flatten(new)
+    ok   = True
+    print(f"\n{old['env']['commit']} -> {new['env']['commit']}")
+    if old['params'] != new['params'] or old['env']['model'] != new['env']['model']:
+        print(f"atenção: parâmetros diferentes ({old['params']}, {old['env']['model']} -> "
+              f"{new['params']}, {new['env']['model']}), comparação aproximada")
+    print(f"{'métrica':<50} | {'antes':>10} | {'depois':>10} | {'variação':>8}")
+    for key in sorted(set(a) & set(b)):
+        if not a[key]:
+            continue
+        change = b[key] / a[key] - 1
+        worse  = -change if key.endswith('.fps') else change
+        noise  = '.ms_per_frame.' in key and max(a[key], b[key]) < MIN_STAGE_MS
+        flag   = ''
+        if worse > tolerance and not noise:
+            flag, ok = '  pior', False
+        print(f"{key:<50} | {a[key]:>10.2f} | {b[key]:>10.2f} | {change:>+7.1%}{flag}")
+    return ok
+
+
+def run_worker(kind: str, args) -> Dict[str,Any]:
+    if kind == 'frame':
+        return run_frame(args.seconds, args.repeat)
+    if kind == 'stats':
+        return run_stats(args.seconds * 20, args.repeat)
+    return run_process(kind, args.model, args.seconds, args.repeat, args.warmup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='stub', help="stub (detector de teste) ou caminho dos pesos YOLO")
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--seconds', type=float, default=30.0, help="duração de cada clipe")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--quick', action='store_true', help="clipes de 15 s, uma execução, sem aquecimento")
+    parser.add_argument('--out', default=None, help="JSON de saída (padrão bench-<data>.json)")
+    parser.add_argument('--compare', default=None, help="JSON de uma execução anterior")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="piora tolerada no --compare (fração)")
+    parser.add_argument('--fourcc', default='mp4v', help="codec do vídeo de saída")
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.quick:
+        args.seconds, args.repeat, args.warmup = 15.0, 1, 0
+
+    if args.run:
+        encoding.FOURCC = args.fourcc
+        print(json.dumps(run_worker(args.run, args)))
+        return
+
+    result: Dict[str,Any] = {'env': environment(args.model),
+                             'params': {'seconds': args.seconds, 'repeat': args.repeat, 'warmup': args.warmup},
+                             'process': {}}
+    worker = [sys.executable, '-m', 'benchmarks.bench_suite', '--model', args.model, '--seconds', str(args.seconds),
+              '--repeat', str(args.repeat), '--warmup', str(args.warmup), '--fourcc', args.fourcc]
+
+    def spawn(kind: str) -> Dict[str,Any]:
+        # subprocesso próprio: pico de RSS isolado e nenhum estado entre cenários
+        out = subprocess.run(worker + ['--run', kind], capture_output=True, text=True, env=dict(os.environ))
+        if out.returncode != 0:
+            sys.exit(f"{kind} falhou:\n{out.stderr}")
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{'cenário':>10} | {'frames':>6} | {'frames/s':>8} | {'track':>6} | {'count':>6} | {'draw':>6} | "
+          f"{'encode':>6} | {'RSS(MB)':>7} | contagem (det/verde/verm)")
+    for name in args.scenarios:
+        sc = spawn(name)
+        result['process'][name] = sc
+        ms = sc['ms_per_frame']
+        got, truth = sc['counts'], sc['truth']
+        print(f"{name:>10} | {sc['frames']:>6} | {sc['fps']:>8.1f} | {ms.get('track', 0):>6.2f} | "
+              f"{ms.get('count', 0):>6.2f} | {ms.get('draw', 0):>6.2f} | {ms.get('encode', 0):>6.2f} | "
+              f"{sc['peak_rss_mb']:>7.0f} | {got['detected']}/{got['green']}/{got['red']} "
+              f"{'ok' if sc['exact'] else 'ERRO, esperado %d/%d/%d' % (truth['detected'], truth['green'], truth['red'])}")
+
+    result['frame'] = spawn('frame')
+    result['stats'] = spawn('stats')
+    frame, stats = result['frame'], result['stats']
+    print(f"\n_process_frame ({frame['boxes'] / frame['frames']:.1f} boxes/frame): "
+          f"{frame['count']['us_per_frame']:.0f} µs/frame sem desenho, {frame['draw']['us_per_frame']:.0f} com "
+          f"({'ok' if frame['exact'] else 'ERRO'})")
+    print(f"compute_stats_from_detections ({stats['rows']} linhas): {stats['ms']:.1f} ms "
+          f"({'ok' if stats['exact'] else 'ERRO'})")
+
+    out = args.out or time.strftime('bench-%Y%m%d-%H%M%S.json')
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nresultado em {out}")
+
+    exact = all(sc['exact'] for sc in result['process'].values()) and frame['exact'] and stats['exact']
+    ok    = exact or args.model != 'stub'
+    if args.compare:
+        with open(args.compare) as f:
+            ok = compare(json.load(f), result, args.tolerance) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Custo por frame de ZoneCounter.update com a grade (lib.zones) e sem ela
+(uma única célula: todo par veículo x zona faz o teste exato), para números
+crescentes de zonas e de veículos por frame. As contagens dos dois devem
+ser idênticas.
+
+Uso: python -m benchmarks.bench_zones [--zones 4 16 64] [--vehicles 20 100 500]
+"""
+import argparse
+import time
+import numpy as np
+from lib.zones import ZoneCounter
+
+W, H = 1920, 1080
+
+
+def synthetic_zones(n: int, seed: int = 0):
+    """
+    Metade linhas curtas, metade polígonos (hexágonos irregulares) espalhados pelo frame.
+    """
+    rng, zones = np.random.default_rng(seed), []
+    for i in range(n):
+        cx, cy = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9)
+        if i % 2:
+            zones.append({'name': f"linha {i}", 'points': [[cx - 0.05, cy], [cx + 0.05, cy]]})
+        else:
+            ang = np.sort(rng.uniform(0, 2*np.pi, 6))
+            r   = rng.uniform(0.03, 0.08, 6)
+            zones.append({'name': f"zona {i}", 'points': np.c_[cx + r*np.cos(ang), cy + r*np.sin(ang)].tolist()})
+    return zones
+
+
+def run(zones, vehicles: int, frames: int, cell: int) -> tuple:
+    counter = ZoneCounter(zones, W, H, cell=cell)
+    rng     = np.random.default_rng(1)
+    ids     = np.arange(vehicles)
+    pos     = rng.uniform((0, 0), (W, H), (vehicles, 2))
+    vel     = rng.uniform(-8, 8, (vehicles, 2))
+    total   = 0.0
+    for f in range(frames):
+        pos = (pos + vel) % (W, H)
+        cx, cy = pos[:,0].astype(np.int64), pos[:,1].astype(np.int64)
+        t0 = time.perf_counter()
+        counter.update(cx, cy, ids, 'green' if f % 50 < 40 else 'red')
+        total += time.perf_counter() - t0
+    return total / frames * 1e3, counter.n_seen.tolist(), counter.state.sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--zones', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--vehicles', type=int, nargs='+', default=[20, 100, 500])
+    parser.add_argument('--frames', type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'zonas':>5} | {'veículos':>8} | {'sem grade (ms)':>14} | {'grade (ms)':>10} | {'speedup':>7} | iguais")
+    for n in args.zones:
+        zones = synthetic_zones(n)
+        for vehicles in args.vehicles:
+            t_brute, *out_brute = run(zones, vehicles, args.frames, cell=max(W, H))
+            t_grid,  *out_grid  = run(zones, vehicles, args.frames, cell=32)
+            same = out_brute[0] == out_grid[0] and out_brute[1] == out_grid[1]
+            print(f"{n:>5} | {vehicles:>8} | {t_brute:>14.3f} | {t_grid:>10.3f} | {t_brute/t_grid:>6.1f}x | {'sim' if same else 'NÃO'}")
+
+
+if __name__ == '__main__':
+    main()
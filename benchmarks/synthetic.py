@@ -0,0 +1,238 @@
+"""
+Tráfego sintético determinístico para os benchmarks: clipes com retângulos
+claros descendo em faixas verticais e cruzando uma linha horizontal em
+frames conhecidos, com o gabarito da contagem (quantos veículos aparecem e
+quantos cruzam no verde e no vermelho), e um detector de teste que
+substitui o YOLO, sem GPU nem download de pesos.
+
+Os cruzamentos são sorteados longe das trocas do semáforo (`margin_s`), logo
+o sinal de cada passagem não depende de um frame a mais ou a menos, e no
+primeiro e no último frame nenhum veículo está cortado pela borda da imagem
+ou da ROI, logo quem aparece também não é ambíguo. Em cada faixa os veículos
+têm a mesma velocidade e ficam separados por `gap_px`, o que torna a
+associação do detector de teste inequívoca.
+"""
+import functools
+import time
+import cv2
+import numpy as np
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from lib.counting import VEHICLE_CLASSES, signal_light
+from lib.tracks import CachedResult
+
+CAR_W, CAR_H = 48, 32
+BACKGROUND   = 60
+CAR_COLOR    = (235, 235, 235)
+
+# linhas visíveis a partir das quais o detector de teste enxerga o veículo
+MIN_ROWS = 6
+
+
+class TrafficScene:
+    """
+    Cena de `seconds` s com `lanes` faixas; cada veículo é
+    (faixa, velocidade em px/frame, frame em que o centróide está na linha).
+
+      line_y: altura da linha (fração de H)
+      green, red: durações (s) do semáforo, como no config
+      density: veículos por faixa por minuto (aproximado)
+      roi: faixa horizontal (y1, y2, frações de H) passada ao modelo, ou None
+    """
+    def __init__(self, seconds: float = 30.0, fps: float = 30.0, size: Tuple[int,int] = (640, 360),
+                 lanes: int = 6, density: float = 12.0, line_y: float = 0.5,
+                 green: int = 10, red: int = 5, speeds: Tuple[int,int] = (2, 7),
+                 gap_px: int = 120, margin_s: float = 0.5, roi: Optional[Tuple[float,float]] = None,
+                 seed: int = 0):
+        self.seconds, self.fps, self.size = seconds, fps, size
+        self.frames  = int(round(seconds * fps))
+        self.green, self.red = green, red
+        W, H         = size
+        self.line    = int(line_y * H)
+        self.points  = ((0.0, line_y), (1.0, line_y))
+        self.roi     = ((0.0, roi[0]), (1.0, roi[1])) if roi else None
+        self.crop    = (0, int(roi[0] * H), W, int(roi[1] * H)) if roi else (0, 0, W, H)
+        self.lanes   = [int((i + 0.5) * W / lanes) - CAR_W // 2 for i in range(lanes)]
+        rng          = np.random.default_rng(seed)
+        margin       = margin_s * fps
+        cars: List[Tuple[int,int,int]] = []
+        for lane in range(lanes):
+            speed = int(rng.integers(speeds[0], speeds[1] + 1))
+            # intervalo mínimo entre veículos da faixa, em frames
+            min_gap = int(np.ceil((CAR_H + gap_px) / speed))
+            f = int(rng.integers(-H // speed, min_gap))
+            while f < self.frames + H // speed:
+                if self._far_from_switch(f, margin) and not self._cut(speed, f):
+                    cars.append((lane, speed, f))
+                f += min_gap + int(rng.exponential(60 * fps / density))
+        self.cars = np.array(cars, dtype=np.int64).reshape(-1, 3)
+
+    def _far_from_switch(self, f: int, margin: float) -> bool:
+        cycle = (self.green + self.red) * self.fps
+        if cycle <= 0:
+            return True
+        t = f % cycle
+        return min(t, abs(t - self.green * self.fps), cycle - t) >= margin
+
+    def _cut(self, speed: int, cross: int) -> bool:
+        # cortado (com folga de 2 px) pela borda da imagem ou da ROI no primeiro/último frame
+        edges = {0, self.size[1], self.crop[1], self.crop[3]}
+        for f in (0, self.frames - 1):
+            top = self.line - CAR_H // 2 + speed * (f - cross)
+            if any(top - 2 < e < top + CAR_H + 2 for e in edges):
+                return True
+        return False
+
+    def _tops(self, f: int) -> np.ndarray:
+        speed, cross = self.cars[:,1], self.cars[:,2]
+        return self.line - CAR_H // 2 + speed * (f - cross)
+
+    def boxes(self, f: int, crop: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Boxes xyxy (px, recortadas à ROI, ou à imagem com crop=False) e
+        índices dos veículos visíveis (ao menos MIN_ROWS linhas) no frame `f`.
+        """
+        x0, y0, x1, y1 = self.crop if crop else (0, 0) + self.size
+        top   = self._tops(f)
+        left  = np.array(self.lanes)[self.cars[:,0]]
+        yt    = np.clip(top, y0, y1)
+        yb    = np.clip(top + CAR_H, y0, y1)
+        idx   = np.flatnonzero((yb - yt >= MIN_ROWS) & (left >= x0) & (left + CAR_W <= x1))
+        boxes = np.stack([left[idx], yt[idx], left[idx] + CAR_W, yb[idx]], axis=1).astype(np.float32)
+        return boxes, idx
+
+    def render(self, path: str, fourcc: str = 'mp4v') -> str:
+        W, H   = self.size
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), self.fps, (W, H))
+        frame  = np.empty((H, W, 3), dtype=np.uint8)
+        for f in range(self.frames):
+            frame[:] = BACKGROUND
+            boxes, _ = self.boxes(f, crop=False)
+            for x1, y1, x2, y2 in boxes.astype(int).tolist():
+                cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), CAR_COLOR, -1)
+            writer.write(frame)
+        writer.release()
+        return path
+
+    def ground_truth(self) -> Dict[str, int]:
+        """
+        Totais esperados ao fim do clipe: veículos que aparecem (na ROI) e que
+        cruzam a linha no verde/vermelho.
+        """
+        seen = set()
+        for f in range(self.frames):
+            seen.update(self.boxes(f)[1].tolist())
+        green = red = 0
+        for i, (_, _, cross) in enumerate(self.cars.tolist()):
+            if 0 <= cross < self.frames and i in seen:
+                if signal_light(cross / self.fps, self.green + self.red, self.green) == 'green':
+                    green += 1
+                else:
+                    red += 1
+        return {'detected': len(seen), 'green': green, 'red': red, 'passed': green + red}
+
+    def results(self) -> List[CachedResult]:
+        """
+        Resultados de model.track perfeitos (ids = índice do veículo + 1, em
+        coordenadas do frame inteiro) de todos os frames, para medir a
+        contagem sem decodificar nem detectar.
+        """
+        out = []
+        for f in range(self.frames):
+            boxes, idx = self.boxes(f)
+            n = len(idx)
+            out.append(CachedResult({
+                'id': idx + 1, 'cls': np.full(n, VEHICLE_CLASSES[0]), 'conf': np.ones(n, dtype=np.float32),
+                'x1': boxes[:,0], 'y1': boxes[:,1], 'x2': boxes[:,2], 'y2': boxes[:,3]}))
+        return out
+
+
+class _CentroidTracker:
+    """
+    Associação por faixa: cada box continua o track da mesma coluna logo
+    acima dela (até `max_jump` px), ou abre um id novo.
+    """
+    def __init__(self, max_jump: float = 80.0, max_age: int = 30):
+        self.max_jump = max_jump
+        self.max_age  = max_age
+        self.reset()
+
+    def reset(self):
+        self.tracks: Dict[int, Tuple[float, float, int]] = {}
+        self.next_id  = 1
+        self.calls    = 0
+
+    def update(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        self.calls += 1
+        ids  = np.zeros(len(cx), dtype=np.int64)
+        used = set()
+        for i in np.argsort(-cy, kind='stable').tolist():
+            best, best_dy = None, None
+            for tid, (tx, ty, _) in self.tracks.items():
+                dy = cy[i] - ty
+                if tid not in used and abs(cx[i] - tx) < CAR_W / 2 and -2 <= dy <= self.max_jump \
+                        and (best_dy is None or dy < best_dy):
+                    best, best_dy = tid, dy
+            if best is None:
+                best = self.next_id
+                self.next_id += 1
+            used.add(best)
+            ids[i] = best
+            self.tracks[best] = (float(cx[i]), float(cy[i]), self.calls)
+        self.tracks = {tid: t for tid, t in self.tracks.items() if self.calls - t[2] <= self.max_age}
+        return ids
+
+
+class StubDetector:
+    """
+    Substituto do YOLO para CarCounter(model=...): detecta os retângulos
+    claros por limiar + componentes conexos e associa por faixa. O tracking
+    segue o contrato do ultralytics: model.track sem `predictor.trackers`
+    registra os callbacks on_predict_start (cria os trackers) e
+    on_predict_postprocess_end (atualiza), que se acumulam em `callbacks`;
+    persist, reset e checkpoints funcionam igual. `speed` traz os tempos em
+    ms, como result.speed, para lib.profiling.
+    """
+    def __init__(self, max_jump: float = 80.0):
+        self.max_jump  = max_jump
+        self.predictor = None
+        self.callbacks: Dict[str, List[Callable]] = {'on_predict_start': [], 'on_predict_postprocess_end': []}
+
+    def add_callback(self, event: str, func: Callable):
+        self.callbacks[event].append(func)
+
+    def _on_predict_start(self, persist: bool = False):
+        if persist and hasattr(self.predictor, 'trackers'):
+            return
+        self.predictor.trackers = [_CentroidTracker(self.max_jump)]
+
+    def _on_predict_postprocess_end(self, det: Dict[str, np.ndarray]):
+        det['id'] = self.predictor.trackers[0].update((det['x1'] + det['x2']) / 2, (det['y1'] + det['y2']) / 2)
+
+    def track(self, source: np.ndarray, persist: bool = False, **kwargs) -> List[Any]:
+        if not hasattr(self.predictor, 'trackers'):
+            self.add_callback('on_predict_start', functools.partial(self._on_predict_start, persist=persist))
+            self.add_callback('on_predict_postprocess_end', self._on_predict_postprocess_end)
+        if self.predictor is None:
+            self.predictor = SimpleNamespace()
+        for callback in self.callbacks['on_predict_start']:
+            callback()
+
+        t0   = time.perf_counter()
+        mask = (cv2.cvtColor(source, cv2.COLOR_BGR2GRAY) > 150).astype(np.uint8)
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        st   = stats[1:n]
+        st   = st[st[:, cv2.CC_STAT_AREA] >= CAR_W * MIN_ROWS]
+        x, y, w, h = (st[:, k].astype(np.float32) for k in (cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP,
+                                                              cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT))
+        det  = {'id': np.zeros(len(x), dtype=np.int64), 'cls': np.full(len(x), VEHICLE_CLASSES[0]),
+                'conf': np.ones(len(x), dtype=np.float32), 'x1': x, 'y1': y, 'x2': x + w, 'y2': y + h}
+        t1   = time.perf_counter()
+        for callback in self.callbacks['on_predict_postprocess_end']:
+            callback(det)
+        t2   = time.perf_counter()
+
+        result = CachedResult(det)
+        result.orig_img = source
+        result.speed    = {'preprocess': 0.0, 'inference': 1e3 * (t1 - t0), 'postprocess': 1e3 * (t2 - t1)}
+        return [result]
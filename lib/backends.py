@@ -0,0 +1,194 @@
+"""
+Backends de inferência para os pesos YOLO.
+
+Os pesos PyTorch são exportados uma única vez pelo próprio ultralytics
+(model.export) e o artefato fica ao lado dos pesos, por exemplo
+`yolov8n_fp32.onnx` ou `yolov8n_int8_openvino_model/`. O YOLO carrega
+qualquer um deles com a mesma interface (model.track), logo tracker e
+contagem não mudam.
+
+  torch:       os pesos como estão (CUDA com half, se houver GPU)
+  torchscript: fp32
+  onnx:        fp32; int8 por quantização dinâmica do onnxruntime (com os
+               metadados do ultralytics copiados do fp32 e conferidos)
+  openvino:    fp32 ou int8 (calibrado pelo ultralytics com `data`)
+
+backend="auto" mede cada backend disponível em poucos frames e guarda a
+escolha em `<pesos>.backend.json`, por máquina (CPU) e precisão.
+"""
+import importlib.util
+import json
+import os
+import platform
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from ultralytics import YOLO # type:ignore
+
+# backend -> (formato do model.export, sufixo do artefato, pacote exigido)
+BACKENDS: Dict[str, Tuple[Optional[str], str, Optional[str]]] = {
+    'torch':       (None, '', None),
+    'torchscript': ('torchscript', '.torchscript', None),
+    'onnx':        ('onnx', '.onnx', 'onnxruntime'),
+    'openvino':    ('openvino', '_openvino_model', 'openvino'),
+}
+PRECISIONS: Dict[str, Tuple[str, ...]] = {
+    'torch':       ('fp32',),
+    'torchscript': ('fp32',),
+    'onnx':        ('fp32', 'int8'),
+    'openvino':    ('fp32', 'int8'),
+}
+
+# padrão dos nós de contagem; sobrescrito por variável de ambiente
+DEFAULT_BACKEND   = os.environ.get("TRAFFIC_BACKEND", "torch")
+DEFAULT_PRECISION = os.environ.get("TRAFFIC_PRECISION", "fp32")
+
+# metadados do export ONNX do ultralytics que o YOLO(path) lê ao carregar
+ONNX_METADATA = ('names', 'stride', 'imgsz')
+
+_export_lock = threading.RLock()
+
+
+def available() -> List[str]:
+    """
+    Backends cujos pacotes de runtime estão instalados.
+    """
+    return [name for name, (_, _, pkg) in BACKENDS.items()
+            if pkg is None or importlib.util.find_spec(pkg) is not None]
+
+
+def artifact_path(model_path: str, backend: str, precision: str = 'fp32') -> str:
+    """
+    Onde fica o artefato exportado de `model_path` (ao lado dos pesos).
+    """
+    if backend == 'torch':
+        return model_path
+    stem = os.path.splitext(model_path)[0]
+    return f"{stem}_{precision}{BACKENDS[backend][1]}"
+
+
+def export(model_path: str, backend: str, precision: str = 'fp32',
+           imgsz: int = 640, data: Optional[str] = None) -> str:
+    """
+    Caminho do artefato de `backend`/`precision`, exportando-o se ainda não existe.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend} (opções: {', '.join(BACKENDS)})")
+    if precision not in PRECISIONS[backend]:
+        raise ValueError(f"Precisão {precision} não suportada por {backend}: {PRECISIONS[backend]}")
+    if backend == 'torch':
+        return model_path
+
+    target = artifact_path(model_path, backend, precision)
+    with _export_lock:
+        if os.path.exists(target):
+            return target
+        fmt = BACKENDS[backend][0]
+        if backend == 'onnx' and precision == 'int8':
+            return _quantize_onnx(export(model_path, 'onnx', 'fp32', imgsz), target, imgsz)
+
+        kwargs = {'int8': True, 'data': data} if precision == 'int8' else {}
+        exported = YOLO(model_path).export(format=fmt, imgsz=imgsz, device='cpu', **kwargs)
+        # o ultralytics usa o mesmo nome para fp32 e int8 em alguns formatos
+        os.replace(str(exported), target)
+        return target
+
+
+def _quantize_onnx(source: str, target: str, imgsz: int) -> str:
+    """
+    Quantização dinâmica (int8) de `source` em `target`. Os metadata_props
+    do export (ONNX_METADATA) são copiados do fp32 e o arquivo só vira
+    `target` depois de carregar e rodar um predict com o YOLO.
+    """
+    import onnx # type:ignore
+    from onnxruntime.quantization import QuantType, quantize_dynamic # type:ignore
+
+    # o YOLO reconhece o formato pela extensão
+    tmp = f"{os.path.splitext(target)[0]}.partial.onnx"
+    try:
+        quantize_dynamic(source, tmp, weight_type=QuantType.QUInt8)
+        meta  = {p.key: p.value for p in onnx.load(source, load_external_data=False).metadata_props}
+        model = onnx.load(tmp)
+        have  = {p.key for p in model.metadata_props}
+        for key, value in meta.items():
+            if key not in have:
+                model.metadata_props.add(key=key, value=value)
+        missing = [key for key in ONNX_METADATA if key not in meta]
+        if missing:
+            raise ValueError(f"{source} sem os metadados do ultralytics: {', '.join(missing)}")
+        onnx.save(model, tmp)
+
+        img = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        YOLO(tmp, task='detect').predict(img, device='cpu', verbose=False)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return target
+
+
+def host_id() -> str:
+    return f"{platform.machine()}|{platform.processor() or platform.system()}|{os.cpu_count()}"
+
+
+def _measure(path: str, frames: int, imgsz: int) -> float:
+    """
+    Frames/s de model.predict em imagens sintéticas (após aquecimento).
+    """
+    model = YOLO(path, task='detect')
+    img   = np.random.default_rng(0).integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8)
+    for _ in range(2):
+        model.predict(img, device='cpu', verbose=False)
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        model.predict(img, device='cpu', verbose=False)
+    return frames / (time.perf_counter() - t0)
+
+
+def auto_select(model_path: str, precision: str = 'fp32', frames: int = 20,
+                imgsz: int = 640, data: Optional[str] = None) -> Tuple[str, str]:
+    """
+    (backend, caminho do artefato) mais rápido nesta máquina para `precision`,
+    entre os disponíveis que a suportam. O resultado é guardado em
+    `<pesos>.backend.json` e só é medido de novo em outra máquina.
+    """
+    cache_path = f"{os.path.splitext(model_path)[0]}.backend.json"
+    cache: Dict[str, Dict] = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    key = f"{host_id()}|{precision}"
+    if key in cache and cache[key]['backend'] in available():
+        backend = cache[key]['backend']
+        return backend, export(model_path, backend, precision, imgsz, data)
+
+    fps: Dict[str, float] = {}
+    for backend in available():
+        if precision not in PRECISIONS[backend]:
+            continue
+        try:
+            fps[backend] = _measure(export(model_path, backend, precision, imgsz, data), frames, imgsz)
+        except Exception as e:
+            print(f"[backends] {backend} indisponível: {e!r}")
+    if not fps:
+        raise RuntimeError(f"Nenhum backend suporta {precision} nesta máquina")
+
+    best = max(fps, key=fps.get) # type:ignore
+    cache[key] = {'backend': best, 'fps': fps, 'measured_at': time.time()}
+    with open(cache_path, "w") as f:
+        json.dump(cache, f, indent=4)
+    return best, artifact_path(model_path, best, precision)
+
+
+def resolve(model_path: str, backend: str = DEFAULT_BACKEND, precision: str = DEFAULT_PRECISION,
+            device: str = 'cpu') -> Tuple[str, str]:
+    """
+    (backend efetivo, caminho a carregar com YOLO) para os pesos `model_path`.
+    Em GPU os exports de CPU não se aplicam: sempre torch.
+    """
+    if device != 'cpu' or backend == 'torch':
+        return 'torch', model_path
+    if backend == 'auto':
+        return auto_select(model_path, precision)
+    return backend, export(model_path, backend, precision)
@@ -0,0 +1,227 @@
+"""
+Processamento em lote de vários vídeos em um pool de processos.
+
+Cada worker carrega o modelo YOLO uma única vez e processa vídeos inteiros,
+gravando as pastas de resultado usuais em `.videos/<id>/`.
+
+Uso:
+  python -m lib.batch "gravacoes/*.mp4" --config config.json --workers 4 --threads 2
+
+O config de cada vídeo é CONFIG_DEFAULTS, sobrescrito por `--config` e por um
+`<video>.json` ao lado do vídeo, se existir (mesmas chaves do config.json).
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import torch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Sequence
+from lib.car_counter import CarCounter
+from lib import backends, results, tracks
+
+_counter: Optional[CarCounter] = None
+
+
+def init_worker(model_path: str, threads: int, backend: str = 'torch', precision: str = 'fp32'):
+    """
+    Inicializador dos pools de processos (lote e lib.chunked): limita
+    threads de torch/OpenCV, carrega o modelo do worker e adia as remoções e
+    métricas do cache de tracks para o processo pai (lib.tracks.defer).
+    """
+    global _counter
+    tracks.defer()
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    _counter = CarCounter(model_path=model_path, backend=backend, precision=precision)
+
+
+def worker_counter() -> CarCounter:
+    """
+    CarCounter do worker atual, carregado por init_worker.
+    """
+    if _counter is None:
+        raise RuntimeError("Worker sem modelo: use init_worker como initializer do pool")
+    return _counter
+
+
+def _run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    counter = worker_counter()
+    result_path = f"{job['results_dir']}/{job['result_id']}"
+    os.makedirs(result_path, exist_ok=True)
+
+    t0 = time.perf_counter()
+    result = counter.process(
+        job['video'],
+        output=f"{result_path}/video.mp4" if job['write_video'] else None,
+        detections_path=f"{result_path}/detections.parquet",
+        zones_path=f"{result_path}/zones.parquet",
+        tracks_dir=tracks.TRACKS_DIR,
+        **results.process_kwargs(job['config'])
+    )
+    results.save_results(result_path, None, result.stats, job['config'], info=result.info, catalog=False,
+                         zone_stats=result.zone_stats)
+    elapsed = time.perf_counter() - t0
+    frames  = result.info['frames']
+
+    return {
+        'video': job['video'],
+        'result_id': job['result_id'],
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed else 0.0,
+        'pid': os.getpid(),
+        'cache': tracks.take_deferred(),
+    }
+
+
+def expand_videos(patterns: Sequence[str]) -> List[str]:
+    """
+    Expande globs e remove duplicados, preservando a ordem.
+    """
+    videos: List[str] = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        videos += [v for v in matches if v not in videos]
+    return videos
+
+
+def video_config(video: str, config_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Config de um vídeo: `config_path` sobrescrito por `<video>.json`, se existir.
+    """
+    config  = results.load_config(config_path)
+    sidecar = os.path.splitext(video)[0] + '.json'
+    if os.path.exists(sidecar):
+        with open(sidecar, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def process_batch(
+    videos: Sequence[str],
+    configs: Optional[Sequence[Dict[str, Any]]] = None,
+    model_path: str = 'yolov8n.pt',
+    workers: int = 2,
+    threads: int = 1,
+    results_dir: str = results.RESULTS_DIR,
+    write_video: bool = True,
+    verbose: int = 1,
+    backend: str = backends.DEFAULT_BACKEND,
+    precision: str = backends.DEFAULT_PRECISION,
+) -> Dict[str, Any]:
+    """
+    Processa `videos` (cada um com o config correspondente em `configs`) em
+    `workers` processos, cada um com no máximo `threads` threads de torch.
+
+    Retorna o relatório agregado: vídeos processados, frames, tempo total e
+    frames/s do lote e de cada vídeo.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    configs = configs if configs is not None else [results.load_config() for _ in videos]
+
+    # ids atribuídos aqui para não haver corrida entre workers
+    jobs = [
+        {
+            'video': video,
+            'config': config,
+            'result_id': results.next_result_id(
+                os.path.splitext(os.path.basename(video))[0], results_dir, offset=i),
+            'results_dir': results_dir,
+            'write_video': write_video,
+        }
+        for i, (video, config) in enumerate(zip(videos, configs))
+    ]
+    for job in jobs:
+        os.makedirs(f"{results_dir}/{job['result_id']}", exist_ok=True)
+
+    # exporta (ou mede, com auto) uma única vez aqui; os workers só leem o cache
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    backend, _ = backends.resolve(model_path, backend, precision, device)
+    if verbose:
+        print(f"Backend: {backend} ({precision})")
+
+    done: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context('spawn'),
+        initializer=init_worker,
+        initargs=(model_path, threads, backend, precision),
+    ) as pool:
+        futures = {pool.submit(_run_job, job): job for job in jobs}
+        for fut in as_completed(futures):
+            job = futures[fut]
+            try:
+                rep = fut.result()
+                # só este processo escreve no catálogo e nas métricas do cache
+                results.update_catalog(results_dir, results.read_meta(f"{results_dir}/{rep['result_id']}"))
+                if rep['cache']:
+                    tracks.record(tracks.TRACKS_DIR, **rep['cache'])
+                done.append(rep)
+                if verbose:
+                    print(f"[ok] {rep['video']} -> {rep['result_id']} "
+                          f"({rep['frames']} frames, {rep['fps']:.1f} frames/s)")
+            except Exception as e:
+                failed.append({'video': job['video'], 'error': repr(e)})
+                if verbose:
+                    print(f"[erro] {job['video']}: {e!r}")
+    wall = time.perf_counter() - t0
+    # os workers não removem entradas (lib.tracks.defer): limite do cache aplicado uma vez
+    tracks.evict(tracks.TRACKS_DIR)
+
+    frames = sum(r['frames'] for r in done)
+    report = {
+        'videos': len(done),
+        'failed': failed,
+        'frames': frames,
+        'seconds': wall,
+        'fps': frames / wall if wall else 0.0,
+        'workers': workers,
+        'threads_per_worker': threads,
+        'jobs': sorted(done, key=lambda r: r['result_id']),
+    }
+    if verbose:
+        print(f"Lote: {len(done)} vídeos, {frames} frames em {wall:.1f}s "
+              f"= {report['fps']:.1f} frames/s ({workers} workers x {threads} threads)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='+', help="arquivos ou globs de vídeos")
+    parser.add_argument('--config', default=None, help="config.json padrão do lote")
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--threads', type=int, default=1, help="threads de torch por worker")
+    parser.add_argument('--results-dir', default=results.RESULTS_DIR)
+    parser.add_argument('--no-video', action='store_true', help="só gera os CSVs, sem vídeo anotado")
+    parser.add_argument('--backend', default=backends.DEFAULT_BACKEND, choices=[*backends.BACKENDS, 'auto'])
+    parser.add_argument('--precision', default=backends.DEFAULT_PRECISION, choices=['fp32', 'int8'])
+    parser.add_argument('--profile', choices=['timers', 'cprofile'],
+                        help="grava profile.json (e profile.prof) em cada resultado")
+    args = parser.parse_args()
+
+    videos  = expand_videos(args.videos)
+    configs = [video_config(v, args.config) for v in videos]
+    if args.profile:
+        configs = [{**config, 'profile': args.profile} for config in configs]
+    process_batch(
+        videos,
+        configs,
+        model_path=args.model,
+        workers=args.workers,
+        threads=args.threads,
+        results_dir=args.results_dir,
+        write_video=not args.no_video,
+        backend=args.backend,
+        precision=args.precision,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,130 @@
 import cv2
 import numpy as np
 import pandas as pd # type:ignore
-from typing import Tuple, Union, List, Dict, Literal
+from typing import Any, Tuple, Union, List, Dict, Literal, Optional, Iterator, Callable, Sequence
 from ultralytics import YOLO # type:ignore
+from ultralytics.trackers.track import TRACKER_MAP # type:ignore
+from ultralytics.utils import IterableSimpleNamespace, yaml_load # type:ignore
+from ultralytics.utils.checks import check_yaml # type:ignore
 from tqdm.auto import tqdm # type:ignore
+import dataclasses
+import functools
+import inspect
+import os
+import pickle
+import threading
+import time
 import torch
 from stqdm import stqdm #type:ignore
+from lib.models import registry
+from lib import backends, encoding, profiling, tracks as track_cache
+from lib.streaming import FrameGrabber, IdHorizon, RotatingDetectionWriter, StatsRoller
+from lib.pipeline import StageTimes, run_pipeline
+from lib.sink import DetectionSink, ProcessResult, StatsAccumulator
+from lib.results import ZONE_DTYPES
+from lib.zones import ZoneCounter, count_zones
+from lib.counting import FrameStride, LineCounter, TrackState, VEHICLE_CLASSES, PASS_COLORS, signal_light
+
+DETECTION_COLUMNS = ['time','id','x1','y1','pass']
+TRACK_COLUMNS     = ['frame','id','cls','conf','x1','y1','x2','y2']
+STATS_COLUMNS     = ['time','detected','detected_total','green','green_total',
+                     'red','red_total','passed','passed_total']
+
+def _tracker_config(tracker_model: str) -> IterableSimpleNamespace:
+    return IterableSimpleNamespace(**yaml_load(check_yaml(f"{tracker_model}.yaml")))
+
+
+def make_tracker(tracker_model: str):
+    """
+    Tracker independente, configurado como no model.track(tracker=f'{tracker_model}.yaml').
+    """
+    cfg = _tracker_config(tracker_model)
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=30)
+
+
+def _exclusive(method):
+    """
+    Segura o lock do modelo durante a chamada (ou, em geradores, durante toda
+    a iteração): o estado do tracker pertence ao modelo, que pode ser compartilhado.
+    """
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def gen_wrapper(self, *args, **kwargs):
+            with self.lock:
+                yield from method(self, *args, **kwargs)
+        return gen_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+@dataclasses.dataclass
+class ProcessOptions:
+    """
+    Opções de CarCounter.process.
+    """
+    # detecção+tracking; só o recorte `roi` (cantos normalizados ou px) vai
+    # para o modelo, roi_margin define a ROI em volta da linha
+    conf: float = 0.25
+    iou: float = 0.45
+    tracker_model: Literal['botsort','bytetrack'] = 'botsort'
+    roi: Optional[Tuple[Tuple[float,float],Tuple[float,float]]] = None
+    roi_margin: Optional[float] = None
+    # rastreia a cada `stride` frames; adaptive: 1 com veículos (até max_speed px/frame) perto da linha
+    stride: int = 1
+    adaptive: bool = False
+    max_speed: float = 15.0
+    # semáforo (s) e linhas/polígonos extras ({"name", "points"}, ver lib.zones)
+    green_duration: int = 20
+    red_duration: int = 5
+    zones: Optional[Sequence[Dict[str,Any]]] = None
+    # vídeo (lib.encoding); sem os caminhos as detecções ficam em memória
+    output_mode: Literal['full','preview','events','overlay'] = 'full'
+    detections_path: Optional[str] = None
+    zones_path: Optional[str] = None
+    # cache de tracks e do vídeo gerado, com checkpoints a cada checkpoint_s s (lib.tracks)
+    tracks_dir: Optional[str] = None
+    checkpoint_s: float = track_cache.CHECKPOINT_S
+    # estágios em threads (tempos em stage_times), progress(feitos, total) e perfil (lib.profiling)
+    pipelined: bool = False
+    queue_size: int = 8
+    progress: Optional[Callable[[int,int],None]] = None
+    profile: Optional[Literal['timers','cprofile']] = None
+
 
 class CarCounter:
-    def __init__(self, model_path: str = 'yolov8n.pt', verbose: int = 0, streamlit: bool = False):
+    def __init__(self, model_path: str = 'yolov8n.pt', verbose: int = 0, streamlit: bool = False,
+                 shared: bool = False, backend: str = backends.DEFAULT_BACKEND,
+                 precision: str = backends.DEFAULT_PRECISION, model: Any = None):
         """
         model_path: caminho para pesos YOLOv8
         verbose: nível de log (0 silencia, ≥1 mostra)
+        shared: usa o modelo do registro do processo (lib.models.registry),
+                carregado e aquecido uma única vez por (pesos, device, half)
+        backend: torch, torchscript, onnx, openvino ou auto (ver lib.backends);
+                 o artefato exportado fica em cache ao lado dos pesos
+        precision: fp32 ou int8 (onnx/openvino)
+        model: objeto com a interface de YOLO (track) usado no lugar dos pesos,
+               sem carregá-los (ex.: o detector sintético de benchmarks.synthetic)
         """
         self.device  = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.fp16    = (self.device != 'cpu')
-        self.model   = YOLO(model_path)
+        if model is not None:
+            self.backend, self.model_path = 'torch', model_path
+            self.model, self.lock = model, threading.RLock()
+        else:
+            self.backend, self.model_path = backends.resolve(model_path, backend, precision, self.device)
+            if shared:
+                self.model, self.lock = registry.get(self.model_path, self.device, self.fp16)
+            else:
+                self.model, self.lock = YOLO(self.model_path, task='detect'), threading.RLock()
         self.verbose = verbose
         self.tqdm    = stqdm if streamlit else tqdm
+        self.stage_times: Optional[StageTimes] = None
+        self.stream_status: Dict[str,float] = {}
 
     def _log(self, msg: str, level: int = 1):
         if self.verbose >= level:
@@ -29,11 +136,34 @@ class CarCounter:
             raise IOError(f"Cannot open video: {path}")
         return cap
 
-    def _init_writer(self, output: str, fps: float, size: Tuple[int,int]) -> cv2.VideoWriter:
-        fourcc = cv2.VideoWriter_fourcc(*'h264') # type:ignore
-        return cv2.VideoWriter(output, fourcc, fps, size)
+    @staticmethod
+    def _seek(cap: cv2.VideoCapture, start: int):
+        """
+        Posiciona `cap` para que o próximo read seja o frame `start`. O seek
+        do OpenCV nem sempre é exato em H.264: a posição é conferida depois
+        dele e completada com grab; se passou do ponto, volta ao início e
+        avança frame a frame.
+        """
+        if start <= 0:
+            return
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        pos = int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+        if not 0 <= pos <= start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            pos = 0
+        while pos < start and cap.grab():
+            pos += 1
 
-    def _compute_line(self, points: Tuple[Tuple[float,float],Tuple[float,float]],
+    def _init_writer(self, output: str, fps: float, size: Tuple[int,int],
+                     mode: str = 'full', source: Optional[str] = None) -> encoding.VideoOutput:
+        """
+        Saída do vídeo anotado no modo `mode` (ver lib.encoding); `source` é o
+        vídeo original, copiado no modo overlay.
+        """
+        return encoding.open_output(mode, output, fps, size, source or output)
+
+    @staticmethod
+    def _compute_line(points: Tuple[Tuple[float,float],Tuple[float,float]],
                       W: int, H: int) -> Tuple[Tuple[int,int],Tuple[int,int]]:
         def to_px(pt):
             x,y = pt
@@ -41,181 +171,691 @@ class CarCounter:
                     int(y*H) if 0<=y<=1 else int(y))
         return to_px(points[0]), to_px(points[1])
 
+    def _compute_roi(self, roi: Optional[Tuple[Tuple[float,float],Tuple[float,float]]],
+                     roi_margin: Optional[float], p1: Tuple[int,int], p2: Tuple[int,int],
+                     W: int, H: int) -> Optional[Tuple[int,int,int,int]]:
+        """
+        Região (x1,y1,x2,y2 em px) enviada ao modelo, ou None para o frame inteiro.
+          roi: dois cantos, normalizados (0-1) ou em px, como `points`
+          roi_margin: sem `roi`, usa a caixa da linha expandida por esta fração
+                      de W/H em cada direção
+        """
+        if roi is not None:
+            (x1,y1),(x2,y2) = self._compute_line(roi, W, H)
+        elif roi_margin is not None:
+            mx, my = int(roi_margin*W), int(roi_margin*H)
+            x1, x2 = min(p1[0],p2[0]) - mx, max(p1[0],p2[0]) + mx
+            y1, y2 = min(p1[1],p2[1]) - my, max(p1[1],p2[1]) + my
+        else:
+            return None
+        x1, x2 = sorted((int(np.clip(x1, 0, W)), int(np.clip(x2, 0, W))))
+        y1, y2 = sorted((int(np.clip(y1, 0, H)), int(np.clip(y2, 0, H))))
+        if x2 - x1 < 2 or y2 - y1 < 2 or (x1, y1, x2, y2) == (0, 0, W, H):
+            return None
+        return x1, y1, x2, y2
+
+    @staticmethod
+    def _extract_tracks(result, offset: Tuple[int,int] = (0,0)) -> Dict[str,np.ndarray]:
+        """
+        Todas as boxes rastreadas de um resultado do model.track() (todas as
+        classes), em coordenadas do frame inteiro: colunas de TRACK_COLUMNS sem 'frame'.
+        """
+        if result is None or result.boxes is None or result.boxes.id is None:
+            boxes = np.empty((0,4), dtype=np.float32)
+            ids = cls = np.empty(0, dtype=int)
+            conf = np.empty(0, dtype=np.float32)
+        else:
+            boxes = result.boxes.xyxy.cpu().numpy()
+            ids   = result.boxes.id.cpu().numpy().astype(int)
+            cls   = result.boxes.cls.cpu().numpy().astype(int)
+            conf  = result.boxes.conf.cpu().numpy()
+        if offset != (0,0):
+            boxes = boxes + np.array([offset[0], offset[1], offset[0], offset[1]], dtype=boxes.dtype)
+        return {'id': ids, 'cls': cls, 'conf': conf,
+                'x1': boxes[:,0], 'y1': boxes[:,1], 'x2': boxes[:,2], 'y2': boxes[:,3]}
+
+    @staticmethod
+    def _extract_boxes(result, offset: Tuple[int,int] = (0,0)) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extrai de um resultado do model.track() as boxes xyxy e ids dos veículos,
+        deslocadas por `offset` (canto da ROI) para coordenadas do frame inteiro.
+        """
+        if result is None or result.boxes is None or result.boxes.id is None:
+            return np.empty((0,4), dtype=np.float32), np.empty(0, dtype=int)
+        boxes = result.boxes.xyxy.cpu().numpy()
+        ids   = result.boxes.id.cpu().numpy().astype(int)
+        cls   = result.boxes.cls.cpu().numpy().astype(int)
+        mask  = np.isin(cls, VEHICLE_CLASSES)
+        boxes = boxes[mask]
+        if offset != (0,0):
+            boxes = boxes + np.array([offset[0], offset[1], offset[0], offset[1]], dtype=boxes.dtype)
+        return boxes, ids[mask]
+
+    @staticmethod
+    def _draw(frame: np.ndarray, boxes: np.ndarray, ids: np.ndarray, passes: np.ndarray):
+        """
+        Desenha boxes e ids em `frame`, coloridos pelo estado de passagem.
+        """
+        for (x1i,y1i,x2i,y2i), tid, ps in zip(boxes.astype(int).tolist(), ids.tolist(), passes.tolist()):
+            color = PASS_COLORS[ps+1]
+            cv2.rectangle(frame, (x1i,y1i), (x2i,y2i), color, 2)
+            cv2.putText(frame, f"ID{tid}", (x1i, y1i-5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    @classmethod
+    def _annotate(cls, frame: np.ndarray, line: LineCounter, light: str, boxes: np.ndarray,
+                  ids: np.ndarray, passes: np.ndarray, roi: Optional[Tuple[int,int,int,int]] = None):
+        """
+        Desenha em `frame` a ROI, a linha na cor do semáforo e as boxes.
+        """
+        line_color = (0,255,0) if light=='green' else (0,0,255)
+        if roi is not None:
+            cv2.rectangle(frame, roi[:2], roi[2:], (128,128,128), 1)
+        cv2.line(frame, line.p1, line.p2, line_color, 2)
+        cls._draw(frame, boxes, ids, passes)
+
     def _process_frame(
         self,
         result,
         idx: int,
         fps: float,
-        p1: Tuple[int,int],
-        p2: Tuple[int,int],
+        line: LineCounter,
         cycle: int,
         green_dur: int,
-        pass_state: Dict[int,int]
-    ) -> Tuple[List[Dict], np.ndarray, int, int]:
+        pass_state: TrackState,
+        frame: Optional[np.ndarray] = None,
+        annotate: bool = True,
+        held: Optional[Dict[str,np.ndarray]] = None,
+        roi: Optional[Tuple[int,int,int,int]] = None,
+        prof: profiling.Profiler = profiling.DISABLED
+    ) -> Tuple[Dict[str,np.ndarray], Optional[np.ndarray], int, int]:
         """
         Processa um único frame:
-          - result: saída do model.track()
+          - result: saída do model.track(), ou None em frames pulados (stride)
           - idx, fps: para time
-          - p1, p2: linha de contagem
-          - cycle, green_dur, red_dur: semáforo
-          - pass_state: dict[id] -> -1/0/1
+          - line: linha de contagem (LineCounter)
+          - cycle, green_dur: semáforo
+          - pass_state: TrackState (id -> -1/0/1)
+          - frame: imagem onde desenhar (padrão result.orig_img), anotada in-place
+          - annotate: se False não desenha nada
+          - held: últimas boxes/ids vistos; atualizado aqui e redesenhado nos
+            frames pulados, que não geram registros
+          - roi: recorte (x1,y1,x2,y2) usado na inferência; as boxes são
+            mapeadas de volta para o frame inteiro
+          - prof: etapas count e draw (lib.profiling)
         Retorna:
-          det_recs: lista de registros deste frame,
-          annotated: frame anotado,
+          dets: colunas ['time','id','x1','y1','pass'] deste frame,
+          annotated: frame anotado (None se annotate=False),
           inc_green, inc_red: incrementos de contagem
         """
-        frame = result.orig_img
         ts    = idx / fps
 
         # semáforo
-        light = 'green' if (int(ts) % cycle) < green_dur else 'red'
-        line_color = (0,255,0) if light=='green' else (0,0,255)
-
-        annotated = frame.copy()
-        cv2.line(annotated, p1, p2, line_color, 2)
-
-        # extração
-        boxes = result.boxes.xyxy.cpu().numpy()
-        ids   = result.boxes.id.cpu().numpy().astype(int)
-        cls   = result.boxes.cls.cpu().numpy().astype(int)
-        mask  = np.isin(cls, [2,3,5,7])
-        boxes = boxes[mask]
-        ids   = ids[mask]
-
-        inc_g = inc_r = 0
-        det_recs: List[Dict] = []
+        light = signal_light(ts, cycle, green_dur)
 
-        for (x1,y1,x2,y2), tid in zip(boxes, ids):
-            cx, cy = int((x1+x2)/2), int((y1+y2)/2)
-            pass_state.setdefault(tid, 0)
+        with prof.stage('count'):
+            if result is not None:
+                # extração + contagem vetorizada
+                boxes, ids = self._extract_boxes(result, roi[:2] if roi else (0,0))
+                cx, cy, passes, inc_g, inc_r = line.update(boxes, ids, light, pass_state)
+                if held is not None:
+                    held['boxes'], held['ids'] = boxes, ids
+                rec_ids = ids
+            else:
+                # frame pulado: nenhum registro, redesenha as últimas boxes vistas
+                boxes, ids = (held['boxes'], held['ids']) if held else self._extract_boxes(None)
+                passes  = pass_state[ids]
+                inc_g   = inc_r = 0
+                rec_ids = cx = cy = ids[:0]
 
-            # distância à linha
-            dist = abs((p2[1]-p1[1])*cx - (p2[0]-p1[0])*cy +
-                       p2[0]*p1[1] - p2[1]*p1[0]) \
-                   / np.hypot(p2[1]-p1[1], p2[0]-p1[0])
-
-            if dist < 5 and pass_state[tid] == 0:
-                if light == 'green':
-                    pass_state[tid] = 1
-                    inc_g += 1
-                else:
-                    pass_state[tid] = -1
-                    inc_r += 1
-
-            det_recs.append({
-                'time': ts,
-                'id': tid,
+            dets = {
+                'time': np.full(len(rec_ids), ts),
+                'id': rec_ids,
                 'x1': cx,
                 'y1': cy,
-                'pass': pass_state[tid]
-            })
+                'pass': passes[:len(rec_ids)].astype(np.int64)
+            }
 
-            color = {0:(0,0,0), 1:(0,255,0), -1:(0,0,255)}[pass_state[tid]]
-            x1i,y1i,x2i,y2i = map(int, (x1,y1,x2,y2))
-            cv2.rectangle(annotated, (x1i,y1i), (x2i,y2i), color, 2)
-            cv2.putText(annotated, f"ID{tid}", (x1i, y1i-5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        annotated = None
+        if annotate:
+            with prof.stage('draw'):
+                annotated = result.orig_img if frame is None else frame
+                self._annotate(annotated, line, light, boxes, ids, passes, roi)
 
-        return det_recs, annotated, inc_g, inc_r
+        return dets, annotated, inc_g, inc_r
 
     @staticmethod
     def compute_stats_from_detections(df: pd.DataFrame) -> pd.DataFrame:
         """
         Reconstrói o DataFrame de estatísticas a partir do df de detecções por id do carro.
+        Uma linha por instante (frame), em uma única passada vetorizada.
         """
-        df = df.sort_values('time')
-        times = df['time'].unique()
-        first_appear = df.groupby('id')['time'].min()
+        if df.empty:
+            return pd.DataFrame(columns=STATS_COLUMNS)
+
+        # detecções por instante (groupby já ordena os tempos)
+        detected = df.groupby('time', sort=True).size()
+        times    = detected.index.to_numpy()
+
+        # ids vistos até t: primeira aparição de cada id, contada via searchsorted
+        first_appear = np.sort(df.groupby('id')['time'].min().to_numpy())
+        det_tot      = np.searchsorted(first_appear, times, side='right')
+
+        # primeira passagem (≠0) de cada id
         events = (
             df[df['pass'] != 0]
-              .sort_values('time')
-              .drop_duplicates('id', keep='first')[['time','pass']]
+              .sort_values('time', kind='stable')
+              .drop_duplicates('id', keep='first')
         )
-        green_ct = events[events['pass']==1]['time'].value_counts()
-        red_ct   = events[events['pass']==-1]['time'].value_counts()
-
-        rows, cum_g, cum_r = [], 0, 0
-        for t in times:
-            det     = int((df['time']==t).sum())
-            det_tot = int((first_appear <= t).sum())
-            g       = int(green_ct.get(t,0))
-            r       = int(red_ct.get(t,0))
-            cum_g  += g
-            cum_r  += r
-            rows.append({
-                'time': t,
-                'detected': det,
-                'detected_total': det_tot,
-                'green': g,
-                'green_total': cum_g,
-                'red': r,
-                'red_total': cum_r,
-                'passed': g+r,
-                'passed_total': cum_g+cum_r
-            })
-        return pd.DataFrame(rows)
+        green = events[events['pass']==1].groupby('time').size().reindex(times, fill_value=0).to_numpy()
+        red   = events[events['pass']==-1].groupby('time').size().reindex(times, fill_value=0).to_numpy()
+        cum_g = np.cumsum(green)
+        cum_r = np.cumsum(red)
 
-    def process(
+        return pd.DataFrame({
+            'time': times,
+            'detected': detected.to_numpy(),
+            'detected_total': det_tot,
+            'green': green,
+            'green_total': cum_g,
+            'red': red,
+            'red_total': cum_r,
+            'passed': green+red,
+            'passed_total': cum_g+cum_r
+        }).astype({c: np.int64 for c in STATS_COLUMNS[1:]})
+
+    def _read_frames(self, cap: cv2.VideoCapture, buffers: int = 1,
+                     decode: Optional[Callable[[int],bool]] = None) -> Iterator[Optional[np.ndarray]]:
+        """
+        Decodifica os frames de `cap` uma única vez, em um anel de `buffers`
+        buffers reaproveitados (um frame só é sobrescrito `buffers` frames
+        depois); com buffers=0 cada frame tem um array novo. Com `decode`, os
+        frames idx com decode(idx) falso só são avançados (grab) e saem como None.
+        """
+        ring: List[Optional[np.ndarray]] = [None] * max(buffers, 1)
+        idx = k = 0
+        while True:
+            if decode is not None and not decode(idx):
+                if not cap.grab():
+                    break
+                yield None
+            else:
+                ok, frame = cap.read(ring[k] if buffers else None)
+                if not ok:
+                    break
+                ring[k] = frame
+                k = (k + 1) % len(ring)
+                yield frame
+            idx += 1
+
+    def _reset_tracker(self, tracker_model: str):
+        """
+        Zera o estado do tracker (persistido entre chamadas de model.track) no
+        lugar. Apagar predictor.trackers faria o model.track registrar de novo
+        os callbacks de tracking, que se acumulam no modelo: depois de N
+        execuções o tracker rodaria N vezes por frame. Com outro
+        `tracker_model` os trackers são recriados pelo yaml, também no lugar.
+        """
+        trackers = getattr(getattr(self.model, 'predictor', None), 'trackers', None)
+        if not trackers:
+            return
+        # só trackers do ultralytics são trocados; outros (ex.: o do detector de teste) só zerados
+        builtin = type(trackers[0]) in TRACKER_MAP.values()
+        wanted  = TRACKER_MAP[_tracker_config(tracker_model).tracker_type] if builtin else None
+        for i, tracker in enumerate(trackers):
+            if builtin and type(tracker) is not wanted:
+                trackers[i] = make_tracker(tracker_model)
+            else:
+                tracker.reset()
+
+    def _tracker_state(self) -> Optional[bytes]:
+        """
+        Estado serializado do tracker (e do contador de ids dos tracks, que é
+        da classe), ou None se não há tracker ou ele não é serializável.
+        """
+        trackers = getattr(getattr(self.model, 'predictor', None), 'trackers', None)
+        if trackers is None:
+            return None
+        try:
+            from ultralytics.trackers.basetrack import BaseTrack # type:ignore
+            count = BaseTrack._count
+        except (ImportError, AttributeError):
+            count = None
+        try:
+            return pickle.dumps((trackers, count))
+        except Exception:
+            return None
+
+    def _restore_tracker(self, state: bytes, tracker_model: str) -> bool:
+        """
+        Restaura um estado de `_tracker_state`; o predictor, criado na primeira
+        chamada de model.track, é criado antes com um frame vazio.
+        """
+        try:
+            trackers, count = pickle.loads(state)
+            if getattr(self.model, 'predictor', None) is None:
+                self._track(np.zeros((64, 64, 3), dtype=np.uint8), 0.25, 0.45, tracker_model)
+            self.model.predictor.trackers = trackers
+            if count is not None:
+                from ultralytics.trackers.basetrack import BaseTrack # type:ignore
+                BaseTrack._count = count
+            return True
+        except Exception as e:
+            self._log(f"Estado do tracker não restaurado ({e!r}): retomada aproximada")
+            return False
+
+    def _track(self, frame: np.ndarray, conf: float, iou: float, tracker_model: str):
+        """
+        Detecção+tracking de um único frame já decodificado.
+        """
+        # https://docs.ultralytics.com/pt/modes/track/#available-trackers
+        return self.model.track(
+            source=frame,
+            persist=True,
+            tracker=f'{tracker_model}.yaml',
+            device=self.device,
+            half=self.fp16,
+            conf=conf,
+            iou=iou,
+            verbose=(self.verbose>=2)
+        )[0]
+
+    @_exclusive
+    def track_frames(
         self,
         video_path: str,
-        points: Tuple[Tuple[float,float],Tuple[float,float]],
-        output: str = 'output.mp4',
+        start: int = 0,
+        end: Optional[int] = None,
         conf: float = 0.25,
         iou: float = 0.45,
         tracker_model: Literal['botsort','bytetrack'] = 'botsort',
-        green_duration: int = 20,
-        red_duration: int = 5,
-    ) -> Tuple[pd.DataFrame, pd.DataFrame, str]:
+        roi: Optional[Tuple[Tuple[float,float],Tuple[float,float]]] = None,
+    ) -> Tuple[pd.DataFrame, float, Tuple[int,int]]:
         """
-        Executa detecção+tracking, salva vídeo anotado em `output`.
+        Detecção+tracking (sem contagem nem anotação) dos frames [start, end)
+        com um tracker novo.
 
         Retorna:
-          df: cada detecção ['time','id','x1','y1','pass']
-          stats_df: via compute_stats_from_detections(df)
-          output: caminho do arquivo MP4 gerado
-        """
-        cap    = self._open_video(video_path)
-        fps    = cap.get(cv2.CAP_PROP_FPS) or 30.0
-        W      = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        H      = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        writer = self._init_writer(output, fps, (W,H))
-        p1,p2  = self._compute_line(points, W, H)
-        cycle  = green_duration + red_duration
-
-        det_records: List[Dict] = []
-        pass_state: Dict[int,int] = {}
+          tracks: uma linha por box rastreada, colunas TRACK_COLUMNS
+          fps, (W, H): do vídeo
+        """
+        cap   = self._open_video(video_path)
+        fps   = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        W     = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        H     = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        end   = total if end is None else min(end, total) if total else end
+        crop  = self._compute_roi(roi, None, (0,0), (0,0), W, H)
+        self._seek(cap, start)
+
+        self._reset_tracker(tracker_model)
+        blocks: List[Dict[str,np.ndarray]] = []
+        try:
+            for idx, frame in enumerate(self._read_frames(cap), start=start):
+                if idx >= end:
+                    break
+                if crop is not None:
+                    x1, y1, x2, y2 = crop
+                    result = self._track(frame[y1:y2, x1:x2], conf, iou, tracker_model)
+                else:
+                    result = self._track(frame, conf, iou, tracker_model)
+                block = self._extract_tracks(result, crop[:2] if crop else (0,0))
+                block['frame'] = np.full(len(block['id']), idx)
+                blocks.append(block)
+        finally:
+            cap.release()
+
+        tracks = pd.DataFrame({
+            col: np.concatenate([b[col] for b in blocks]) if blocks else []
+            for col in TRACK_COLUMNS
+        })
+        return tracks, fps, (W, H)
+
+    def _open_cache(
+        self,
+        video_path: str,
+        opts: ProcessOptions,
+        track_params: Dict[str,Any],
+        fps: float,
+        line: Optional[Tuple[Tuple[int,int],Tuple[int,int]]],
+    ):
+        """
+        Entrada do cache de tracks (opts.tracks_dir) com `track_params`:
+        caminho, Replay (None numa falta), TrackWriter desta execução (None
+        num acerto) e, se há vídeo (`line` em px), onde fica a saída
+        renderizada com esta linha, semáforo e zonas.
+        """
+        os.makedirs(opts.tracks_dir, exist_ok=True)
+        track_file = track_cache.cache_path(opts.tracks_dir, track_cache.file_digest(video_path), track_params)
+        replay     = track_cache.lookup(track_file, int(round(track_cache.RESUME_OVERLAP_S * fps)))
+        track_sink = None
+        if replay is None or not replay.complete:
+            track_sink = track_cache.TrackWriter(track_file, every=opts.checkpoint_s,
+                                                 supersedes=replay.until if replay else 0)
+        render_file = None
+        if line is not None:
+            # tudo que muda o vídeo além dos tracks
+            render_file = track_cache.render_path(track_file, {
+                'mode': opts.output_mode, 'line': list(line), 'green': opts.green_duration,
+                'red': opts.red_duration, 'zones': opts.zones, 'roi': track_params['roi'],
+                'fourcc': encoding.FOURCC})
+        return track_file, replay, track_sink, render_file
+
+    def _frame_source(self, cap: cv2.VideoCapture, total: int, replay: Optional[track_cache.Replay],
+                      writer: Optional[encoding.VideoOutput], pipelined: bool,
+                      prof: profiling.Profiler) -> Tuple[Iterator[Tuple[int,Optional[np.ndarray]]], int]:
+        """
+        Frames (idx, imagem) a processar e quantos são. Os reproduzidos do
+        cache só são decodificados se forem anotados (ou aquecerem o
+        tracker); num acerto sem nada a anotar, nem isso (imagem None).
+        """
+        decode = None
+        if replay is not None:
+            decode = lambda idx: idx >= replay.warm or (writer is not None and writer.needs_frame(idx))
+        if replay is not None and replay.complete and not any(decode(idx) for idx in range(replay.until)):
+            return ((idx, None) for idx in range(replay.until)), replay.until
+        # pipelined: frames em voo simultaneamente, cada um precisa de buffer próprio;
+        # em série, um buffer mais os frames que a saída guarda (pré-roll do modo events)
+        buffers = 0 if pipelined else 1 + (writer.keeps_frames if writer is not None else 0)
+        return enumerate(prof.iter('decode', self._read_frames(cap, buffers, decode=decode))), total
+
+    @_exclusive
+    def process(
+        self,
+        video_path: str,
+        points: Tuple[Tuple[float,float],Tuple[float,float]],
+        output: Optional[str] = 'output.mp4',
+        options: Optional[ProcessOptions] = None,
+        **overrides: Any,
+    ) -> ProcessResult:
+        """
+        Executa detecção+tracking, salva vídeo anotado em `output` (None: sem
+        vídeo). O vídeo é decodificado uma única vez; as opções vêm de `options`
+        (ProcessOptions), e cada campo também pode ser passado por nome.
+
+        Retorna ProcessResult (desempacotável como antes):
+          detections: cada detecção ['time','id','x1','y1','pass'], carregada sob demanda
+          stats: igual a compute_stats_from_detections(detections)
+          output: caminho do arquivo MP4 gerado (ou None)
+          info: width, height, fps, frames e, conforme as opções, cache, checkpoints e perfil
+          zone_stats, zone_detections: por zona (coluna zone); None sem zonas
+        """
+        opts = dataclasses.replace(options or ProcessOptions(), **overrides)
+        cap      = self._open_video(video_path)
+        fps      = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        W        = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        H        = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        annotate = output is not None
+        p1,p2    = self._compute_line(points, W, H)
+        crop     = self._compute_roi(opts.roi, opts.roi_margin, p1, p2, W, H)
+        sampler  = FrameStride(opts.stride, opts.adaptive, opts.max_speed)
+        line     = LineCounter(p1, p2, sweep=(sampler.stride > 1))
+        cycle    = opts.green_duration + opts.red_duration
+
+        sink       = DetectionSink(opts.detections_path)
+        # com frames pulados um veículo anda até max_speed*stride px entre observações
+        zone_counter = ZoneCounter(opts.zones, W, H, line.threshold,
+                                   reach=opts.max_speed*sampler.stride if sampler.stride > 1 else 0.0) if opts.zones else None
+        zone_sink    = DetectionSink(opts.zones_path, dtypes=ZONE_DTYPES) if zone_counter else None
+        zone_acc     = [StatsAccumulator() for _ in range(len(zone_counter))] if zone_counter else []
+        # tudo que muda os tracks: chave do cache de lib.tracks
+        track_params = {'weights': track_cache.file_digest(self.model_path), 'conf': opts.conf, 'iou': opts.iou,
+                        'tracker_model': opts.tracker_model, 'roi': crop, 'stride': sampler.stride,
+                        'adaptive': opts.adaptive, 'max_speed': opts.max_speed}
+        track_file = replay = track_sink = render_file = None
+        if opts.tracks_dir is not None:
+            track_file, replay, track_sink, render_file = self._open_cache(
+                video_path, opts, track_params, fps, (p1, p2) if annotate else None)
+        # acerto já renderizado com a mesma configuração: o vídeo é copiado, nada é decodificado
+        rendered = replay is not None and replay.complete and track_cache.load_render(render_file, output)
+        writer   = self._init_writer(output, fps, (W,H), opts.output_mode, video_path) if annotate and not rendered else None
+        offset     = crop[:2] if crop else (0,0)
+        counts     = {'replayed': 0, 'inferred': 0}
+        # estado do tracker após cada frame de checkpoint, até o frame chegar ao writer
+        snapshots: Dict[int,Optional[bytes]] = {}
+        stats      = StatsAccumulator()
+        pass_state = TrackState()
         green_total = red_total = 0
 
         total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-        
-        # https://docs.ultralytics.com/pt/modes/track/#available-trackers
-        stream = self.model.track(
-            source=video_path,
-            tracker=f'{tracker_model}.yaml',
-            stream=True,
-            device=self.device,
-            half=self.fp16,
-            conf=conf,
-            iou=iou,
-            verbose=(self.verbose>=2)
-        )
 
-        for idx, result in enumerate(self.tqdm(stream, total=total, desc="Processing", unit="frame")):
-            dets, annotated, dg, dr = self._process_frame(
-                result, idx, fps, p1, p2, cycle,
-                green_duration, pass_state
+        self._reset_tracker(opts.tracker_model)
+        if replay is not None and replay.tracker is not None and not self._restore_tracker(replay.tracker, opts.tracker_model):
+            replay.forget_tracker()
+        self.stage_times = StageTimes() if opts.pipelined else None
+        prof = profiling.Profiler(opts.profile).start()
+
+        # estágios: decode -> inference (+tracking) -> annotate (contagem+desenho) -> encode
+        held: Dict[str,np.ndarray] = {}
+
+        def track(frame):
+            if crop is not None:
+                x1, y1, x2, y2 = crop
+                frame = frame[y1:y2, x1:x2]
+            with prof.stage('track'):
+                result = self._track(frame, opts.conf, opts.iou, opts.tracker_model)
+            prof.track_speed(result)
+            return result
+
+        def infer(item):
+            idx, frame = item
+            if replay is not None and idx < replay.until:
+                # já rastreado: os tracks do cache fazem o papel do modelo
+                if not replay.tracked(idx):
+                    return idx, frame, None
+                result = replay.result(idx, offset)
+                if idx >= replay.warm:
+                    # retomada: aquece o tracker novo nos últimos frames do parcial
+                    replay.warm_up(idx, self._extract_tracks(track(frame), offset))
+                counts['replayed'] += 1
+            else:
+                if not sampler.detect(idx):
+                    return idx, frame, None
+                result = track(frame)
+                if replay is not None and replay.tracker is None:
+                    result = replay.remap(self._extract_tracks(result, offset), offset)
+                counts['inferred'] += 1
+                if track_sink is not None and track_sink.due():
+                    t0 = time.perf_counter()
+                    snapshots[idx] = self._tracker_state()
+                    track_sink.seconds += time.perf_counter() - t0
+                    prof.add('checkpoint', time.perf_counter() - t0)
+            dist   = np.empty(0)
+            if sampler.adaptive:
+                boxes, _ = self._extract_boxes(result, offset)
+                dist     = line.signed_distance(*line.centroids(boxes))
+            sampler.update(idx, dist)
+            return idx, frame, result
+
+        def count(item):
+            idx, frame, result = item
+            out = self._process_frame(
+                result, idx, fps, line, cycle,
+                opts.green_duration, pass_state, frame=frame,
+                annotate=(writer is not None and writer.needs_frame(idx)), held=held, roi=crop, prof=prof
             )
-            
-            det_records.extend(dets)
-            green_total += dg
-            red_total   += dr
-            
-            writer.write(annotated)
-
-        cap.release()
-        writer.release()
-
-        df       = pd.DataFrame(det_records)
-        stats_df = self.compute_stats_from_detections(df)
-        
-        return df, stats_df, output
\ No newline at end of file
+            dets, annotated, dg, dr = out
+            zdets = None
+            if len(dets['id']):
+                ts = dets['time'][0]
+                prof.count('boxes', len(dets['id']))
+                with prof.stage('stats'):
+                    stats.update(ts, len(dets['id']), len(pass_state), dg, dr)
+                if zone_counter is not None:
+                    with prof.stage('zones'):
+                        zdets = count_zones(zone_counter, zone_acc, ts, dets['id'], dets['x1'], dets['y1'],
+                                            signal_light(ts, cycle, opts.green_duration))
+            if annotated is not None and zone_counter is not None:
+                with prof.stage('zones'):
+                    zone_counter.draw(annotated)
+            # boxes exibidas neste frame (as de held são substituídas, não alteradas)
+            tracks = None
+            if writer is not None and writer.needs_tracks and held:
+                tracks = (held['boxes'], held['ids'], pass_state[held['ids']])
+            raw = None
+            if track_sink is not None and result is not None:
+                raw = self._extract_tracks(result, offset)
+                raw = {**raw, 'frame': np.full(len(raw['id']), idx)} if len(raw['id']) else track_cache.empty_frame(idx)
+            return idx, out, tracks, zdets, raw
+
+        def encode(item):
+            idx, (dets, annotated, dg, dr), tracks, zdets, raw = item
+            if writer is not None:
+                with prof.stage('encode'):
+                    writer.write(idx, annotated, tracks, bool(dg or dr))
+            return dets, dg, dr, zdets, raw
+
+        frames, total = self._frame_source(cap, total, replay, writer, opts.pipelined, prof)
+        if opts.pipelined:
+            stream = run_pipeline(
+                frames,
+                [('inference', infer), ('annotate', count), ('encode', encode)],
+                maxsize=opts.queue_size,
+                times=self.stage_times
+            )
+        else:
+            stream = (encode(count(infer(item))) for item in frames)
+
+        done, complete = 0, False
+        try:
+            for done, (dets, dg, dr, zdets, raw) in enumerate(self.tqdm(stream, total=total, desc="Processing", unit="frame"), 1):
+                with prof.stage('sink'):
+                    sink.append(dets)
+                    if zdets is not None:
+                        zone_sink.append(zdets)
+                    if raw is not None:
+                        track_sink.append(raw)
+                if raw is not None and done - 1 in snapshots:
+                    with prof.stage('checkpoint'):
+                        track_sink.checkpoint(done - 1, snapshots.pop(done - 1))
+                green_total += dg
+                red_total   += dr
+                if opts.progress is not None:
+                    opts.progress(done, total)
+            complete = True
+        finally:
+            # encerra os estágios antes de liberar o vídeo que eles leem
+            stream.close()
+            cap.release()
+            sink.close()
+            if zone_sink is not None:
+                zone_sink.close()
+            if track_sink is not None:
+                # interrompido: as partes ficam para a próxima execução retomar
+                track_sink.close()
+            if track_file is not None:
+                track_cache.record(opts.tracks_dir, frames_replayed=counts['replayed'],
+                                   frames_inferred=counts['inferred'], render_hits=int(rendered))
+            if writer is not None:
+                with prof.stage('encode'):
+                    writer.release()
+            if not complete:
+                prof.stop()
+
+        if self.stage_times is not None:
+            self._log(self.stage_times.report())
+
+        info = {'width': W, 'height': H, 'fps': fps, 'frames': done,
+                'output_mode': opts.output_mode if annotate else None}
+        if track_file is not None:
+            if track_sink is not None:
+                info['checkpoints'] = {'count': track_sink.checkpoints, 'seconds': track_sink.seconds}
+                track_cache.commit(track_file, track_sink, {
+                    'video': track_cache.file_digest(video_path), 'model': self.model_path, **track_params,
+                    'source': os.path.abspath(video_path), 'width': W, 'height': H, 'fps': fps, 'frames': done})
+            info['tracks'] = track_file
+            info['cache']  = 'miss' if replay is None else 'hit' if replay.complete else 'resume'
+            if writer is not None and render_file is not None:
+                track_cache.store_render(render_file, encoding.output_files(opts.output_mode, output))
+        with prof.stage('stats'):
+            stats_df   = stats.to_frame()
+            zone_stats = pd.concat([acc.to_frame().assign(zone=z) for z, acc in enumerate(zone_acc)],
+                                   ignore_index=True) if zone_counter else None
+        prof.stop()
+        if prof.enabled:
+            prof.count('frames', done)
+            prof.count('frames_inferred', counts['inferred'])
+            prof.count('frames_replayed', counts['replayed'])
+            prof.count('crossings', green_total + red_total)
+            self._log(prof.report())
+            info['profile']       = prof.to_dict(self.stage_times)
+            info['profile_stats'] = prof.stats()
+        return ProcessResult(sink, stats_df, output, info, zone_sink, zone_stats)
+
+    @_exclusive
+    def stream(
+        self,
+        source: Union[str, int],
+        points: Tuple[Tuple[float,float],Tuple[float,float]],
+        conf: float = 0.25,
+        iou: float = 0.45,
+        tracker_model: Literal['botsort','bytetrack'] = 'botsort',
+        green_duration: int = 20,
+        red_duration: int = 5,
+        roi: Optional[Tuple[Tuple[float,float],Tuple[float,float]]] = None,
+        out_dir: Optional[str] = None,
+        chunk_rows: int = 100_000,
+        max_chunks: Optional[int] = None,
+        realtime: bool = False,
+    ) -> Iterator[Dict[str,float]]:
+        """
+        Modo contínuo para fontes ao vivo (URL RTSP/HTTP, índice de câmera) ou
+        arquivos (realtime=True reproduz na velocidade original, como teste).
+
+        Gera uma linha de estatísticas por segundo encerrado, com as colunas de
+        compute_stats_from_detections (ver StatsRoller), até a fonte terminar
+        ou o gerador ser fechado. A memória é limitada: detecções vão para
+        `out_dir` em arquivos rotativos de `chunk_rows` linhas (até
+        `max_chunks` arquivos) e nada mais é acumulado.
+
+        Frames descartados e o atraso (s) entre captura e fim do processamento
+        ficam em `self.stream_status`.
+        """
+        grabber  = FrameGrabber(source, realtime=realtime)
+        fps      = grabber.fps
+        W, H     = grabber.size
+        p1,p2    = self._compute_line(points, W, H)
+        line     = LineCounter(p1, p2, sweep=grabber.realtime)
+        crop     = self._compute_roi(roi, None, p1, p2, W, H)
+        cycle    = green_duration + red_duration
+        state    = TrackState()
+        horizon  = IdHorizon()
+        roller   = StatsRoller()
+        writer   = RotatingDetectionWriter(out_dir, chunk_rows, max_chunks) if out_dir else None
+
+        self.stream_status = {'frames': 0, 'dropped': 0, 'lag': 0.0, 'fps': fps}
+        self._reset_tracker(tracker_model)
+        dropped = 0
+        try:
+            for idx, ts, captured, frame in grabber:
+                if crop is not None:
+                    x1, y1, x2, y2 = crop
+                    result = self._track(frame[y1:y2, x1:x2], conf, iou, tracker_model)
+                else:
+                    result = self._track(frame, conf, iou, tracker_model)
+                # tempo do frame vem do grabber (relógio em fontes ao vivo):
+                # idx=ts, fps=1 faz _process_frame usar exatamente ts
+                dets, _, dg, dr = self._process_frame(
+                    result, ts, 1.0, line, cycle,
+                    green_duration, state, annotate=False, roi=crop
+                )
+
+                if writer is not None:
+                    writer.append(dets)
+                low = horizon.update(ts, dets['id'])
+                if low is not None:
+                    state.trim(low)
+                lag = time.monotonic() - captured
+                self.stream_status.update(frames=grabber.frames, dropped=grabber.dropped, lag=lag)
+                if grabber.dropped > dropped:
+                    dropped = grabber.dropped
+                    self._log(f"stream: lag {lag:.2f}s, {dropped} frames descartados")
+
+                for row in roller.update(ts, dets['id'], dg, dr, len(state)):
+                    yield row
+            for row in roller.flush():
+                yield row
+        finally:
+            grabber.close()
+            if writer is not None:
+                writer.flush()
@@ -0,0 +1,162 @@
+"""
+Processamento paralelo de um único vídeo longo, dividido em blocos de tempo.
+
+Cada bloco [start, end) é rastreado por um worker com um tracker novo, que
+começa `overlap` frames antes de `start` (aquecimento). Nos frames de
+sobreposição os dois blocos vizinhos veem os mesmos veículos: os tracks do
+bloco seguinte são associados aos do anterior por IoU das boxes e herdam seus
+ids, e os frames de aquecimento são descartados. A contagem (pass_state) é
+então refeita sobre os tracks unidos do vídeo inteiro, de uma vez, com
+`count_tracks`, logo nenhum veículo é contado duas vezes por cruzar uma fronteira.
+
+Tolerância em relação a `CarCounter.process` sequencial: fora das fronteiras os
+tracks são idênticos; em cada fronteira um track pode ser fragmentado ou
+associado de forma diferente. Com overlap >= 2 s e blocos >= 1 min, os totais
+green_total/red_total/detected_total devem ficar dentro de TOLERANCE (relativa)
+da execução sequencial; benchmarks/bench_chunked.py mede essa diferença.
+
+Não gera vídeo anotado (apenas detecções e estatísticas).
+"""
+import cv2
+import numpy as np
+import pandas as pd # type:ignore
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+from lib import batch, results
+from lib.car_counter import CarCounter, DETECTION_COLUMNS, TRACK_COLUMNS
+from lib.counting import LineCounter, VEHICLE_CLASSES, count_tracks
+from lib.tracks import match_overlap
+
+TOLERANCE = 0.02
+
+
+def plan_chunks(total: int, chunks: int, overlap: int) -> List[Tuple[int,int,int]]:
+    """
+    Divide [0, total) em `chunks` blocos: (início do aquecimento, start, end).
+    """
+    bounds = np.linspace(0, total, max(1, chunks) + 1).astype(int)
+    return [
+        (max(0, int(s) - overlap), int(s), int(e))
+        for s, e in zip(bounds[:-1], bounds[1:]) if e > s
+    ]
+
+
+def track_chunk(counter: CarCounter, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tracks de um bloco de `plan_chunks` (job: video, warmup, start, end, config).
+    """
+    tracks, fps, size = counter.track_frames(
+        job['video'], job['warmup'], job['end'],
+        conf=job['config']['conf'],
+        iou=job['config']['iou'],
+        tracker_model=job['config']['tracker_model'],
+        roi=job['config'].get('roi'),
+    )
+    return {'start': job['start'], 'tracks': tracks, 'fps': fps, 'size': size}
+
+
+def _run_chunk(job: Dict[str, Any]) -> Dict[str, Any]:
+    return track_chunk(batch.worker_counter(), job)
+
+
+def stitch_tracks(chunks: List[Tuple[int, pd.DataFrame]], min_iou: float = 0.5) -> pd.DataFrame:
+    """
+    Une os tracks dos blocos (start, tracks) em ordem, reaproveitando ids nas
+    sobreposições; ids são renumerados 1..n por ordem de aparição.
+    """
+    merged: List[pd.DataFrame] = []
+    next_id = 1
+    prev = pd.DataFrame(columns=TRACK_COLUMNS)
+    for start, tracks in chunks:
+        warm = tracks[tracks['frame'] < start]
+        body = tracks[tracks['frame'] >= start]
+
+        # ids locais do bloco -> ids globais
+        mapping = match_overlap(prev[prev['frame'] >= tracks['frame'].min()], warm, min_iou)
+        for tid in pd.unique(body['id']):
+            if int(tid) not in mapping:
+                mapping[int(tid)] = next_id
+                next_id += 1
+        body = body.assign(id=body['id'].map(mapping).astype(np.int64))
+        merged.append(body)
+        prev = body
+
+    if not merged:
+        return pd.DataFrame(columns=TRACK_COLUMNS)
+    out = pd.concat(merged, ignore_index=True)
+    out['id'] = pd.factorize(out['id'])[0] + 1
+    return out
+
+
+def detections_from_tracks(
+    tracks: pd.DataFrame,
+    fps: float,
+    line: LineCounter,
+    cycle: int,
+    green_dur: int
+) -> pd.DataFrame:
+    """
+    DataFrame de detecções (DETECTION_COLUMNS) a partir de tracks brutos,
+    com a contagem refeita de uma vez por `count_tracks`.
+    """
+    veh    = tracks[tracks['cls'].isin(VEHICLE_CLASSES)].sort_values('frame', kind='stable')
+    frames = veh['frame'].to_numpy()
+    ids    = veh['id'].to_numpy().astype(int)
+    boxes  = veh[['x1','y1','x2','y2']].to_numpy()
+    cx, cy = line.centroids(boxes)
+    passes = count_tracks(frames, ids, cx, cy, fps, line, cycle, green_dur)
+    return pd.DataFrame(dict(zip(DETECTION_COLUMNS, (frames / fps, ids, cx, cy, passes))))
+
+
+def process_chunked(
+    video_path: str,
+    config: Optional[Dict[str, Any]] = None,
+    workers: int = 2,
+    chunks: Optional[int] = None,
+    overlap_s: float = 2.0,
+    model_path: str = 'yolov8n.pt',
+    threads: int = 1,
+    min_iou: float = 0.5,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Processa `video_path` em `chunks` blocos (padrão: `workers`) em paralelo.
+
+    Retorna:
+      df: detecções ['time','id','x1','y1','pass'], como em CarCounter.process
+      stats_df: via CarCounter.compute_stats_from_detections(df)
+      tracks: tracks brutos unidos (TRACK_COLUMNS)
+    """
+    config = config if config is not None else results.load_config()
+
+    cap   = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+    fps   = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    W     = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    H     = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    cap.release()
+
+    plan = plan_chunks(total, chunks or workers, int(round(overlap_s * fps)))
+    jobs = [
+        {'video': video_path, 'warmup': w, 'start': s, 'end': e, 'config': config}
+        for w, s, e in plan
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context('spawn'),
+        initializer=batch.init_worker,
+        initargs=(model_path, threads),
+    ) as pool:
+        parts = list(pool.map(_run_chunk, jobs))
+
+    tracks = stitch_tracks([(p['start'], p['tracks']) for p in parts], min_iou)
+
+    p1, p2 = CarCounter._compute_line(config['points'], W, H)
+    line   = LineCounter(p1, p2)
+    cycle  = config['green_duration'] + config['red_duration']
+    df     = detections_from_tracks(tracks, fps, line, cycle, config['green_duration'])
+    stats  = CarCounter.compute_stats_from_detections(df)
+    return df, stats, tracks
@@ -0,0 +1,241 @@
+import numpy as np
+from typing import Tuple
+
+# classes COCO consideradas veículos: car, motorcycle, bus, truck
+VEHICLE_CLASSES = (2, 3, 5, 7)
+
+# cor BGR das boxes por estado de passagem (índice = pass + 1)
+PASS_COLORS = ((0,0,255), (0,0,0), (0,255,0))
+
+
+def signal_light(ts: float, cycle: int, green_dur: int) -> str:
+    """
+    Estado do semáforo no instante `ts` (segundos): 'green' ou 'red'.
+    """
+    return 'green' if (int(ts) % cycle) < green_dur else 'red'
+
+
+class TrackState:
+    """
+    Estado de passagem de cada track, indexado pelo id em arrays:
+      state[id]: -1 (passou no vermelho), 0 (não passou), 1 (passou no verde)
+      seen[id]:  se o id já apareceu em algum frame
+      dist[id]:  última distância com sinal à linha (nan se nunca vista)
+    Os arrays crescem (dobrando) sob demanda conforme novos ids surgem e
+    começam em `base` (posição = id - base): `trim` descarta os ids antigos
+    em fontes contínuas, onde os ids só crescem.
+    """
+    def __init__(self, capacity: int = 1024):
+        self.state = np.zeros(capacity, dtype=np.int8)
+        self.seen  = np.zeros(capacity, dtype=bool)
+        self.dist  = np.full(capacity, np.nan, dtype=np.float32)
+        self.base  = 0
+        self.n_seen = 0
+
+    def _ensure(self, min_id: int, max_id: int):
+        size, front = len(self.state), max(self.base - min_id, 0)
+        if front == 0 and max_id - self.base < size:
+            return
+        # id abaixo de `base` (visto de novo depois de descartado): volta como novo
+        n = len(self.state)
+        while size < max(max_id - self.base + 1, n) + front:
+            size *= 2
+        state, seen = np.zeros(size, dtype=np.int8), np.zeros(size, dtype=bool)
+        dist = np.full(size, np.nan, dtype=np.float32)
+        state[front:front+n] = self.state
+        seen[front:front+n]  = self.seen
+        dist[front:front+n]  = self.dist
+        self.state, self.seen, self.dist = state, seen, dist
+        self.base -= front
+
+    def slots(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Posições de `ids` nos arrays.
+        """
+        return ids - self.base if self.base else ids
+
+    def observe(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Marca `ids` como vistos e retorna o estado atual de cada um.
+        """
+        if len(ids):
+            self._ensure(int(ids.min()), int(ids.max()))
+            slots = self.slots(ids)
+            new = slots[~self.seen[slots]]
+            if len(new):
+                self.n_seen += len(np.unique(new))
+                self.seen[new] = True
+            return self.state[slots]
+        return self.state[ids]
+
+    def trim(self, min_id: int):
+        """
+        Descarta o estado dos ids menores que `min_id`; a contagem de ids
+        vistos (len) não muda.
+        """
+        k = min(min_id - self.base, len(self.state))
+        if k <= 0:
+            return
+        for arr, empty in ((self.state, 0), (self.seen, False), (self.dist, np.nan)):
+            arr[:len(arr)-k] = arr[k:]
+            arr[len(arr)-k:] = empty
+        self.base += k
+
+    def __getitem__(self, ids):
+        return self.state[self.slots(ids)]
+
+    def __len__(self) -> int:
+        return self.n_seen
+
+    def to_dict(self) -> dict:
+        slots = np.flatnonzero(self.seen)
+        return dict(zip((slots + self.base).tolist(), self.state[slots].tolist()))
+
+
+class LineCounter:
+    """
+    Contagem vetorizada de passagens por uma linha p1-p2.
+
+    Para todas as boxes do frame de uma vez calcula centróides, distância
+    (com sinal) à reta, quem está na faixa de `threshold` px e as transições
+    de estado 0 -> ±1 em `TrackState`.
+
+    sweep: também conta quando o centróide troca de lado da reta entre duas
+    observações do mesmo track (necessário quando frames são pulados e o
+    veículo pode atravessar a faixa de `threshold` px sem ser visto nela).
+    """
+    def __init__(self, p1: Tuple[int,int], p2: Tuple[int,int], threshold: float = 5.0,
+                 sweep: bool = False):
+        self.p1, self.p2 = p1, p2
+        self.threshold   = threshold
+        self.sweep       = sweep
+        # reta: dy*x - dx*y + k = 0 (mesma forma da fórmula original, em inteiros)
+        self.dy   = p2[1]-p1[1]
+        self.dx   = p2[0]-p1[0]
+        self.k    = p2[0]*p1[1] - p2[1]*p1[0]
+        self.norm = float(np.hypot(self.dy, self.dx))
+
+    @staticmethod
+    def centroids(boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Centróides inteiros (truncados) das boxes xyxy.
+        """
+        cx = ((boxes[:,0] + boxes[:,2]) / 2).astype(np.int64)
+        cy = ((boxes[:,1] + boxes[:,3]) / 2).astype(np.int64)
+        return cx, cy
+
+    def signed_distance(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """
+        Distância com sinal (px) dos pontos à reta; o sinal indica o lado.
+        """
+        num = self.dy*cx - self.dx*cy + self.k
+        if self.norm == 0:
+            return np.full(len(num), np.inf)
+        return num / self.norm
+
+    def update(
+        self,
+        boxes: np.ndarray,
+        ids: np.ndarray,
+        light: str,
+        state: TrackState
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int, int]:
+        """
+        Atualiza `state` com as boxes de um frame.
+        Retorna:
+          cx, cy: centróides,
+          passes: estado de cada box após o frame,
+          inc_green, inc_red: novas passagens neste frame
+        """
+        cx, cy = self.centroids(boxes)
+        prev   = state.observe(ids)
+        slots  = state.slots(ids)
+        dist   = self.signed_distance(cx, cy)
+        near   = np.abs(dist) < self.threshold
+        if self.sweep:
+            # nan (primeira observação) nunca satisfaz a comparação
+            near |= (state.dist[slots] * dist) < 0
+        state.dist[slots] = dist
+        hit    = near & (prev == 0)
+
+        inc_g = inc_r = 0
+        if hit.any():
+            # ids repetidos no mesmo frame contam uma única vez
+            new = np.unique(slots[hit])
+            if light == 'green':
+                state.state[new] = 1
+                inc_g = len(new)
+            else:
+                state.state[new] = -1
+                inc_r = len(new)
+
+        return cx, cy, state.state[slots], inc_g, inc_r
+
+
+class FrameStride:
+    """
+    Decide em quais frames rodar detecção+tracking.
+      stride: intervalo máximo entre frames processados (1 = todos)
+      adaptive: o intervalo varia entre 1 e `stride` conforme a distância do
+        veículo mais próximo à linha; só pula k frames se nenhum veículo pode
+        alcançar a linha em k frames andando `max_speed` px/frame.
+    """
+    def __init__(self, stride: int = 1, adaptive: bool = False, max_speed: float = 15.0):
+        self.stride    = max(1, int(stride))
+        self.adaptive  = adaptive
+        self.max_speed = max_speed
+        self.next      = 0
+
+    def detect(self, idx: int) -> bool:
+        return idx >= self.next
+
+    def update(self, idx: int, dist: np.ndarray):
+        """
+        Agenda o próximo frame a processar dado `dist`, as distâncias (px)
+        das boxes do frame `idx` à linha.
+        """
+        step = self.stride
+        if self.adaptive and len(dist):
+            step = int(np.clip(np.abs(dist).min() // self.max_speed, 1, self.stride))
+        self.next = idx + step
+
+
+def count_tracks(
+    frames: np.ndarray,
+    ids: np.ndarray,
+    cx: np.ndarray,
+    cy: np.ndarray,
+    fps: float,
+    line: LineCounter,
+    cycle: int,
+    green_dur: int
+) -> np.ndarray:
+    """
+    Estado de passagem de cada registro (frame, id, centróide) de uma vez,
+    equivalente a aplicar `line.update` frame a frame em ordem: um id passa a
+    ±1 no primeiro frame em que está na faixa da linha (ou troca de lado, com
+    sweep), conforme o semáforo naquele frame, e mantém o valor depois disso.
+    """
+    # int64: o sentinela `never` não cabe em frames int32 (tipos compactos)
+    frames = np.asarray(frames, dtype=np.int64)
+    n    = len(ids)
+    dist = line.signed_distance(cx, cy)
+    near = np.abs(dist) < line.threshold
+    if line.sweep and n:
+        order = np.lexsort((frames, ids))
+        d     = dist[order]
+        cross = np.zeros(n, dtype=bool)
+        cross[order[1:]] = (ids[order][1:] == ids[order][:-1]) & (d[1:]*d[:-1] < 0)
+        near |= cross
+
+    never = np.iinfo(np.int64).max
+    uniq, inv = np.unique(ids, return_inverse=True)
+    first = np.full(len(uniq), never, dtype=np.int64)
+    np.minimum.at(first, inv, np.where(near, frames, never))
+
+    hit   = first != never
+    value = np.zeros(len(uniq), dtype=np.int64)
+    ts    = first[hit] / fps
+    value[hit] = np.where((ts.astype(np.int64) % cycle) < green_dur, 1, -1)
+
+    return np.where(frames >= first[inv], value[inv], 0)
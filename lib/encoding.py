@@ -0,0 +1,228 @@
+"""
+Modos de saída do vídeo anotado de CarCounter.process.
+
+  full:    todos os frames, resolução original (comportamento original)
+  preview: resolução reduzida (`scale`) e no máximo `max_fps` frames/s
+  events:  só trechos em volta de passagens pela linha (`pre`/`post` s),
+           concatenados; os trechos ficam em `<saida>.events.json`
+  overlay: nenhum frame é codificado; o vídeo original é copiado para a
+           saída e boxes/ids/passagem de cada frame vão para
+           `<saida>.overlay.parquet`, desenhados pelo navegador
+"""
+import collections
+import json
+import os
+import shutil
+import cv2
+import numpy as np
+import pyarrow as pa # type:ignore
+import pyarrow.parquet as pq # type:ignore
+from typing import Deque, Dict, List, Optional, Tuple
+
+OUTPUT_MODES = ('full', 'preview', 'events', 'overlay')
+
+# codec dos vídeos gravados (h264 é o que os navegadores reproduzem)
+FOURCC = os.environ.get("TRAFFIC_FOURCC", "h264")
+
+OVERLAY_DTYPES = {
+    'frame': np.int32,
+    'id': np.int32,
+    'x1': np.int16,
+    'y1': np.int16,
+    'x2': np.int16,
+    'y2': np.int16,
+    'pass': np.int8,
+}
+
+# linhas por row group do overlay.parquet: frames crescentes, logo um trecho
+# de frames é lido só dos row groups que o contêm (results.load_overlay)
+OVERLAY_ROW_GROUP = 65536
+
+# boxes, ids e estado de passagem exibidos em um frame
+Tracks = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def overlay_path(output: str) -> str:
+    return os.path.splitext(output)[0] + '.overlay.parquet'
+
+
+def events_path(output: str) -> str:
+    return os.path.splitext(output)[0] + '.events.json'
+
+
+def output_files(mode: str, path: str) -> List[str]:
+    """
+    Arquivos que a saída de `mode` grava em `path`: o vídeo e seus auxiliares
+    (sem passagens, o modo events não cria o vídeo).
+    """
+    extra = {'events': [events_path(path)], 'overlay': [overlay_path(path)]}
+    return [path, *extra.get(mode, [])]
+
+
+def _video_writer(path: str, fps: float, size: Tuple[int,int]) -> cv2.VideoWriter:
+    fourcc = cv2.VideoWriter_fourcc(*FOURCC) # type:ignore
+    return cv2.VideoWriter(path, fourcc, fps, size)
+
+
+class VideoOutput:
+    """
+    Interface dos modos: `needs_frame(idx)` diz se o frame idx precisa ser
+    anotado; `write` recebe cada frame (anotado ou None), as boxes exibidas
+    (se `needs_tracks`) e se houve passagem nele. `keeps_frames`: quantos
+    frames anteriores a saída guarda por referência depois de write; quem
+    decodifica não pode reaproveitar os buffers deles antes disso.
+    """
+    needs_tracks = False
+    keeps_frames = 0
+
+    def needs_frame(self, idx: int) -> bool:
+        return True
+
+    def write(self, idx: int, frame: Optional[np.ndarray], tracks: Optional[Tracks], crossed: bool):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class FullOutput(VideoOutput):
+    def __init__(self, path: str, fps: float, size: Tuple[int,int]):
+        self.writer = _video_writer(path, fps, size)
+
+    def write(self, idx, frame, tracks, crossed):
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+
+
+class PreviewOutput(VideoOutput):
+    """
+    Um frame a cada `step` (fps final <= max_fps), reduzido por `scale`.
+    """
+    def __init__(self, path: str, fps: float, size: Tuple[int,int],
+                 scale: float = 0.5, max_fps: float = 10.0):
+        self.step   = max(1, round(fps / max_fps))
+        self.size   = (max(2, int(size[0]*scale)) // 2 * 2, max(2, int(size[1]*scale)) // 2 * 2)
+        self.writer = _video_writer(path, fps / self.step, self.size)
+
+    def needs_frame(self, idx):
+        return idx % self.step == 0
+
+    def write(self, idx, frame, tracks, crossed):
+        if frame is not None and idx % self.step == 0:
+            self.writer.write(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA))
+
+    def release(self):
+        self.writer.release()
+
+
+class EventsOutput(VideoOutput):
+    """
+    Trechos de `pre` s antes a `post` s depois de cada passagem. Os `pre` s
+    anteriores ficam em memória como referências aos frames decodificados,
+    sem cópia (keeps_frames), ou reduzidos por `scale`.
+    """
+    def __init__(self, path: str, fps: float, size: Tuple[int,int],
+                 pre: float = 1.0, post: float = 2.0, scale: float = 1.0):
+        self.path     = path
+        self.fps      = fps
+        self.post     = max(0, int(post*fps))
+        self.size     = (int(size[0]*scale) // 2 * 2, int(size[1]*scale) // 2 * 2) if scale != 1.0 else size
+        self.keeps_frames = max(1, int(pre*fps))
+        self.buffer: Deque[Tuple[int,np.ndarray]] = collections.deque(maxlen=self.keeps_frames)
+        self.until    = -1
+        self.segments: List[List[float]] = []
+        self.writer: Optional[cv2.VideoWriter] = None
+
+    def _emit(self, idx: int, frame: np.ndarray):
+        if self.writer is None:
+            self.writer = _video_writer(self.path, self.fps, self.size)
+        if self.segments and self.segments[-1][1] >= idx - 1:
+            self.segments[-1][1] = idx
+        else:
+            self.segments.append([idx, idx])
+        self.writer.write(frame)
+
+    def write(self, idx, frame, tracks, crossed):
+        if frame is None:
+            return
+        if self.size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if crossed:
+            while self.buffer:
+                self._emit(*self.buffer.popleft())
+            self.until = idx + self.post
+        if idx <= self.until:
+            self._emit(idx, frame)
+        else:
+            self.buffer.append((idx, frame))
+
+    def release(self):
+        if self.writer is not None:
+            self.writer.release()
+        with open(events_path(self.path), 'w') as f:
+            json.dump([{'start': a / self.fps, 'end': (b+1) / self.fps} for a, b in self.segments], f, indent=4)
+
+
+class OverlayOutput(VideoOutput):
+    """
+    Sem codificação: copia `source` para `path` e grava as boxes por frame,
+    um row group de OVERLAY_ROW_GROUP linhas por vez (memória limitada).
+    """
+    needs_tracks = True
+
+    def __init__(self, path: str, source: str):
+        self.path    = path
+        self.source  = source
+        self.pending = 0
+        self.blocks: List[Dict[str,np.ndarray]] = []
+        self.schema  = pa.schema([(col, pa.from_numpy_dtype(dt)) for col, dt in OVERLAY_DTYPES.items()])
+        self.writer  = pq.ParquetWriter(overlay_path(path), self.schema)
+
+    def needs_frame(self, idx):
+        return False
+
+    def write(self, idx, frame, tracks, crossed):
+        if tracks is None or not len(tracks[1]):
+            return
+        boxes, ids, passes = tracks
+        xyxy = np.clip(boxes, 0, np.iinfo(np.int16).max).astype(np.int16)
+        self.blocks.append({
+            'frame': np.full(len(ids), idx, dtype=np.int32),
+            'id': ids.astype(np.int32),
+            'x1': xyxy[:,0], 'y1': xyxy[:,1], 'x2': xyxy[:,2], 'y2': xyxy[:,3],
+            'pass': passes.astype(np.int8),
+        })
+        self.pending += len(ids)
+        if self.pending >= OVERLAY_ROW_GROUP:
+            self._flush(OVERLAY_ROW_GROUP)
+
+    def _flush(self, rows: int):
+        # grava `rows` linhas como um row group; o que sobra do último frame fica pendente
+        cols = {col: np.concatenate([b[col] for b in self.blocks]) for col in OVERLAY_DTYPES}
+        self.writer.write_table(pa.table({col: arr[:rows] for col, arr in cols.items()}, schema=self.schema))
+        self.pending -= rows
+        self.blocks   = [{col: arr[rows:] for col, arr in cols.items()}] if self.pending else []
+
+    def release(self):
+        if self.pending:
+            self._flush(self.pending)
+        self.writer.close()
+        if os.path.abspath(self.source) != os.path.abspath(self.path):
+            shutil.copyfile(self.source, self.path)
+
+
+def open_output(mode: str, path: str, fps: float, size: Tuple[int,int], source: str) -> VideoOutput:
+    """
+    Saída de `mode` (OUTPUT_MODES) em `path` para um vídeo `source` de `fps`/`size`.
+    """
+    if mode == 'full':
+        return FullOutput(path, fps, size)
+    if mode == 'preview':
+        return PreviewOutput(path, fps, size)
+    if mode == 'events':
+        return EventsOutput(path, fps, size)
+    if mode == 'overlay':
+        return OverlayOutput(path, source)
+    raise ValueError(f"Modo de saída desconhecido: {mode} (opções: {', '.join(OUTPUT_MODES)})")
@@ -0,0 +1,216 @@
+"""
+Fila local de processamentos em segundo plano.
+
+Os jobs ficam em uma tabela SQLite em disco (`.jobs/jobs.db`), logo sobrevivem
+a recarregamentos do navegador e reinícios do servidor (jobs que estavam
+rodando voltam para a fila). Um número limitado de workers (threads, cada uma
+com seu próprio modelo) executa CarCounter.process e atualiza progresso,
+frames/s e ETA na tabela.
+"""
+import contextlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+from lib.car_counter import CarCounter
+from lib import results, tracks
+
+log = logging.getLogger(__name__)
+
+JOBS_DIR = ".jobs"
+
+# limite de processamentos simultâneos no servidor
+MAX_WORKERS = int(os.environ.get("TRAFFIC_MAX_WORKERS", "1"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    status       TEXT NOT NULL,
+    video        TEXT NOT NULL,
+    result_id    TEXT NOT NULL,
+    config       TEXT NOT NULL,
+    frames_done  INTEGER DEFAULT 0,
+    frames_total INTEGER DEFAULT 0,
+    fps          REAL DEFAULT 0,
+    eta          REAL,
+    error        TEXT,
+    created      REAL NOT NULL,
+    started      REAL,
+    finished     REAL
+)
+"""
+
+
+class JobQueue:
+    """
+    status: queued -> running -> done | failed
+    """
+    def __init__(self, jobs_dir: str = JOBS_DIR, max_workers: int = MAX_WORKERS,
+                 model_path: str = 'yolov8n.pt', results_dir: str = results.RESULTS_DIR,
+                 update_every: float = 1.0):
+        self.jobs_dir     = jobs_dir
+        self.db_path      = f"{jobs_dir}/jobs.db"
+        self.max_workers  = max(1, max_workers)
+        self.model_path   = model_path
+        self.results_dir  = results_dir
+        self.update_every = update_every
+        self._wake        = threading.Event()
+        self._stop        = threading.Event()
+        self._workers: List[threading.Thread] = []
+
+        os.makedirs(jobs_dir, exist_ok=True)
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+            # o servidor caiu no meio destes: voltam para a fila
+            db.execute("UPDATE jobs SET status='queued', started=NULL WHERE status='running'")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def submit(self, video: str, result_id: str, config: Dict[str, Any]) -> str:
+        """
+        Enfileira `video` (ligado na pasta da fila; copiado se não houver hard
+        link entre os diretórios) e retorna o id do job.
+        """
+        job_id = uuid.uuid4().hex
+        stored = f"{self.jobs_dir}/{job_id}{os.path.splitext(video)[1]}"
+        try:
+            # os uploads não mudam depois de gravados (lib.utils.store_upload)
+            os.link(video, stored)
+        except OSError:
+            shutil.copyfile(video, stored)
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, video, result_id, config, created) VALUES (?,?,?,?,?,?)",
+                (job_id, 'queued', stored, result_id, json.dumps(config), time.time())
+            )
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, statuses=('queued', 'running'), limit: int = 20) -> List[Dict[str, Any]]:
+        marks = ",".join("?" * len(statuses))
+        with self._connect() as db:
+            rows = db.execute(f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY created LIMIT ?",
+                              (*statuses, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def position(self, job_id: str) -> int:
+        """
+        Quantos jobs na fila estão à frente de `job_id`.
+        """
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status='queued' AND created < "
+                "(SELECT created FROM jobs WHERE id=?)", (job_id,)
+            ).fetchone()
+        return int(row[0])
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                row = db.execute("SELECT * FROM jobs WHERE status='queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status='running', started=? WHERE id=?", (time.time(), row['id']))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return dict(row) if row else None
+
+    def _update(self, job_id: str, **fields):
+        cols = ", ".join(f"{k}=?" for k in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {cols} WHERE id=?", (*fields.values(), job_id))
+
+    def _run(self, cc: CarCounter, job: Dict[str, Any]):
+        config      = json.loads(job['config'])
+        result_path = f"{self.results_dir}/{job['result_id']}"
+        os.makedirs(result_path, exist_ok=True)
+
+        t0, last = time.perf_counter(), 0.0
+        def progress(done: int, total: int):
+            nonlocal last
+            now = time.perf_counter()
+            if now - last < self.update_every and done != total:
+                return
+            last = now
+            fps = done / (now - t0) if now > t0 else 0.0
+            eta = (total - done) / fps if fps and total else None
+            self._update(job['id'], frames_done=done, frames_total=total, fps=fps, eta=eta)
+
+        result = cc.process(
+            job['video'],
+            output=f"{result_path}/video.mp4",
+            progress=progress,
+            detections_path=f"{result_path}/detections.parquet",
+            zones_path=f"{result_path}/zones.parquet",
+            tracks_dir=tracks.TRACKS_DIR,
+            **results.process_kwargs(config)
+        )
+        results.save_results(result_path, None, result.stats, config, info=result.info,
+                             zone_stats=result.zone_stats)
+
+    def _step(self, cc: Optional[CarCounter]) -> Optional[CarCounter]:
+        job = self._claim()
+        if job is None:
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            return cc
+        try:
+            # com um único worker reaproveita o modelo já aquecido do registro;
+            # com vários, cada um tem o seu para não disputarem o tracker
+            cc = cc or CarCounter(model_path=self.model_path, shared=(self.max_workers == 1))
+            self._run(cc, job)
+            self._update(job['id'], status='done', finished=time.time(), eta=0.0)
+            # fica no cache de tracks para regerar o vídeo anotado (lib.recount)
+            tracks.keep_source(job['video'])
+        except Exception as e:
+            log.exception("Job %s falhou", job['id'])
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(job['video'])
+            self._update(job['id'], status='failed', finished=time.time(), error=repr(e))
+        return cc
+
+    def _worker(self):
+        cc: Optional[CarCounter] = None
+        while not self._stop.is_set():
+            try:
+                cc = self._step(cc)
+            except Exception:
+                # ex.: banco travado em _claim/_update; a thread continua na próxima volta
+                log.exception("Erro no worker da fila")
+                self._stop.wait(timeout=1.0)
+
+    def start(self) -> "JobQueue":
+        if not self._workers:
+            self._workers = [
+                threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.max_workers)
+            ]
+            for th in self._workers:
+                th.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for th in self._workers:
+            th.join()
+        self._workers = []
@@ -0,0 +1,47 @@
+import threading
+import time
+import numpy as np
+from typing import Dict, Tuple
+from ultralytics import YOLO # type:ignore
+
+ModelKey = Tuple[str, str, bool]
+
+
+class ModelRegistry:
+    """
+    Modelos YOLO compartilhados no processo, por (pesos, device, half).
+
+    Cada modelo é carregado e aquecido uma única vez; `get` devolve também um
+    lock do modelo, que deve ser segurado durante um processamento inteiro,
+    pois o estado do tracker (model.predictor) é do modelo.
+    """
+    def __init__(self):
+        self._models: Dict[ModelKey, Tuple[YOLO, threading.RLock]] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[ModelKey, Dict[str, float]] = {}
+
+    def _load(self, model_path: str, device: str, half: bool) -> YOLO:
+        model = YOLO(model_path, task='detect')
+        # aquecimento: primeira inferência (alocação de memória, kernels)
+        model.predict(np.zeros((640, 640, 3), dtype=np.uint8),
+                      device=device, half=half, verbose=False)
+        return model
+
+    def get(self, model_path: str, device: str, half: bool) -> Tuple[YOLO, threading.RLock]:
+        key = (model_path, device, half)
+        with self._lock:
+            if key in self._models:
+                self.stats[key]['hits'] += 1
+                return self._models[key]
+            t0 = time.perf_counter()
+            self._models[key] = (self._load(model_path, device, half), threading.RLock())
+            self.stats[key] = {'load_s': time.perf_counter() - t0, 'hits': 0, 'loaded_at': time.time()}
+            return self._models[key]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self.stats.clear()
+
+
+registry = ModelRegistry()
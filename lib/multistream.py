@@ -0,0 +1,190 @@
+"""
+Várias câmeras servidas por um único detector.
+
+Os frames mais recentes de cada fonte são reunidos em lotes para um único
+model.predict; o tracking (um BYTETracker/BOTSORT por fonte, como o
+model.track faz internamente), a linha, o semáforo e o TrackState são de
+cada fonte, e a contagem usa o mesmo CarCounter._process_frame.
+
+Latência: um lote sai quando todas as fontes ativas têm frame, quando chega
+a `max_batch` ou quando o frame mais antigo esperou `max_wait` s, logo uma
+fonte lenta não segura as demais. Em fontes ao vivo (ou realtime) só o frame
+mais recente fica pendente e frames com mais de `max_latency` s desde a
+captura são descartados (contados em `stale`) em vez de processados; arquivos
+sem realtime são processados por inteiro, o mais rápido possível.
+"""
+import threading
+import time
+import torch
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from lib import backends
+from lib.car_counter import CarCounter, make_tracker
+from lib.counting import LineCounter, TrackState
+from lib.streaming import FrameGrabber, IdHorizon, RotatingDetectionWriter, StatsRoller
+
+
+def track_result(tracker, result, img):
+    """
+    Aplica `tracker` a um resultado do model.predict (mesma lógica do
+    callback de tracking do ultralytics): boxes ganham ids.
+    """
+    det = result.boxes.cpu().numpy()
+    if len(det) == 0:
+        return result
+    tracks = tracker.update(det, img)
+    if len(tracks) == 0:
+        return result
+    result = result[tracks[:, -1].astype(int)]
+    result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+    return result
+
+
+class _Stream:
+    """
+    Estado de uma fonte: captura, linha, semáforo, tracker e contagem.
+    """
+    def __init__(self, cc: CarCounter, config: Dict[str, Any], realtime: bool,
+                 notify: threading.Event, out_dir: Optional[str]):
+        self.name      = str(config['name'])
+        self.grabber   = FrameGrabber(config['source'], realtime=realtime, notify=notify)
+        W, H           = self.grabber.size
+        p1, p2         = cc._compute_line(config['points'], W, H)
+        self.line      = LineCounter(p1, p2, sweep=self.grabber.realtime)
+        self.crop      = cc._compute_roi(config.get('roi'), None, p1, p2, W, H)
+        self.green     = config['green_duration']
+        self.cycle     = config['green_duration'] + config['red_duration']
+        self.tracker   = make_tracker(config['tracker_model'])
+        self.state     = TrackState()
+        self.horizon   = IdHorizon()
+        self.roller    = StatsRoller()
+        self.writer    = RotatingDetectionWriter(f"{out_dir}/{self.name}") if out_dir else None
+        self.pending: Optional[tuple] = None
+        self.skipped   = 0
+        self.status    = {'frames': 0, 'dropped': 0, 'stale': 0, 'lag': 0.0}
+
+    @property
+    def active(self) -> bool:
+        return self.pending is not None or not self.grabber.finished
+
+    def close(self):
+        self.grabber.close()
+        if self.writer is not None:
+            self.writer.flush()
+
+
+class MultiStreamCounter:
+    """
+    Um modelo (próprio, fora do registro: o predict em lote não pode herdar
+    os callbacks de tracking de um model.track anterior) para várias fontes.
+    conf/iou são do detector, logo comuns a todas as fontes.
+    """
+    def __init__(self, model_path: str = 'yolov8n.pt', conf: float = 0.25, iou: float = 0.45,
+                 max_batch: int = 16, max_wait: float = 0.05, max_latency: float = 1.0,
+                 verbose: int = 0, backend: str = backends.DEFAULT_BACKEND,
+                 precision: str = backends.DEFAULT_PRECISION):
+        self.cc          = CarCounter(model_path=model_path, verbose=verbose,
+                                      backend=backend, precision=precision)
+        self.conf        = conf
+        self.iou         = iou
+        self.max_batch   = max_batch
+        self.max_wait    = max_wait
+        self.max_latency = max_latency
+        self.status: Dict[str, Dict[str, float]] = {}
+        self.batches     = {'count': 0, 'frames': 0, 'infer_s': 0.0}
+
+    def _infer(self, streams: List[_Stream]):
+        """
+        Um lote: predict conjunto, depois tracking e contagem por fonte.
+        Retorna as linhas de estatística (por segundo) encerradas.
+        """
+        imgs = []
+        for s in streams:
+            frame = s.pending[3]
+            if s.crop is not None:
+                x1, y1, x2, y2 = s.crop
+                frame = frame[y1:y2, x1:x2]
+            imgs.append(frame)
+
+        t0 = time.perf_counter()
+        results = self.cc.model.predict(
+            imgs, conf=self.conf, iou=self.iou, device=self.cc.device,
+            half=self.cc.fp16, verbose=(self.cc.verbose >= 2)
+        )
+        self.batches['count']   += 1
+        self.batches['frames']  += len(imgs)
+        self.batches['infer_s'] += time.perf_counter() - t0
+
+        rows = []
+        for s, img, result in zip(streams, imgs, results):
+            _, ts, captured, _ = s.pending
+            s.pending = None
+            result = track_result(s.tracker, result, img)
+            dets, _, dg, dr = self.cc._process_frame(
+                result, ts, 1.0, s.line, s.cycle, s.green, s.state,
+                annotate=False, roi=s.crop
+            )
+            if s.writer is not None:
+                s.writer.append(dets)
+            low = s.horizon.update(ts, dets['id'])
+            if low is not None:
+                s.state.trim(low)
+            s.status.update(frames=s.grabber.frames, dropped=s.grabber.dropped + s.skipped,
+                            lag=time.monotonic() - captured)
+            rows += [{'stream': s.name, **row}
+                     for row in s.roller.update(ts, dets['id'], dg, dr, len(s.state))]
+        return rows
+
+    def run(self, configs: Sequence[Dict[str, Any]], realtime: bool = True,
+            out_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Processa as fontes de `configs` (cada uma: name, source e as chaves do
+        config.json) até todas terminarem ou o gerador ser fechado. Gera linhas
+        de estatística por segundo, como CarCounter.stream, com a coluna `stream`.
+        Estado por fonte em `self.status`; lotes em `self.batches`.
+        """
+        notify  = threading.Event()
+        streams = [_Stream(self.cc, config, realtime, notify, out_dir) for config in configs]
+        self.status = {s.name: s.status for s in streams}
+
+        with self.cc.lock:
+            try:
+                for s in streams:
+                    s.grabber.start()
+                deadline: Optional[float] = None
+                while any(s.active for s in streams):
+                    notify.wait(timeout=self.max_wait if deadline is None
+                                else max(0.0, deadline - time.monotonic()))
+                    notify.clear()
+
+                    now = time.monotonic()
+                    for s in streams:
+                        live = s.grabber.realtime
+                        # ao vivo só o frame mais recente fica pendente
+                        while (live or s.pending is None) and (item := s.grabber.poll()) is not None:
+                            if s.pending is not None:
+                                s.skipped += 1
+                            s.pending = item
+                        if live and s.pending is not None and now - s.pending[2] > self.max_latency:
+                            s.pending = None
+                            s.status['stale'] += 1
+
+                    ready = [s for s in streams if s.pending is not None]
+                    if not ready:
+                        deadline = None
+                        continue
+                    oldest  = min(s.pending[2] for s in ready)
+                    waiting = [s for s in streams if s.pending is None and not s.grabber.finished]
+                    if waiting and len(ready) < self.max_batch and now - oldest < self.max_wait:
+                        deadline = oldest + self.max_wait
+                        continue
+                    deadline = None
+
+                    for i in range(0, len(ready), self.max_batch):
+                        for row in self._infer(ready[i:i+self.max_batch]):
+                            yield row
+                for s in streams:
+                    for row in s.roller.flush():
+                        yield {'stream': s.name, **row}
+            finally:
+                for s in streams:
+                    s.close()
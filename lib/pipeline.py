@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_DONE = object()
+
+
+class StageTimes:
+    """
+    Tempo ocupado (s) e itens processados por estágio do pipeline.
+    """
+    def __init__(self):
+        self.busy: Dict[str,float] = {}
+        self.count: Dict[str,int]  = {}
+        self.wall = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, dt: float):
+        with self._lock:
+            self.busy[stage]  = self.busy.get(stage, 0.0) + dt
+            self.count[stage] = self.count.get(stage, 0) + 1
+
+    def bottleneck(self) -> Optional[str]:
+        return max(self.busy, key=self.busy.get) if self.busy else None  # type:ignore
+
+    def to_dict(self) -> Dict[str,Any]:
+        return {
+            'wall_s': self.wall,
+            'bottleneck': self.bottleneck(),
+            'stages': {
+                name: {
+                    'busy_s': busy,
+                    'items': self.count[name],
+                    'ms_per_item': 1e3 * busy / max(self.count[name], 1),
+                    'utilization': busy / self.wall if self.wall else 0.0,
+                }
+                for name, busy in self.busy.items()
+            }
+        }
+
+    def report(self) -> str:
+        lines = [f"{'estágio':<10} {'ms/item':>9} {'ocupação':>9}"]
+        for name, st in self.to_dict()['stages'].items():
+            lines.append(f"{name:<10} {st['ms_per_item']:>9.2f} {st['utilization']:>8.0%}")
+        lines.append(f"gargalo: {self.bottleneck()} | total {self.wall:.1f}s")
+        return "\n".join(lines)
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+    maxsize: int = 8,
+    times: Optional[StageTimes] = None,
+    source_name: str = 'decode',
+) -> Iterator[Any]:
+    """
+    Executa `source` e cada função de `stages` em threads próprias, ligadas por
+    filas limitadas a `maxsize` (backpressure: um estágio rápido bloqueia quando
+    o seguinte está cheio). Cada estágio tem uma única thread, logo a ordem dos
+    itens é preservada. Gera as saídas do último estágio na thread chamadora.
+
+    Uma exceção em qualquer estágio interrompe o pipeline e é relançada aqui.
+    """
+    times  = times if times is not None else StageTimes()
+    stop   = threading.Event()
+    errors: List[BaseException] = []
+    queues = [queue.Queue(maxsize=maxsize) for _ in range(len(stages) + 1)]
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q: queue.Queue):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def fail(exc: BaseException):
+        errors.append(exc)
+        stop.set()
+
+    def produce():
+        try:
+            it = iter(source)
+            while True:
+                t0 = time.perf_counter()
+                item = next(it, _DONE)
+                if item is _DONE:
+                    break
+                times.add(source_name, time.perf_counter() - t0)
+                if not put(queues[0], item):
+                    return
+            put(queues[0], _DONE)
+        except BaseException as exc:
+            fail(exc)
+
+    def work(name: str, fn: Callable, q_in: queue.Queue, q_out: queue.Queue):
+        try:
+            while True:
+                item = get(q_in)
+                if item is _DONE:
+                    break
+                t0  = time.perf_counter()
+                out = fn(item)
+                times.add(name, time.perf_counter() - t0)
+                if not put(q_out, out):
+                    return
+            put(q_out, _DONE)
+        except BaseException as exc:
+            fail(exc)
+
+    threads = [threading.Thread(target=produce, name=source_name, daemon=True)]
+    threads += [
+        threading.Thread(target=work, args=(name, fn, queues[i], queues[i+1]), name=name, daemon=True)
+        for i, (name, fn) in enumerate(stages)
+    ]
+
+    t_start = time.perf_counter()
+    for th in threads:
+        th.start()
+    try:
+        while True:
+            item = get(queues[-1])
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        for th in threads:
+            th.join()
+        times.wall = time.perf_counter() - t_start
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,237 @@
+"""
+Instrumentação de uma execução de CarCounter.process (profile=...): tempo
+por etapa, contadores e pico de memória, gravados em profile.json ao lado do
+config.json (results.save_results) e exibidos na página de resultados.
+
+Etapas (tempo acumulado e chamadas):
+  decode        leitura/decodificação dos frames
+  track         model.track inteiro; com os tempos medidos pelo ultralytics
+                (result.speed) ele é dividido em track.preprocess, track.inference,
+                track.postprocess e track.tracker (associação do tracker e o
+                restante do model.track)
+  count         extração das boxes e contagem na linha (_process_frame)
+  draw          desenho da linha, ROI e boxes
+  zones         contagem e desenho das zonas
+  encode        escrita do vídeo de saída
+  sink          gravação das detecções e tracks (Parquet)
+  stats         acumulação das estatísticas
+Com pipelined=True as etapas rodam sobrepostas em threads: a ocupação de
+cada thread do pipeline (StageTimes) vai junto, em "pipeline".
+
+Modos: None (desligado: `stage` devolve um contexto nulo compartilhado e
+`count` retorna logo, custo desprezível), "timers" e "cprofile" (timers +
+cProfile da thread principal, gravado em profile.prof para snakeviz ou
+flameprof; use sem pipelined, senão inferência e encode ficam de fora).
+"""
+import contextlib
+import cProfile
+import pstats
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+from lib.pipeline import StageTimes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type:ignore
+
+MODES = (None, 'timers', 'cprofile')
+
+# partes de model.track medidas pelo próprio ultralytics (ms em result.speed)
+SPEED_PARTS = ('preprocess', 'inference', 'postprocess')
+
+# funções listadas no profile.json no modo cprofile
+TOP_FUNCTIONS = 25
+
+_NULL = contextlib.nullcontext()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Pico de memória residente do processo (MB), desde o seu início.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB; macOS: bytes
+    return peak / (1e6 if sys.platform == 'darwin' else 1e3)
+
+
+def _cuda_peak_mb(reset: bool = False) -> Optional[float]:
+    try:
+        import torch
+        if not torch.cuda.is_available() or not torch.cuda.is_initialized():
+            return None
+        if reset:
+            torch.cuda.reset_peak_memory_stats()
+        return torch.cuda.max_memory_allocated() / 1e6
+    except Exception:
+        return None
+
+
+class _Stage:
+    __slots__ = ('times', 'name', 't0')
+
+    def __init__(self, times: StageTimes, name: str):
+        self.times = times
+        self.name  = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.times.add(self.name, time.perf_counter() - self.t0)
+
+
+class Profiler:
+    """
+    Timers por etapa (StageTimes, seguro entre threads), contadores e
+    memória de uma execução. Uso:
+
+        prof = Profiler('timers').start()
+        with prof.stage('track'):
+            ...
+        prof.count('boxes', n)
+        prof.stop()
+        prof.to_dict()
+    """
+    def __init__(self, mode: Optional[str] = None):
+        if mode not in MODES:
+            raise ValueError(f"Modo de perfil inválido: {mode!r} (use {MODES})")
+        self.mode     = mode
+        self.enabled  = mode is not None
+        self.times    = StageTimes()
+        self.counters: Dict[str, int] = {}
+        self._lock    = threading.Lock()
+        self._profile = cProfile.Profile() if mode == 'cprofile' else None
+        self._t0      = 0.0
+        self._rss0    = None
+
+    def start(self) -> "Profiler":
+        if self.enabled:
+            self._rss0 = peak_rss_mb()
+            _cuda_peak_mb(reset=True)
+            self._t0 = time.perf_counter()
+            if self._profile is not None:
+                self._profile.enable()
+        return self
+
+    def stop(self):
+        if self.enabled and not self.times.wall:
+            if self._profile is not None:
+                self._profile.disable()
+            self.times.wall = time.perf_counter() - self._t0
+
+    def stage(self, name: str):
+        """
+        Contexto que soma a duração do bloco à etapa `name`.
+        """
+        return _Stage(self.times, name) if self.enabled else _NULL
+
+    def add(self, name: str, seconds: float):
+        """
+        Soma um tempo medido fora do profiler (ex.: result.speed) à etapa `name`.
+        """
+        if self.enabled:
+            self.times.add(name, seconds)
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def iter(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        `iterable` com o tempo de cada next() somado à etapa `name`.
+        """
+        if not self.enabled:
+            return iter(iterable)
+        return self._timed(name, iter(iterable))
+
+    def _timed(self, name: str, it: Iterator) -> Iterator:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.times.add(name, time.perf_counter() - t0)
+            yield item
+
+    def track_speed(self, result):
+        """
+        Divide o tempo de model.track pelos tempos do ultralytics (result.speed, ms).
+        """
+        speed = getattr(result, 'speed', None) if self.enabled else None
+        if speed:
+            for part in SPEED_PARTS:
+                if speed.get(part) is not None:
+                    self.times.add(f'track.{part}', speed[part] / 1e3)
+
+    def stats(self) -> Optional[Dict]:
+        """
+        Estatísticas do cProfile (formato de pstats.Stats.dump_stats), ou None.
+        """
+        if self._profile is None:
+            return None
+        return pstats.Stats(self._profile).stats  # type:ignore
+
+    def _top_functions(self):
+        stats = pstats.Stats(self._profile)
+        stats.sort_stats('cumulative')
+        rows = []
+        for func in stats.fcn_list[:TOP_FUNCTIONS]:  # type:ignore
+            _, calls, tottime, cumtime, _ = stats.stats[func]  # type:ignore
+            rows.append({'function': pstats.func_std_string(func), 'calls': calls,
+                         'tottime_s': tottime, 'cumtime_s': cumtime})
+        return rows
+
+    def to_dict(self, pipeline: Optional[StageTimes] = None) -> Dict[str, Any]:
+        wall   = self.times.wall
+        frames = self.counters.get('frames', 0)
+        busy   = dict(self.times.busy)
+        calls  = dict(self.times.count)
+        # o que sobra de model.track fora das partes medidas pelo ultralytics
+        parts = [busy[f'track.{part}'] for part in SPEED_PARTS if f'track.{part}' in busy]
+        if 'track' in busy and parts:
+            busy['track.tracker']  = max(busy['track'] - sum(parts), 0.0)
+            calls['track.tracker'] = calls['track']
+        return {
+            'mode': self.mode,
+            'wall_s': wall,
+            'frames': frames,
+            'fps': frames / wall if wall else 0.0,
+            'stages': {
+                name: {
+                    'total_s': seconds,
+                    'calls': calls[name],
+                    'ms_per_call': 1e3 * seconds / max(calls[name], 1),
+                    'ms_per_frame': 1e3 * seconds / max(frames, 1),
+                    'share': seconds / wall if wall else 0.0,
+                }
+                for name, seconds in busy.items()
+            },
+            'counters': dict(self.counters),
+            'memory': {
+                'peak_rss_mb': peak_rss_mb(),
+                'peak_rss_at_start_mb': self._rss0,
+                'cuda_peak_mb': _cuda_peak_mb(),
+            },
+            'pipeline': pipeline.to_dict() if pipeline is not None else None,
+            'cprofile': self._top_functions() if self._profile is not None else None,
+        }
+
+    def report(self) -> str:
+        profile = self.to_dict()
+        lines = [f"{'etapa':<18} {'ms/frame':>9} {'chamadas':>9} {'tempo':>7}"]
+        for name, st in sorted(profile['stages'].items()):
+            lines.append(f"{name:<18} {st['ms_per_frame']:>9.2f} {st['calls']:>9} {st['share']:>6.0%}")
+        lines.append(" · ".join(f"{k}: {v}" for k, v in profile['counters'].items()))
+        lines.append(f"{profile['frames']} frames em {profile['wall_s']:.1f}s ({profile['fps']:.1f} frames/s)")
+        return "\n".join(lines)
+
+
+# instância desligada, padrão de quem aceita um profiler opcional
+DISABLED = Profiler()
@@ -0,0 +1,236 @@
+"""
+Recontagem de um resultado a partir dos tracks em cache (lib.tracks), sem
+rodar o modelo.
+
+Trocar a linha, os tempos do semáforo ou as zonas só muda a parte geométrica
+do processamento: os tracks gravados por CarCounter.process(tracks_dir=...)
+são recontados de uma vez com `count_tracks` (como em lib.chunked) e as
+zonas reproduzidas frame a frame, com o mesmo resultado de processar o vídeo
+de novo com a nova configuração (mesmo modelo, conf, iou, tracker e ROI).
+Exceção: com stride adaptativo os frames rastreados foram escolhidos pela
+distância à linha original, e a recontagem usa esses mesmos frames.
+
+O vídeo só é regerado se pedido (`render`): o original é decodificado e as
+boxes do cache redesenhadas, ainda sem inferência. No modo overlay nada é
+decodificado: só o arquivo de boxes é regravado.
+
+Uso:
+  python -m lib.recount ".videos/01 video.mp4" --points 0.2 0.6 1.0 0.6 --green 30 --red 10 [--render]
+"""
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+import pandas as pd # type:ignore
+from typing import Any, Dict, Optional, Sequence, Tuple
+from lib import encoding, results, tracks as track_cache
+from lib.car_counter import CarCounter
+from lib.chunked import detections_from_tracks
+from lib.counting import LineCounter, VEHICLE_CLASSES, count_tracks, signal_light
+from lib.sink import DetectionSink, StatsAccumulator
+from lib.zones import ZoneCounter, count_zones
+
+
+def _line(meta: Dict[str, Any], config: Dict[str, Any]) -> LineCounter:
+    p1, p2 = CarCounter._compute_line(config['points'], meta['width'], meta['height'])
+    # como em process: com frames pulados a passagem também conta pela troca de lado
+    return LineCounter(p1, p2, sweep=(meta['stride'] > 1))
+
+
+def _zone_counter(meta: Dict[str, Any], config: Dict[str, Any], threshold: float) -> ZoneCounter:
+    reach = meta['max_speed'] * meta['stride'] if meta['stride'] > 1 else 0.0
+    return ZoneCounter(config['zones'], meta['width'], meta['height'], threshold, reach=reach)
+
+
+def recount_tracks(
+    tracks: pd.DataFrame,
+    meta: Dict[str, Any],
+    config: Dict[str, Any],
+) -> Tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """
+    Contagem dos tracks de uma entrada do cache (`meta`: seus metadados)
+    com a linha, semáforo e zonas de `config`.
+
+    Retorna:
+      df, stats: como detections/stats de CarCounter.process
+      zone_df, zone_stats: como zone_detections/zone_stats (None sem zonas)
+    """
+    fps   = meta['fps']
+    line  = _line(meta, config)
+    cycle = config['green_duration'] + config['red_duration']
+    df    = detections_from_tracks(tracks, fps, line, cycle, config['green_duration'])
+    stats = CarCounter.compute_stats_from_detections(df)
+    if not config.get('zones'):
+        return df, stats, None, None
+
+    # zonas: mesmo laço por frame de process, sobre as detecções já recontadas
+    counter = _zone_counter(meta, config, line.threshold)
+    accs    = [StatsAccumulator() for _ in range(len(counter))]
+    sink    = DetectionSink(dtypes=results.ZONE_DTYPES)
+    times   = df['time'].to_numpy()
+    ids     = df['id'].to_numpy()
+    cx, cy  = df['x1'].to_numpy(), df['y1'].to_numpy()
+    bounds  = np.r_[0, np.flatnonzero(np.diff(times)) + 1, len(times)] if len(times) else np.zeros(1, dtype=int)
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        ts = times[a]
+        sink.append(count_zones(counter, accs, ts, ids[a:b], cx[a:b], cy[a:b],
+                                signal_light(ts, cycle, config['green_duration'])))
+    sink.close()
+    zone_stats = pd.concat([acc.to_frame().assign(zone=z) for z, acc in enumerate(accs)], ignore_index=True)
+    return df, stats, sink.to_frame(), zone_stats
+
+
+def render(
+    video_path: str,
+    output: str,
+    tracks: pd.DataFrame,
+    meta: Dict[str, Any],
+    config: Dict[str, Any],
+    output_mode: str = 'full',
+):
+    """
+    Regera o vídeo anotado de `video_path` em `output` (modo `output_mode`)
+    a partir dos tracks do cache, desenhando como CarCounter.process: nos
+    frames pulados (stride) ficam as últimas boxes rastreadas.
+    """
+    W, H, fps = meta['width'], meta['height'], meta['fps']
+    line   = _line(meta, config)
+    cycle  = config['green_duration'] + config['red_duration']
+    crop   = tuple(meta['roi']) if meta.get('roi') else None
+    zones  = _zone_counter(meta, config, line.threshold) if config.get('zones') else None
+
+    veh    = tracks[tracks['cls'].isin(VEHICLE_CLASSES)].sort_values('frame', kind='stable')
+    frames = veh['frame'].to_numpy()
+    ids    = veh['id'].to_numpy().astype(int)
+    boxes  = veh[['x1','y1','x2','y2']].to_numpy()
+    passes = count_tracks(frames, ids, *line.centroids(boxes), fps, line, cycle, config['green_duration'])
+
+    # frames rastreados (inclusive os sem boxes) e onde começam/terminam suas linhas
+    tracked = np.unique(tracks['frame'].to_numpy())
+    lo, hi  = np.searchsorted(frames, tracked, 'left'), np.searchsorted(frames, tracked, 'right')
+    # frames com passagem (primeira de cada id), que abrem trechos no modo events
+    hits    = passes != 0
+    crossed = set(pd.Series(frames[hits]).groupby(ids[hits]).min().tolist())
+
+    writer = encoding.open_output(output_mode, output, fps, (W, H), video_path)
+    decode = any(writer.needs_frame(idx) for idx in range(meta['frames']))
+    cap    = cv2.VideoCapture(video_path) if decode else None
+    if cap is not None and not cap.isOpened():
+        raise IOError(f"Cannot open video: {video_path}")
+
+    held  = (boxes[:0], ids[:0], passes[:0])
+    # anel de buffers de decodificação: a saída pode guardar frames anteriores (events)
+    ring  = [None] * (1 + writer.keeps_frames)
+    k     = 0
+    try:
+        for idx in range(meta['frames']):
+            annotated = None
+            if cap is not None:
+                if writer.needs_frame(idx):
+                    ok, frame = cap.read(ring[idx % len(ring)])
+                    ring[idx % len(ring)] = frame
+                    annotated = frame if ok else None
+                else:
+                    ok = cap.grab()
+                if not ok:
+                    break
+            if k < len(tracked) and tracked[k] == idx:
+                held = (boxes[lo[k]:hi[k]], ids[lo[k]:hi[k]], passes[lo[k]:hi[k]])
+                k += 1
+            if annotated is not None:
+                CarCounter._annotate(annotated, line, signal_light(idx / fps, cycle, config['green_duration']),
+                                     *held, crop)
+                if zones is not None:
+                    zones.draw(annotated)
+            writer.write(idx, annotated, held if writer.needs_tracks else None, idx in crossed)
+    finally:
+        if cap is not None:
+            cap.release()
+        writer.release()
+
+
+def source_video(result_path: str, tracks_meta: Dict[str, Any], config: Dict[str, Any]) -> Optional[str]:
+    """
+    Vídeo original de um resultado, se ainda disponível: no modo overlay o
+    próprio video.mp4 é o original; senão a cópia guardada no cache pela
+    fila (lib.tracks.keep_source) ou o arquivo processado, se ainda existe.
+    """
+    if config.get('output_mode') == 'overlay' and os.path.exists(f"{result_path}/video.mp4"):
+        return f"{result_path}/video.mp4"
+    for path in (track_cache.source_path(tracks_meta), tracks_meta.get('source')):
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def recount(
+    result_path: str,
+    points: Optional[Tuple[Tuple[float,float],Tuple[float,float]]] = None,
+    green_duration: Optional[int] = None,
+    red_duration: Optional[int] = None,
+    zones: Optional[Sequence[Dict[str, Any]]] = None,
+    render_video: bool = False,
+    video_path: Optional[str] = None,
+    catalog: bool = True,
+) -> Dict[str, Any]:
+    """
+    Refaz a contagem do resultado em `result_path` com a nova configuração
+    (None mantém o valor atual; zones=[] remove as zonas) e regrava tabelas,
+    rollups, config.json e meta.json.
+
+    render_video: regera o vídeo a partir de `video_path` (padrão:
+    source_video); sem isso o vídeo antigo é mantido e o meta.json o marca
+    como desatualizado (video_stale).
+
+    Retorna o meta.json atualizado.
+    """
+    meta = results.read_meta(result_path)
+    if not track_cache.exists(meta.get('tracks')):
+        raise FileNotFoundError(f"Sem tracks em cache para {result_path}: processe o vídeo novamente")
+    changes = {'points': points, 'green_duration': green_duration, 'red_duration': red_duration, 'zones': zones}
+    config  = {**meta['config'], **{k: v for k, v in changes.items() if v is not None}}
+
+    tracks, tmeta = track_cache.load_tracks(meta['tracks'])
+    df, stats, zone_df, zone_stats = recount_tracks(tracks, tmeta, config)
+
+    if render_video:
+        video_path = video_path or source_video(result_path, tmeta, config)
+        if video_path is None:
+            raise FileNotFoundError("Vídeo original indisponível para regerar o vídeo anotado")
+        render(video_path, f"{result_path}/video.mp4", tracks, tmeta, config, config.get('output_mode') or 'full')
+
+    if zone_df is not None:
+        results.compact(zone_df, results.ZONE_DTYPES).to_parquet(f"{result_path}/zones.parquet", index=False)
+    else:
+        for name in ("zones.parquet", "zone_stats.parquet"):
+            if os.path.exists(f"{result_path}/{name}"):
+                os.remove(f"{result_path}/{name}")
+
+    # config.json guarda tuplas como listas
+    stale = not render_video and (meta.get('video_stale') or json.loads(json.dumps(config)) != meta['config'])
+    info  = {'width': tmeta['width'], 'height': tmeta['height'], 'fps': tmeta['fps'], 'frames': tmeta['frames'],
+             'tracks': meta['tracks'], 'cache': meta.get('cache'), 'video_stale': stale}
+    results.save_results(result_path, df, stats, config, info=info, catalog=catalog, zone_stats=zone_stats)
+    return results.read_meta(result_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recontagem de um resultado a partir dos tracks em cache.")
+    parser.add_argument('result', help="pasta do resultado (ex.: .videos/01 video.mp4)")
+    parser.add_argument('--points', type=float, nargs=4, metavar=('X1', 'Y1', 'X2', 'Y2'))
+    parser.add_argument('--green', type=int, help="duração do sinal verde (s)")
+    parser.add_argument('--red', type=int, help="duração do sinal vermelho (s)")
+    parser.add_argument('--render', action='store_true', help="regera o vídeo anotado")
+    parser.add_argument('--video', help="vídeo original, se não estiver mais disponível")
+    args = parser.parse_args()
+
+    points = ((args.points[0], args.points[1]), (args.points[2], args.points[3])) if args.points else None
+    t0   = time.perf_counter()
+    meta = recount(args.result, points, args.green, args.red, render_video=args.render, video_path=args.video)
+    print(f"{meta['id']}: {meta['totals']} em {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,450 @@
+import json
+import marshal
+import os
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+import pandas as pd # type:ignore
+import pyarrow.parquet as pq # type:ignore
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from lib import encoding, rollups as rollups_
+
+RESULTS_DIR = ".videos"
+
+# cache dos loaders da página de resultados, invalidado pelo mtime/tamanho do arquivo
+_CACHE: "OrderedDict[Tuple[str, Any], Tuple[Tuple[int, int], Any]]" = OrderedDict()
+_CACHE_SIZE   = 64
+_cache_lock   = threading.Lock()
+_catalog_lock = threading.Lock()
+
+# tipos compactos usados no formato colunar (Parquet)
+DETECTION_DTYPES = {'time': np.float32, 'id': np.int32, 'x1': np.int32, 'y1': np.int32, 'pass': np.int8}
+# detecções dentro das zonas (lib.zones): `zone` é o índice em config["zones"]
+ZONE_DTYPES = {**DETECTION_DTYPES, 'zone': np.int16}
+STATS_DTYPES = {
+    'time': np.float32, 'detected': np.int32, 'detected_total': np.int32,
+    'green': np.int32, 'green_total': np.int32, 'red': np.int32, 'red_total': np.int32,
+    'passed': np.int32, 'passed_total': np.int32,
+}
+ZONE_STATS_DTYPES = {**STATS_DTYPES, 'zone': np.int16}
+# tracks brutos de model.track (lib.tracks): todas as classes, xyxy em px do frame inteiro
+TRACK_DTYPES = {
+    'frame': np.int32, 'id': np.int32, 'cls': np.int16, 'conf': np.float32,
+    'x1': np.float32, 'y1': np.float32, 'x2': np.float32, 'y2': np.float32,
+}
+
+# chaves do config.json gravado a cada processamento
+CONFIG_DEFAULTS: Dict[str, Any] = {
+    "points": ((0.20, 0.55), (1.00, 0.55)),
+    "roi": None,
+    "conf": 0.25,
+    "iou": 0.45,
+    "tracker_model": "botsort",
+    "green_duration": 20,
+    "red_duration": 5,
+    "output_mode": "full",
+    # linhas e polígonos extras: [{"name": ..., "points": [[x, y], ...]}] (lib.zones)
+    "zones": [],
+    # perfil de desempenho da execução: None, "timers" ou "cprofile" (lib.profiling)
+    "profile": None,
+}
+
+
+def next_result_id(name: str, results_dir: str = RESULTS_DIR, offset: int = 0) -> str:
+    """
+    Id da próxima pasta de resultado: "<nº sequencial> <nome>".
+    """
+    n = sum(entry.is_dir() for entry in os.scandir(results_dir)) + 1 + offset
+    return f"{str(n).zfill(2)} {name}"
+
+
+def load_config(path: Optional[str] = None, **overrides) -> Dict[str, Any]:
+    """
+    Config completo: CONFIG_DEFAULTS, sobrescrito pelo JSON em `path` e por `overrides`.
+    """
+    config = dict(CONFIG_DEFAULTS)
+    if path is not None:
+        with open(path, "r") as f:
+            config.update(json.load(f))
+    config.update(overrides)
+    return config
+
+
+def process_kwargs(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Argumentos de CarCounter.process correspondentes a um config.
+    """
+    return {
+        "points": config["points"],
+        "roi": config.get("roi"),
+        "conf": config["conf"],
+        "iou": config["iou"],
+        "tracker_model": config["tracker_model"],
+        "green_duration": config["green_duration"],
+        "red_duration": config["red_duration"],
+        "output_mode": config.get("output_mode", "full"),
+        "zones": config.get("zones") or None,
+        "profile": config.get("profile"),
+    }
+
+
+def compact(df: pd.DataFrame, dtypes: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Converte as colunas presentes em `dtypes` para os tipos compactos.
+    """
+    return df.astype({col: dt for col, dt in dtypes.items() if col in df.columns})
+
+
+def _cached(path: str, key: Any, loader: Callable[[], Any]) -> Any:
+    """
+    `loader()` memorizado por (path, key) enquanto `path` não muda. Os
+    objetos devolvidos são compartilhados entre reruns: não modificar.
+    """
+    st      = os.stat(path)
+    version = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        hit = _CACHE.get((path, key))
+        if hit is not None and hit[0] == version:
+            _CACHE.move_to_end((path, key))
+            return hit[1]
+    value = loader()
+    with _cache_lock:
+        _CACHE[(path, key)] = (version, value)
+        _CACHE.move_to_end((path, key))
+        while len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return value
+
+
+def save_results(result_path: str, df: Optional[pd.DataFrame], stats: pd.DataFrame, config: Dict[str, Any],
+                 info: Optional[Dict[str, Any]] = None, catalog: bool = True,
+                 zone_stats: Optional[pd.DataFrame] = None):
+    """
+    Grava detections.parquet, stats.parquet, config.json e meta.json em `result_path`.
+    Com df=None as detecções já foram gravadas em detections.parquet durante o
+    processamento (CarCounter.process com detections_path).
+    CSVs são gerados sob demanda por `export_csv`.
+
+    info: ProcessResult.info (dimensões, fps, frames) para o meta.json; com
+    um perfil (process com profile=...), grava também profile.json e, no modo
+    cprofile, profile.prof (formato do pstats).
+    zone_stats: ProcessResult.zone_stats, gravado em zone_stats.parquet (as
+    detecções por zona vão para zones.parquet durante o processamento).
+    catalog: atualiza o catálogo da pasta pai; processos que não são o único
+    escritor (workers do lote) devem deixar isso para o processo principal.
+    """
+    os.makedirs(result_path, exist_ok=True)
+    if df is not None:
+        compact(df, DETECTION_DTYPES).to_parquet(f"{result_path}/detections.parquet", index=False)
+    save_rollups(result_path, stats, config)
+    if zone_stats is not None:
+        compact(zone_stats, ZONE_STATS_DTYPES).to_parquet(f"{result_path}/zone_stats.parquet", index=False)
+
+    with open(f"{result_path}/config.json", "w") as f:
+        json.dump({key: config.get(key) for key in CONFIG_DEFAULTS}, f, indent=4)
+    if info and info.get("profile"):
+        with open(f"{result_path}/profile.json", "w") as f:
+            json.dump(info["profile"], f, indent=4)
+        if info.get("profile_stats") is not None:
+            with open(f"{result_path}/profile.prof", "wb") as f:
+                marshal.dump(info["profile_stats"], f)
+
+    meta = build_meta(result_path, stats, config, info)
+    write_meta(result_path, meta)
+    # por último: stats.parquet marca o resultado como concluído (has_results),
+    # então um catálogo reconstruído por outro processo não pega a pasta pela metade
+    compact(stats, STATS_DTYPES).to_parquet(f"{result_path}/stats.parquet", index=False)
+    if catalog:
+        update_catalog(os.path.dirname(os.path.normpath(result_path)), meta)
+
+
+def build_meta(result_path: str, stats: pd.DataFrame, config: Dict[str, Any],
+               info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Metadados do resultado: dimensões, duração, totais e config. Sem `info`,
+    as dimensões vêm do video.mp4 (se existir). `info` também traz a entrada
+    do cache de tracks (lib.tracks), se ela já existia (cache: hit, resume
+    ou miss) e se o vídeo ficou desatualizado em relação ao config
+    (recontagem sem regerar o vídeo, ver lib.recount).
+    """
+    info  = dict(info or {})
+    video = f"{result_path}/video.mp4"
+    if not info.get("width") and os.path.exists(video):
+        cap = cv2.VideoCapture(video)
+        info.update(
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            fps=cap.get(cv2.CAP_PROP_FPS),
+            frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        )
+        cap.release()
+
+    last   = stats.iloc[-1] if len(stats) else None
+    frames = info.get("frames")
+    fps    = info.get("fps")
+    return {
+        "id": os.path.basename(os.path.normpath(result_path)),
+        "created": time.time(),
+        "width": info.get("width"),
+        "height": info.get("height"),
+        "fps": fps,
+        "frames": frames,
+        "duration": frames / fps if frames and fps else (float(last["time"]) if last is not None else 0.0),
+        "totals": {
+            col: int(last[f"{col}_total"]) if last is not None else 0
+            for col in ("detected", "green", "red", "passed")
+        },
+        "config": {key: config.get(key) for key in CONFIG_DEFAULTS},
+        "tracks": info.get("tracks"),
+        "cache": info.get("cache"),
+        "video_stale": bool(info.get("video_stale")),
+    }
+
+
+def write_meta(result_path: str, meta: Dict[str, Any]):
+    with open(f"{result_path}/meta.json", "w") as f:
+        json.dump(meta, f, indent=4)
+
+
+def read_meta(result_path: str) -> Dict[str, Any]:
+    """
+    meta.json do resultado (em cache); pastas antigas o ganham na primeira leitura.
+    """
+    path = f"{result_path}/meta.json"
+    if not os.path.exists(path):
+        with open(f"{result_path}/config.json", "r") as f:
+            config = json.load(f)
+        write_meta(result_path, build_meta(result_path, load_stats(result_path), config))
+
+    def load():
+        with open(path, "r") as f:
+            return json.load(f)
+    return _cached(path, "meta", load)
+
+
+def catalog_path(results_dir: str = RESULTS_DIR) -> str:
+    return f"{results_dir}/catalog.json"
+
+
+def _write_catalog(results_dir: str, entries: Dict[str, Dict[str, Any]]):
+    path = catalog_path(results_dir)
+    tmp  = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(entries, f, indent=4)
+    os.replace(tmp, path)
+    # o catálogo fica com o mtime da pasta após a escrita: pastas de resultado
+    # criadas ou removidas depois disso o tornam desatualizado (ver load_catalog)
+    st = os.stat(results_dir)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def rebuild_catalog(results_dir: str = RESULTS_DIR) -> Dict[str, Dict[str, Any]]:
+    """
+    Reconstrói catalog.json a partir do meta.json de cada resultado concluído.
+    """
+    entries = {
+        entry.name: read_meta(entry.path)
+        for entry in sorted(os.scandir(results_dir), key=lambda e: e.name)
+        if entry.is_dir() and has_results(entry.path)
+    }
+    _write_catalog(results_dir, entries)
+    return entries
+
+
+def update_catalog(results_dir: str, meta: Dict[str, Any]):
+    """
+    Inclui (ou substitui) um resultado no catálogo.
+    """
+    with _catalog_lock:
+        if not os.path.exists(catalog_path(results_dir)):
+            rebuild_catalog(results_dir)
+            return
+        with open(catalog_path(results_dir), "r") as f:
+            entries = json.load(f)
+        entries[meta["id"]] = meta
+        _write_catalog(results_dir, dict(sorted(entries.items())))
+
+
+def load_catalog(results_dir: str = RESULTS_DIR) -> Dict[str, Dict[str, Any]]:
+    """
+    id -> metadados de todos os resultados concluídos, sem abrir cada pasta:
+    o catálogo só é reconstruído se não existe ou se a pasta mudou depois dele.
+    """
+    path = catalog_path(results_dir)
+    with _catalog_lock:
+        if not os.path.exists(path) or os.stat(results_dir).st_mtime_ns > os.stat(path).st_mtime_ns:
+            rebuild_catalog(results_dir)
+
+    def load():
+        with open(path, "r") as f:
+            return json.load(f)
+    return _cached(path, "catalog", load)
+
+
+def has_results(result_path: str) -> bool:
+    return any(os.path.exists(f"{result_path}/stats.{ext}") for ext in ("parquet", "csv"))
+
+
+def _load(result_path: str, name: str, columns=None) -> pd.DataFrame:
+    # pastas antigas (e .example) só têm CSV
+    if os.path.exists(f"{result_path}/{name}.parquet"):
+        return pd.read_parquet(f"{result_path}/{name}.parquet", columns=columns)
+    return pd.read_csv(f"{result_path}/{name}.csv", usecols=columns)
+
+
+def _data_path(result_path: str, name: str) -> str:
+    path = f"{result_path}/{name}.parquet"
+    return path if os.path.exists(path) else f"{result_path}/{name}.csv"
+
+
+def load_detections(result_path: str, columns=None) -> pd.DataFrame:
+    return _load(result_path, "detections", columns)
+
+
+def load_stats(result_path: str, columns=None) -> pd.DataFrame:
+    """
+    Estatísticas do resultado (em cache; não modificar o DataFrame devolvido).
+    """
+    return _cached(_data_path(result_path, "stats"), ("stats", tuple(columns or ())),
+                   lambda: _load(result_path, "stats", columns))
+
+
+def _cycle(config: Dict[str, Any]) -> float:
+    return config.get("green_duration", CONFIG_DEFAULTS["green_duration"]) + \
+           config.get("red_duration", CONFIG_DEFAULTS["red_duration"])
+
+
+def save_rollups(result_path: str, stats: pd.DataFrame, config: Dict[str, Any]):
+    """
+    Grava todos os níveis de lib.rollups em um único rollups.parquet (coluna `level`).
+    """
+    levels = rollups_.build_rollups(stats, _cycle(config))
+    pd.concat(
+        [df.assign(level=level) for level, df in levels.items()], ignore_index=True
+    ).to_parquet(f"{result_path}/rollups.parquet", index=False)
+
+
+def load_rollups(result_path: str, config: Dict[str, Any],
+                 stats: Optional[pd.DataFrame] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Níveis de agregação do resultado; pastas sem rollups.parquet os calculam
+    a partir de `stats` (ou de load_stats).
+    """
+    path = f"{result_path}/rollups.parquet"
+    if os.path.exists(path):
+        def load():
+            df = pd.read_parquet(path)
+            return {
+                level: group.drop(columns="level").dropna(axis=1, how="all").reset_index(drop=True)
+                for level, group in df.groupby("level", sort=False)
+            }
+        return _cached(path, "rollups", load)
+    return _cached(_data_path(result_path, "stats"), ("rollups", _cycle(config)), lambda: rollups_.build_rollups(
+        load_stats(result_path) if stats is None else stats, _cycle(config)))
+
+
+def load_zone_stats(result_path: str) -> Optional[pd.DataFrame]:
+    """
+    Estatísticas por zona (coluna zone = índice em config["zones"]), ou None.
+    """
+    path = f"{result_path}/zone_stats.parquet"
+    if not os.path.exists(path):
+        return None
+    return _cached(path, "zone_stats", lambda: pd.read_parquet(path))
+
+
+def load_zone_rollups(result_path: str, config: Dict[str, Any], zone: int) -> Dict[str, pd.DataFrame]:
+    """
+    Níveis de lib.rollups das estatísticas de uma zona (calculados e mantidos em cache).
+    """
+    path = f"{result_path}/zone_stats.parquet"
+    def build():
+        stats = load_zone_stats(result_path)
+        return rollups_.build_rollups(stats[stats["zone"] == zone].reset_index(drop=True), _cycle(config))
+    return _cached(path, ("zone_rollups", zone, _cycle(config)), build)
+
+
+def overlay_info(result_path: str) -> Optional[Dict[str, int]]:
+    """
+    Linhas e frames (último + 1) do overlay.parquet, só pelos metadados, ou
+    None se o vídeo foi anotado.
+    """
+    path = encoding.overlay_path(f"{result_path}/video.mp4")
+    if not os.path.exists(path):
+        return None
+    def load():
+        meta   = pq.ParquetFile(path).metadata
+        column = meta.schema.names.index("frame")
+        stats  = [meta.row_group(i).column(column).statistics for i in range(meta.num_row_groups)]
+        if all(st is not None and st.has_min_max for st in stats):
+            frames = max((int(st.max) + 1 for st in stats), default=0)
+        else:
+            frames = int(pq.read_table(path, columns=["frame"])["frame"].to_numpy().max(initial=-1)) + 1
+        return {"rows": meta.num_rows, "frames": frames}
+    return _cached(path, "overlay_info", load)
+
+
+def load_overlay(result_path: str, frames: Optional[Tuple[int, int]] = None) -> Optional[pd.DataFrame]:
+    """
+    Boxes por frame do modo overlay (em cache), ou None se o vídeo foi
+    anotado. Com `frames` = (início, fim) só esse trecho é lido (filtro nos
+    row groups), para não carregar um vídeo de horas inteiro.
+    """
+    path = encoding.overlay_path(f"{result_path}/video.mp4")
+    if not os.path.exists(path):
+        return None
+    if frames is None:
+        return _cached(path, "overlay", lambda: pd.read_parquet(path))
+    filters = [("frame", ">=", int(frames[0])), ("frame", "<", int(frames[1]))]
+    return _cached(path, ("overlay", *frames), lambda: pq.read_table(path, filters=filters).to_pandas())
+
+
+def load_profile(result_path: str) -> Optional[Dict[str, Any]]:
+    """
+    profile.json da execução (lib.profiling), ou None se ela não foi perfilada.
+    """
+    path = f"{result_path}/profile.json"
+    if not os.path.exists(path):
+        return None
+    def load():
+        with open(path, "r") as f:
+            return json.load(f)
+    return _cached(path, "profile", load)
+
+
+def load_events(result_path: str) -> Optional[List[Dict[str, float]]]:
+    """
+    Trechos (start/end em s do vídeo original) do modo events, ou None.
+    """
+    path = encoding.events_path(f"{result_path}/video.mp4")
+    if not os.path.exists(path):
+        return None
+    def load():
+        with open(path, "r") as f:
+            return json.load(f)
+    return _cached(path, "events", load)
+
+
+def export_csv(result_path: str, name: str) -> str:
+    """
+    Caminho de `<name>.csv`, gerado a partir do Parquet se não existir ou
+    estiver desatualizado.
+    """
+    csv_path, pq_path = f"{result_path}/{name}.csv", f"{result_path}/{name}.parquet"
+    if os.path.exists(pq_path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(csv_path) < os.path.getmtime(pq_path)
+    ):
+        pd.read_parquet(pq_path).to_csv(csv_path, index=False)
+    return csv_path
+
+
+def csv_ready(result_path: str, name: str) -> bool:
+    """
+    Se `<name>.csv` já existe e está atualizado em relação ao Parquet.
+    """
+    csv_path, pq_path = f"{result_path}/{name}.csv", f"{result_path}/{name}.parquet"
+    if not os.path.exists(csv_path):
+        return False
+    return not os.path.exists(pq_path) or os.path.getmtime(csv_path) >= os.path.getmtime(pq_path)
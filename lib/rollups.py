@@ -0,0 +1,126 @@
+"""
+Agregações das estatísticas por frame para os gráficos da página de resultados.
+
+Geradas ao salvar o resultado (rollups.parquet): por segundo, por minuto, por
+ciclo do semáforo e uma versão reduzida (LTTB) das colunas acumuladas. Os
+gráficos escolhem a resolução mais fina que cabe em MAX_POINTS pontos, logo o
+volume enviado ao navegador não depende da duração do vídeo.
+"""
+import math
+import numpy as np
+import pandas as pd # type:ignore
+from typing import Dict, Tuple
+
+MAX_POINTS = 600
+
+TOTAL_COLUMNS   = ['detected_total', 'green_total', 'red_total', 'passed_total']
+INSTANT_COLUMNS = ['detected', 'green', 'red', 'passed']
+ROLLUP_COLUMNS  = ['time', 'end', *INSTANT_COLUMNS, *TOTAL_COLUMNS]
+
+LEVEL_LABELS = {
+    'frame': 'Frame',
+    'second': 'Segundo',
+    'minute': 'Minuto',
+    'cycle': 'Ciclo do Semáforo',
+}
+
+
+def rollup(stats: pd.DataFrame, period: float) -> pd.DataFrame:
+    """
+    Agrega em intervalos [time, end) de `period` segundos: detected é o
+    máximo no intervalo, green/red/passed a soma e os *_total o último valor.
+    Também funciona sobre um rollup mais fino.
+    """
+    if stats.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    bucket = np.floor(stats['time'].to_numpy(np.float64) / period).astype(np.int64)
+    g      = stats.groupby(bucket, sort=True)
+    start  = g.size().index.to_numpy() * period
+    out    = pd.DataFrame({'time': start, 'end': start + period})
+    out['detected'] = g['detected'].max().to_numpy()
+    for col in ('green', 'red', 'passed'):
+        out[col] = g[col].sum().to_numpy()
+    for col in TOTAL_COLUMNS:
+        out[col] = g[col].last().to_numpy()
+    return out
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: índices de `n_out` pontos que preservam
+    a forma da série (x crescente).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n-1, n_out-1).astype(np.int64)
+    idx, a = [0], 0
+    for i in range(n_out-2):
+        lo, hi = edges[i], edges[i+1]
+        if hi <= lo:
+            continue
+        if i+2 < len(edges):
+            nx, ny = x[hi:edges[i+2]].mean(), y[hi:edges[i+2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a]-nx)*(ys-y[a]) - (x[a]-xs)*(ny-y[a]))
+        a = lo + int(area.argmax())
+        idx.append(a)
+    idx.append(n-1)
+    return np.asarray(idx)
+
+
+def downsample_totals(stats: pd.DataFrame, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """
+    Linhas de `stats` escolhidas por LTTB em cada coluna acumulada (união dos índices).
+    """
+    if len(stats) <= max_points:
+        return stats[['time', *TOTAL_COLUMNS]].reset_index(drop=True)
+    x    = stats['time'].to_numpy(np.float64)
+    keep = np.unique(np.concatenate([
+        lttb(x, stats[col].to_numpy(np.float64), max_points // len(TOTAL_COLUMNS))
+        for col in TOTAL_COLUMNS
+    ]))
+    return stats[['time', *TOTAL_COLUMNS]].iloc[keep].reset_index(drop=True)
+
+
+def build_rollups(stats: pd.DataFrame, cycle: float) -> Dict[str, pd.DataFrame]:
+    """
+    Todos os níveis: second, minute, cycle (`cycle` = verde + vermelho, em s) e lttb.
+    Sem ciclo (verde e vermelho zerados) o nível cycle não existe.
+    """
+    second = rollup(stats, 1.0)
+    levels = {'second': second, 'minute': rollup(second, 60.0)}
+    if cycle > 0:
+        levels['cycle'] = rollup(second, float(cycle))
+    levels['lttb'] = downsample_totals(stats)
+    return levels
+
+
+def for_bars(stats: pd.DataFrame, rollups: Dict[str, pd.DataFrame],
+             max_points: int = MAX_POINTS) -> Tuple[pd.DataFrame, str]:
+    """
+    Resolução mais fina com até `max_points` barras e seu rótulo; se nem o
+    nível mais grosso cabe, agrega os segundos em intervalos uniformes.
+    """
+    if len(stats) <= max_points:
+        return stats, LEVEL_LABELS['frame']
+    levels = sorted((lvl for lvl in ('second', 'cycle', 'minute') if lvl in rollups),
+                    key=lambda lvl: len(rollups[lvl]), reverse=True)
+    for lvl in levels:
+        if len(rollups[lvl]) <= max_points:
+            return rollups[lvl], LEVEL_LABELS[lvl]
+    second = rollups['second']
+    period = math.ceil((second['end'].iloc[-1] - second['time'].iloc[0]) / max_points)
+    return rollup(second, period), f"{period} Segundos"
+
+
+def for_area(stats: pd.DataFrame, rollups: Dict[str, pd.DataFrame],
+             max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """
+    Série acumulada para os gráficos de área: a própria `stats` se couber, senão a versão LTTB.
+    """
+    if len(stats) <= max_points or 'lttb' not in rollups:
+        return downsample_totals(stats, max_points)
+    return rollups['lttb']
@@ -0,0 +1,149 @@
+"""
+Saída de CarCounter.process em memória limitada.
+
+As detecções de cada frame são copiadas para buffers NumPy pré-alocados, já
+nos tipos compactos de lib.results, e gravadas em disco (um row group Parquet)
+sempre que o buffer enche; as estatísticas são acumuladas frame a frame, sem
+reconstruir um DataFrame com todas as detecções.
+"""
+import functools
+import numpy as np
+import pandas as pd # type:ignore
+import pyarrow as pa # type:ignore
+import pyarrow.parquet as pq # type:ignore
+from typing import Any, Dict, Iterator, List, Optional
+from lib.results import DETECTION_DTYPES, STATS_DTYPES
+
+STATS_COLUMNS = list(STATS_DTYPES)
+
+
+class DetectionSink:
+    """
+    Buffers tipados de `chunk_rows` linhas por coluna. Com `path` cada buffer
+    cheio vira um row group de um único arquivo Parquet; sem `path` os blocos
+    (compactos) ficam em memória. `dtypes`: colunas e tipos (padrão DETECTION_DTYPES).
+    """
+    def __init__(self, path: Optional[str] = None, chunk_rows: int = 65_536,
+                 dtypes: Dict[str, Any] = DETECTION_DTYPES):
+        self.path       = path
+        self.chunk_rows = chunk_rows
+        self.dtypes     = dtypes
+        self.rows       = 0
+        self._n         = 0
+        self._buffers   = {col: np.empty(chunk_rows, dtype=dt) for col, dt in dtypes.items()}
+        self._blocks: List[Dict[str,np.ndarray]] = []
+        self._schema    = pa.schema([(col, pa.from_numpy_dtype(dt)) for col, dt in dtypes.items()])
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def append(self, dets: Dict[str,np.ndarray]):
+        n, start = len(dets['id']), 0
+        while start < n:
+            take = min(n - start, self.chunk_rows - self._n)
+            for col, buf in self._buffers.items():
+                buf[self._n:self._n+take] = dets[col][start:start+take]
+            self._n   += take
+            self.rows += take
+            start     += take
+            if self._n == self.chunk_rows:
+                self.flush()
+
+    def flush(self):
+        if not self._n:
+            return
+        block = {col: buf[:self._n] for col, buf in self._buffers.items()}
+        if self.path is None:
+            self._blocks.append({col: arr.copy() for col, arr in block.items()})
+        else:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(pa.table(block, schema=self._schema))
+        self._n = 0
+
+    def close(self):
+        self.flush()
+        if self.path is not None:
+            if self._writer is None:
+                # nenhuma detecção: arquivo vazio, mas com o esquema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.close()
+            self._writer = None
+
+    def to_frame(self) -> pd.DataFrame:
+        if self.path is not None:
+            return pd.read_parquet(self.path)
+        return pd.DataFrame({
+            col: np.concatenate([b[col] for b in self._blocks]) if self._blocks else np.empty(0, dt)
+            for col, dt in self.dtypes.items()
+        })
+
+
+class StatsAccumulator:
+    """
+    Estatísticas incrementais com exatamente as linhas de
+    compute_stats_from_detections: uma por frame com detecções.
+    """
+    def __init__(self, capacity: int = 1024):
+        self._times = np.empty(capacity, dtype=np.float64)
+        # colunas: detected, detected_total, green, red
+        self._rows  = np.empty((capacity, 4), dtype=np.int64)
+        self._n     = 0
+
+    def update(self, ts: float, detected: int, detected_total: int, inc_g: int, inc_r: int):
+        if not detected:
+            return
+        if self._n == len(self._times):
+            self._times = np.concatenate([self._times, np.empty_like(self._times)])
+            self._rows  = np.concatenate([self._rows, np.empty_like(self._rows)])
+        self._times[self._n] = ts
+        self._rows[self._n]  = (detected, detected_total, inc_g, inc_r)
+        self._n += 1
+
+    def to_frame(self) -> pd.DataFrame:
+        rows  = self._rows[:self._n]
+        green = rows[:,2]
+        red   = rows[:,3]
+        cum_g = np.cumsum(green)
+        cum_r = np.cumsum(red)
+        return pd.DataFrame({
+            'time': self._times[:self._n].copy(),
+            'detected': rows[:,0],
+            'detected_total': rows[:,1],
+            'green': green,
+            'green_total': cum_g,
+            'red': red,
+            'red_total': cum_r,
+            'passed': green+red,
+            'passed_total': cum_g+cum_r
+        }, columns=STATS_COLUMNS)
+
+
+class ProcessResult:
+    """
+    Retorno de CarCounter.process. As estatísticas já estão prontas; as
+    detecções só são carregadas (do Parquet, se houver) ao acessar
+    `detections`. Desempacotar `df, stats, output = ...` continua funcionando.
+    """
+    def __init__(self, sink: DetectionSink, stats: pd.DataFrame, output: Optional[str],
+                 info: Optional[Dict[str, float]] = None, zone_sink: Optional[DetectionSink] = None,
+                 zone_stats: Optional[pd.DataFrame] = None):
+        self.sink       = sink
+        self.stats      = stats
+        self.output     = output
+        self.info       = info or {}
+        self.zone_sink  = zone_sink
+        self.zone_stats = zone_stats
+
+    @property
+    def detections_path(self) -> Optional[str]:
+        return self.sink.path
+
+    @functools.cached_property
+    def detections(self) -> pd.DataFrame:
+        return self.sink.to_frame()
+
+    @functools.cached_property
+    def zone_detections(self) -> Optional[pd.DataFrame]:
+        return self.zone_sink.to_frame() if self.zone_sink is not None else None
+
+    def __iter__(self) -> Iterator:
+        return iter((self.detections, self.stats, self.output))
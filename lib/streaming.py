@@ -0,0 +1,275 @@
+import collections
+import glob
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+import pandas as pd # type:ignore
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from lib.results import DETECTION_DTYPES, compact
+
+Source = Union[str, int]
+
+# ids não vistos há mais que isso (s) saem do TrackState de uma fonte contínua
+ID_HORIZON = 60.0
+
+
+def is_live(source: Source) -> bool:
+    """
+    Índice de dispositivo ou URL (rtsp://, http://...) são fontes ao vivo.
+    """
+    return isinstance(source, int) or str(source).isdigit() or '://' in str(source)
+
+
+class FrameGrabber:
+    """
+    Lê frames de qualquer fonte do OpenCV em uma thread própria, mantendo
+    apenas o frame mais recente: se a inferência não acompanha, os frames
+    intermediários são descartados (e contados em `dropped`) em vez de
+    acumular memória.
+
+    Fontes ao vivo usam o relógio como tempo do frame; arquivos usam idx / fps
+    e, com realtime=True, são reproduzidos na velocidade original (simulando
+    uma câmera).
+    """
+    def __init__(self, source: Source, realtime: bool = False, reconnect: int = 5,
+                 notify: Optional[threading.Event] = None):
+        self.source    = int(source) if str(source).isdigit() else source
+        self.live      = is_live(source)
+        self.realtime  = realtime or self.live
+        self.reconnect = reconnect
+        self.dropped   = 0
+        self.frames    = 0
+        self.error: Optional[BaseException] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=1)
+        self._stop  = threading.Event()
+        # sinalizado a cada frame (ou fim) entregue: permite esperar várias fontes
+        self._notify = notify
+        self.finished = False
+
+        self.cap = self._open()
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                     int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _open(self) -> cv2.VideoCapture:
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise IOError(f"Cannot open video: {self.source}")
+        return cap
+
+    def _push(self, item):
+        self._put(item)
+        if self._notify is not None:
+            self._notify.set()
+
+    def _put(self, item):
+        if self.realtime:
+            # só o mais recente: descarta o pendente, se houver
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait(item)
+        else:
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+    def _run(self):
+        t0, idx, failures = time.monotonic(), 0, 0
+        try:
+            while not self._stop.is_set():
+                ok, frame = self.cap.read()
+                if not ok:
+                    if self.live and failures < self.reconnect:
+                        failures += 1
+                        time.sleep(min(2.0**failures, 30.0))
+                        self.cap.release()
+                        self.cap = self._open()
+                        continue
+                    break
+                failures = 0
+                now = time.monotonic() - t0
+                ts  = now if self.live else idx / self.fps
+                if self.realtime and not self.live and ts > now:
+                    time.sleep(ts - now)
+                self.frames += 1
+                self._push((idx, ts, time.monotonic(), frame))
+                idx += 1
+        except BaseException as exc:
+            self.error = exc
+        finally:
+            self._push(None)
+
+    def start(self) -> "FrameGrabber":
+        if self._thread.ident is None:
+            self._thread.start()
+        return self
+
+    def __iter__(self) -> Iterator[Tuple[int, float, float, np.ndarray]]:
+        """
+        Gera (idx, ts, instante da captura em time.monotonic(), frame).
+        """
+        self.start()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            yield item
+        self.finished = True
+        if self.error is not None:
+            raise self.error
+
+    def poll(self) -> Optional[Tuple[int, float, float, np.ndarray]]:
+        """
+        Frame pendente sem bloquear, ou None (sem frame novo ou fonte encerrada,
+        ver `finished`). A thread deve ter sido iniciada com start().
+        """
+        if self.finished:
+            return None
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if item is None:
+            self.finished = True
+            if self.error is not None:
+                raise self.error
+        return item
+
+    def close(self):
+        self._stop.set()
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self.cap.release()
+
+
+class StatsRoller:
+    """
+    Estatísticas incrementais por segundo, com as colunas de
+    compute_stats_from_detections. Em cada linha (time = início do segundo):
+    detected é o nº de ids distintos vistos no segundo; green/red/passed são
+    as passagens no segundo; os *_total são acumulados desde o início.
+    """
+    def __init__(self):
+        self.second: Optional[int] = None
+        self.ids: set = set()
+        self.green = self.red = 0
+        self.green_total = self.red_total = 0
+        self.detected_total = 0
+
+    def _row(self) -> Dict[str, float]:
+        return {
+            'time': float(self.second), # type:ignore
+            'detected': len(self.ids),
+            'detected_total': self.detected_total,
+            'green': self.green,
+            'green_total': self.green_total,
+            'red': self.red,
+            'red_total': self.red_total,
+            'passed': self.green + self.red,
+            'passed_total': self.green_total + self.red_total
+        }
+
+    def update(self, ts: float, ids: np.ndarray, inc_g: int, inc_r: int,
+               detected_total: int) -> List[Dict[str, float]]:
+        """
+        Acumula um frame; retorna as linhas dos segundos encerrados por ele.
+        """
+        rows = []
+        sec  = int(ts)
+        if self.second is not None and sec != self.second:
+            rows.append(self._row())
+            self.ids, self.green, self.red = set(), 0, 0
+        self.second = sec
+        self.ids.update(ids.tolist())
+        self.green += inc_g
+        self.red   += inc_r
+        self.green_total += inc_g
+        self.red_total   += inc_r
+        self.detected_total = detected_total
+        return rows
+
+    def flush(self) -> List[Dict[str, float]]:
+        return [self._row()] if self.second is not None else []
+
+
+class IdHorizon:
+    """
+    Menor id visto nos últimos `seconds` s, por segundo inteiro de `ts`. Em
+    fontes contínuas os ids do tracker só crescem: os abaixo desse limite não
+    voltam mais e podem sair do TrackState (TrackState.trim), que assim fica
+    do tamanho dos ids recentes e não do maior id desde o início.
+    """
+    def __init__(self, seconds: float = ID_HORIZON):
+        self.seconds = seconds
+        self._mins: collections.deque = collections.deque()
+
+    def update(self, ts: float, ids: np.ndarray) -> Optional[int]:
+        """
+        Registra os ids de um frame; retorna o limite atual (None sem ids).
+        """
+        sec = int(ts)
+        if len(ids):
+            low = int(ids.min())
+            if self._mins and self._mins[-1][0] == sec:
+                self._mins[-1][1] = min(self._mins[-1][1], low)
+            else:
+                self._mins.append([sec, low])
+        while self._mins and self._mins[0][0] < sec - self.seconds:
+            self._mins.popleft()
+        return min(m for _, m in self._mins) if self._mins else None
+
+
+class RotatingDetectionWriter:
+    """
+    Grava detecções em arquivos `detections_00001.parquet`, `..._00002.parquet`, ...
+    com até `chunk_rows` linhas cada; com `max_chunks` mantém só os mais
+    recentes. Em memória fica no máximo um bloco.
+    """
+    def __init__(self, out_dir: str, chunk_rows: int = 100_000, max_chunks: Optional[int] = None):
+        self.out_dir    = out_dir
+        self.chunk_rows = chunk_rows
+        self.max_chunks = max_chunks
+        self.chunk      = 0
+        self._blocks: List[Dict[str, np.ndarray]] = []
+        self._rows      = 0
+        os.makedirs(out_dir, exist_ok=True)
+
+    def append(self, dets: Dict[str, np.ndarray]):
+        n = len(dets['id'])
+        if not n:
+            return
+        self._blocks.append(dets)
+        self._rows += n
+        if self._rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._blocks:
+            return
+        self.chunk += 1
+        df = pd.DataFrame({col: np.concatenate([b[col] for b in self._blocks])
+                           for col in self._blocks[0]})
+        compact(df, DETECTION_DTYPES).to_parquet(f"{self.out_dir}/detections_{self.chunk:05d}.parquet", index=False)
+        self._blocks, self._rows = [], 0
+
+        if self.max_chunks is not None:
+            files = sorted(glob.glob(f"{self.out_dir}/detections_*.parquet"))
+            for old in files[:-self.max_chunks]:
+                os.remove(old)
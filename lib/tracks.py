@@ -0,0 +1,637 @@
+"""
+Cache dos tracks brutos de CarCounter.process (todas as classes, xyxy,
+confiança, por frame rastreado), na frente do modelo: um vídeo já processado
+com os mesmos pesos e parâmetros não passa de novo pelo YOLO, e a contagem
+pode ser refeita com outra linha ou semáforo (lib.recount).
+
+Cada entrada fica em `.tracks/<video>-<parâmetros>.parquet`, onde <video> é
+o SHA-256 do conteúdo do vídeo (o mesmo nome dado pelo upload, ver
+lib.utils.store_upload) e <parâmetros> um hash do conteúdo dos pesos e de
+tudo que muda os tracks: conf, iou, tracker, recorte (ROI) e amostragem de
+frames. Um `.json` ao lado guarda esses parâmetros e as dimensões/fps do vídeo.
+
+Durante o processamento os tracks vão para partes `.partial` próprias da
+execução (`TrackWriter`), unidas na entrada ao final. A cada checkpoint a
+parte atual é fechada (fica legível no disco mesmo se o processo morrer
+depois) e o estado do tracker naquele frame é gravado ao lado (`.state`).
+A próxima execução com a mesma chave reproduz sem inferência os frames até o
+checkpoint, restaura o tracker e continua dali, com o mesmo resultado de uma
+execução sem interrupção; sem estado (parcial de uma exceção antes do
+primeiro checkpoint, tracker não serializável), continua do último frame
+gravado com um tracker novo (ver `Replay`).
+
+A fila de processamentos (lib.jobs) guarda também o vídeo enviado, como
+`.tracks/<video>.mp4`, para que o vídeo anotado possa ser regerado. A saída
+renderizada de cada execução fica ao lado da entrada (`render_path`): um
+acerto com a mesma linha, semáforo, zonas e modo de saída só copia o vídeo,
+sem decodificar nem codificar.
+
+O diretório é limitado a TRAFFIC_CACHE_MAX_GB (padrão 10): ao gravar, as
+entradas usadas há mais tempo são removidas (`evict`). Acertos, faltas,
+retomadas, frames reproduzidos/inferidos e remoções são somados em
+`metrics.json` (`record`, `load_metrics`). Em workers de um pool (lib.batch)
+`defer` desliga as remoções (`evict` e a limpeza de parciais de outras
+execuções, que podem ser de outro worker) e acumula as métricas em memória;
+o processo pai as grava (`take_deferred`) e chama `evict` uma vez ao final.
+
+Frames rastreados sem nenhuma box ganham uma linha com id=-1 (cls=-1), para
+que os frames rastreados possam ser distinguidos dos pulados (stride).
+"""
+import glob
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+import numpy as np
+import pandas as pd # type:ignore
+import pyarrow.parquet as pq # type:ignore
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from lib.results import TRACK_DTYPES
+from lib.sink import DetectionSink
+from lib.utils import UPLOAD_CHUNK
+
+TRACKS_DIR = ".tracks"
+
+# limite do diretório do cache (entradas + vídeos guardados)
+MAX_BYTES = int(float(os.environ.get("TRAFFIC_CACHE_MAX_GB", "10")) * 1e9)
+
+# ao retomar sem estado do tracker, o novo é aquecido nos últimos RESUME_OVERLAP_S s já rastreados
+RESUME_OVERLAP_S = 2.0
+
+# intervalo (s de processamento) entre checkpoints
+CHECKPOINT_S = float(os.environ.get("TRAFFIC_CHECKPOINT_S", "60"))
+
+# SHA-256 já calculados, por (caminho, mtime, tamanho)
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+
+# métricas acumuladas em memória após `defer` (None: gravadas direto em metrics.json)
+_deferred: Optional[Dict[str, int]] = None
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 do conteúdo de `path` (memorizado enquanto o arquivo não muda).
+    Diretórios (ex.: modelos OpenVINO) usam o hash de cada arquivo, em ordem;
+    um caminho inexistente (pesos ainda não baixados) usa o próprio nome.
+    """
+    if not os.path.exists(path):
+        return hashlib.sha256(path.encode()).hexdigest()
+    if os.path.isdir(path):
+        names = sorted(glob.glob(f"{path}/**/*", recursive=True))
+        return hashlib.sha256("".join(
+            file_digest(name) for name in names if os.path.isfile(name)).encode()).hexdigest()
+
+    st  = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        if key in _digests:
+            return _digests[key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK):
+            digest.update(chunk)
+    with _digests_lock:
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def cache_path(tracks_dir: str, digest: str, params: Dict[str, Any]) -> str:
+    """
+    Caminho da entrada do vídeo `digest` rastreado com `params` (JSON serializável).
+    """
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"{tracks_dir}/{digest}-{key[:16]}.parquet"
+
+
+def _partials(path: str) -> List[str]:
+    return glob.glob(glob.escape(path) + ".*.partial") + glob.glob(glob.escape(path) + ".*.state")
+
+
+def _runs(path: str) -> Dict[str, List[str]]:
+    # partes de cada execução interrompida (<path>.<execução>.<n>.partial), em ordem
+    runs: Dict[str, List[str]] = {}
+    for part in sorted(glob.glob(glob.escape(path) + ".*.*.partial")):
+        runs.setdefault(part[len(path)+1:].split(".", 1)[0], []).append(part)
+    for state in glob.glob(glob.escape(path) + ".*.state"):
+        runs.setdefault(state[len(path)+1:].split(".", 1)[0], [])
+    return runs
+
+
+def _read_parts(parts: List[str]) -> pd.DataFrame:
+    frames = []
+    for part in parts:
+        try:
+            frames.append(pd.read_parquet(part))
+        except Exception:
+            # processo morto com a parte aberta: sem rodapé Parquet
+            break
+    if not frames:
+        return pd.DataFrame({col: np.empty(0, dt) for col, dt in TRACK_DTYPES.items()})
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_state(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def empty_frame(idx: int) -> Dict[str, np.ndarray]:
+    """
+    Linha que marca o frame `idx` como rastreado, sem boxes.
+    """
+    block = {col: np.zeros(1, dtype=dt) for col, dt in TRACK_DTYPES.items()}
+    block['frame'][0] = idx
+    block['id'][0] = block['cls'][0] = -1
+    return block
+
+
+class TrackWriter:
+    """
+    Tracks de uma execução para a entrada `path`, em partes
+    `<path>.<execução>.<n>.partial` (DetectionSink). `checkpoint` fecha a
+    parte atual e grava `<path>.<execução>.state`: o frame do checkpoint, as
+    partes que o cobrem e o estado serializado do tracker após esse frame.
+
+    A execução reproduz (e regrava) os frames das anteriores, logo no seu
+    primeiro checkpoint além delas os parciais anteriores são descartados.
+    """
+    def __init__(self, path: str, every: float = CHECKPOINT_S, supersedes: int = 0):
+        self.path        = path
+        self.run         = uuid.uuid4().hex[:8]
+        self.every       = every
+        self.supersedes  = supersedes
+        self.rows        = 0
+        self.checkpoints = 0
+        self.seconds     = 0.0
+        self.parts: List[str] = []
+        self._sink: Optional[DetectionSink] = None
+        self._last       = time.perf_counter()
+
+    def append(self, raw: Dict[str, np.ndarray]):
+        if self._sink is None:
+            self.parts.append(f"{self.path}.{self.run}.{len(self.parts):05d}.partial")
+            self._sink = DetectionSink(self.parts[-1], dtypes=TRACK_DTYPES)
+        self._sink.append(raw)
+        self.rows += len(raw['id'])
+
+    def _close_part(self):
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def due(self) -> bool:
+        """
+        Se já é hora de um checkpoint (verdadeiro no máximo uma vez a cada
+        `every` s; chamado por quem serializa o tracker).
+        """
+        now = time.perf_counter()
+        if now - self._last < self.every:
+            return False
+        self._last = now
+        return True
+
+    def checkpoint(self, frame: int, tracker: Optional[bytes]):
+        """
+        Torna durável tudo até `frame` (inclusive), com o estado do tracker
+        após esse frame (None: não serializável, a retomada será aproximada).
+        """
+        t0 = time.perf_counter()
+        self._close_part()
+        state = f"{self.path}.{self.run}.state"
+        with open(state + ".tmp", "wb") as f:
+            pickle.dump({'frame': frame, 'parts': len(self.parts), 'tracker': tracker}, f)
+        os.replace(state + ".tmp", state)
+        # em workers de pool (`defer`) outra execução da mesma chave pode estar em andamento
+        if frame + 1 >= self.supersedes and _deferred is None:
+            for old in _partials(self.path):
+                if not os.path.basename(old).startswith(os.path.basename(f"{self.path}.{self.run}.")):
+                    _remove(old)
+        self.checkpoints += 1
+        self.seconds     += time.perf_counter() - t0
+
+    def close(self):
+        """
+        Fecha a parte atual; uma execução sem nenhuma linha não deixa parciais.
+        """
+        self._close_part()
+        if not self.rows:
+            for part in self.parts:
+                _remove(part)
+            self.parts = []
+
+
+def commit(path: str, writer: TrackWriter, meta: Dict[str, Any]):
+    """
+    Publica a entrada gravada nas partes de `writer` (já fechado), com seus
+    metadados, e descarta os parciais de execuções interrompidas da mesma chave
+    (após `defer`, só os desta execução).
+    """
+    tmp = f"{meta_path(path)}.{writer.run}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=4)
+    os.replace(tmp, meta_path(path))
+    if len(writer.parts) == 1:
+        os.replace(writer.parts[0], path)
+    else:
+        merged = DetectionSink(f"{path}.{writer.run}.tmp", dtypes=TRACK_DTYPES)
+        for part in writer.parts:
+            for batch in pq.ParquetFile(part).iter_batches():
+                merged.append({col: batch.column(col).to_numpy() for col in TRACK_DTYPES})
+        merged.close()
+        os.replace(merged.path, path)
+    own = [*writer.parts, f"{path}.{writer.run}.state"]
+    for old in _partials(path) if _deferred is None else own:
+        _remove(old)
+    evict(os.path.dirname(path), keep=(_group(path),))
+
+
+def render_path(path: str, params: Dict[str, Any]) -> str:
+    """
+    Onde fica a cópia da saída renderizada com os tracks da entrada `path` e
+    `params` (modo, linha, semáforo, zonas...): `<entrada>.<hash>.mp4`, no
+    mesmo grupo do LRU que a entrada (removida junto com ela).
+    """
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"{os.path.splitext(path)[0]}.{key[:16]}.mp4"
+
+
+def _render_manifest(render: str) -> str:
+    return os.path.splitext(render)[0] + ".render.json"
+
+
+def store_render(render: str, files: Sequence[str]):
+    """
+    Copia para o cache a saída em `files` (o vídeo e seus auxiliares, ver
+    encoding.output_files); a lista do que foi copiado é gravada por último,
+    logo uma cópia interrompida não é usada.
+    """
+    stem, suffixes = os.path.splitext(files[0])[0], []
+    for name in files:
+        if os.path.exists(name):
+            suffix = name[len(stem):]
+            tmp    = f"{os.path.splitext(render)[0]}{suffix}.{os.getpid()}.tmp"
+            shutil.copyfile(name, tmp)
+            os.replace(tmp, os.path.splitext(render)[0] + suffix)
+            suffixes.append(suffix)
+    tmp = f"{_render_manifest(render)}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(suffixes, f)
+    os.replace(tmp, _render_manifest(render))
+    evict(os.path.dirname(render), keep=(_group(render),))
+
+
+def load_render(render: Optional[str], output: str) -> bool:
+    """
+    Copia a saída guardada por `store_render` para `output` (e seus
+    auxiliares ao lado); False se não há cópia completa no cache.
+    """
+    if render is None or not os.path.exists(_render_manifest(render)):
+        return False
+    with open(_render_manifest(render), "r") as f:
+        suffixes = json.load(f)
+    cached = [os.path.splitext(render)[0] + suffix for suffix in suffixes]
+    if not all(os.path.exists(name) for name in cached):
+        return False
+    for name, suffix in zip(cached, suffixes):
+        shutil.copyfile(name, os.path.splitext(output)[0] + suffix)
+    os.utime(_render_manifest(render))
+    return True
+
+
+def exists(path: Optional[str]) -> bool:
+    return bool(path) and os.path.exists(path) and os.path.exists(meta_path(path))
+
+
+def load_tracks(path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Tracks (colunas de TRACK_DTYPES, incluindo as linhas de frames vazios) e
+    metadados; marca a entrada como usada agora (LRU).
+    """
+    with open(meta_path(path), "r") as f:
+        meta = json.load(f)
+    os.utime(meta_path(path))
+    return pd.read_parquet(path), meta
+
+
+def source_path(meta: Dict[str, Any], tracks_dir: str = TRACKS_DIR) -> str:
+    """
+    Onde `keep_source` guarda o vídeo da entrada com metadados `meta`.
+    """
+    return f"{tracks_dir}/{meta['video']}.mp4"
+
+
+def keep_source(video_path: str, tracks_dir: str = TRACKS_DIR):
+    """
+    Move `video_path` para o cache, nomeado pelo hash do conteúdo (cópias
+    do mesmo vídeo ocupam um único arquivo).
+    """
+    os.makedirs(tracks_dir, exist_ok=True)
+    target = source_path({'video': file_digest(video_path)}, tracks_dir)
+    if os.path.exists(target):
+        os.remove(video_path)
+        os.utime(target)
+    else:
+        os.replace(video_path, target)
+    evict(tracks_dir, keep=(_group(target),))
+
+
+def _box_iou(a: pd.DataFrame, b: pd.DataFrame) -> np.ndarray:
+    ix = np.clip(np.minimum(a['x2'].to_numpy(), b['x2'].to_numpy()) -
+                 np.maximum(a['x1'].to_numpy(), b['x1'].to_numpy()), 0, None)
+    iy = np.clip(np.minimum(a['y2'].to_numpy(), b['y2'].to_numpy()) -
+                 np.maximum(a['y1'].to_numpy(), b['y1'].to_numpy()), 0, None)
+    inter  = ix * iy
+    area_a = (a['x2'] - a['x1']).to_numpy() * (a['y2'] - a['y1']).to_numpy()
+    area_b = (b['x2'] - b['x1']).to_numpy() * (b['y2'] - b['y1']).to_numpy()
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def match_overlap(prev: pd.DataFrame, cur: pd.DataFrame, min_iou: float = 0.5) -> Dict[int,int]:
+    """
+    Associa ids de `cur` a ids de `prev` usando os frames que ambos cobrem:
+    pares com IoU >= min_iou no mesmo frame votam, e a associação (1 para 1)
+    é feita gulosamente pelos pares com mais frames em comum.
+    """
+    if prev.empty or cur.empty:
+        return {}
+    pairs = prev.merge(cur, on='frame', suffixes=('_p', '_c'))
+    if pairs.empty:
+        return {}
+    iou = _box_iou(
+        pairs[['x1_p','y1_p','x2_p','y2_p']].set_axis(['x1','y1','x2','y2'], axis=1),
+        pairs[['x1_c','y1_c','x2_c','y2_c']].set_axis(['x1','y1','x2','y2'], axis=1),
+    )
+    votes = (
+        pairs[iou >= min_iou]
+          .groupby(['id_c','id_p']).size()
+          .sort_values(ascending=False, kind='stable')
+    )
+    mapping: Dict[int,int] = {}
+    used = set()
+    for (id_c, id_p), _ in votes.items():
+        if id_c not in mapping and id_p not in used:
+            mapping[int(id_c)] = int(id_p)
+            used.add(id_p)
+    return mapping
+
+
+class _Array:
+    """
+    Array com a interface de tensor usada na extração (`.cpu().numpy()`).
+    """
+    def __init__(self, a: np.ndarray):
+        self.a = a
+
+    def cpu(self) -> "_Array":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.a
+
+
+class CachedResult:
+    """
+    Resultado de model.track reconstituído de linhas de tracks (boxes em px
+    do frame inteiro), com as boxes relativas a `offset` (canto da ROI), como
+    as devolvidas pelo modelo.
+    """
+    orig_img = None
+
+    def __init__(self, rows: Dict[str, np.ndarray], offset: Tuple[int,int] = (0,0)):
+        xyxy = np.stack([rows['x1'], rows['y1'], rows['x2'], rows['y2']], axis=1).astype(np.float32)
+        if offset != (0,0):
+            xyxy -= np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.float32)
+        self.boxes = SimpleNamespace(xyxy=_Array(xyxy), id=_Array(rows['id']),
+                                     cls=_Array(rows['cls']), conf=_Array(rows['conf']))
+
+
+class Replay:
+    """
+    Tracks de uma entrada (complete=True) ou de um parcial interrompido,
+    reproduzidos como resultados de model.track para os frames < `until`.
+
+    Num parcial com o estado do tracker (`tracker`, do checkpoint em
+    until-1), o tracker restaurado continua de `until` com os mesmos ids.
+    Sem ele (ou se a restauração falhar, ver `forget_tracker`), um tracker
+    novo é aquecido nos frames [warm, until) (que continuam vindo do cache)
+    e, a partir de `until`, os ids ao vivo são associados aos do cache por
+    IoU nesses frames (match_overlap, como na união de blocos de
+    lib.chunked); ids sem par ganham ids novos.
+    """
+    def __init__(self, tracks: pd.DataFrame, until: int, complete: bool,
+                 overlap: int = 0, min_iou: float = 0.5, tracker: Optional[bytes] = None):
+        tracks = tracks.sort_values('frame', kind='stable')
+        self.complete = complete
+        self.until    = until
+        self.tracker  = tracker
+        self.overlap  = overlap
+        self.warm     = until if complete or tracker is not None else max(0, until - overlap)
+        self.min_iou  = min_iou
+        self._cols    = {col: tracks[col].to_numpy() for col in TRACK_DTYPES}
+        frames        = self._cols['frame']
+        self._tracked, self._lo = np.unique(frames, return_index=True)
+        self._hi      = np.r_[self._lo[1:], len(frames)].astype(np.int64)
+        self._live: List[Dict[str, np.ndarray]] = []
+        self._mapping: Optional[Dict[int,int]] = None
+        self._next_id = int(self._cols['id'].max()) + 1 if len(frames) else 1
+
+    def forget_tracker(self):
+        """
+        Retoma sem o estado do tracker: aquecimento + associação por IoU.
+        """
+        self.tracker = None
+        self.warm    = max(0, self.until - self.overlap)
+
+    def _find(self, idx: int) -> int:
+        k = int(np.searchsorted(self._tracked, idx))
+        return k if k < len(self._tracked) and self._tracked[k] == idx else -1
+
+    def tracked(self, idx: int) -> bool:
+        """
+        Se o frame `idx` (< until) foi rastreado na execução original.
+        """
+        return self._find(idx) >= 0
+
+    def result(self, idx: int, offset: Tuple[int,int] = (0,0)) -> CachedResult:
+        k    = self._find(idx)
+        part = slice(self._lo[k], self._hi[k])
+        rows = {col: arr[part] for col, arr in self._cols.items()}
+        keep = rows['id'] >= 0
+        return CachedResult({col: arr[keep] for col, arr in rows.items()}, offset)
+
+    def warm_up(self, idx: int, raw: Dict[str, np.ndarray]):
+        """
+        Tracks ao vivo (px do frame inteiro) do frame de aquecimento `idx`.
+        """
+        if len(raw['id']):
+            self._live.append({**raw, 'frame': np.full(len(raw['id']), idx)})
+
+    def remap(self, raw: Dict[str, np.ndarray], offset: Tuple[int,int] = (0,0)) -> CachedResult:
+        """
+        Tracks ao vivo de um frame >= until com os ids da execução anterior.
+        """
+        if self._mapping is None:
+            cached = pd.DataFrame(self._cols)
+            cached = cached[(cached['frame'] >= self.warm) & (cached['id'] >= 0)]
+            live   = pd.DataFrame({
+                col: np.concatenate([b[col] for b in self._live]) if self._live else np.empty(0, dt)
+                for col, dt in TRACK_DTYPES.items()
+            })
+            self._mapping = match_overlap(cached, live, self.min_iou)
+        ids = []
+        for tid in raw['id'].tolist():
+            if tid not in self._mapping:
+                self._mapping[tid] = self._next_id
+                self._next_id += 1
+            ids.append(self._mapping[tid])
+        return CachedResult({**raw, 'id': np.array(ids, dtype=raw['id'].dtype)}, offset)
+
+
+def lookup(path: str, overlap: int = 0) -> Optional[Replay]:
+    """
+    Replay da entrada `path` (acerto), da execução interrompida que permite
+    a melhor retomada (com estado do tracker, depois a mais adiantada;
+    sem estado, aquecendo `overlap` frames) ou None (falta).
+    """
+    tracks_dir = os.path.dirname(path)
+    if exists(path):
+        tracks, meta = load_tracks(path)
+        record(tracks_dir, hits=1)
+        return Replay(tracks, meta['frames'], complete=True)
+
+    best: Optional[Tuple[bool, int, pd.DataFrame, Optional[bytes]]] = None
+    for run, parts in _runs(path).items():
+        state = _read_state(f"{path}.{run}.state")
+        if state is not None:
+            # o que veio depois do checkpoint é refeito a partir do estado salvo
+            tracks  = _read_parts(parts[:state['parts']])
+            tracks  = tracks[tracks['frame'] <= state['frame']]
+            tracker = state['tracker']
+            until   = state['frame'] + 1
+        else:
+            tracks  = _read_parts(parts)
+            tracker = None
+            until   = int(tracks['frame'].max()) + 1 if len(tracks) else 0
+        if until and (best is None or (tracker is not None, until) > best[:2]):
+            best = (tracker is not None, until, tracks, tracker)
+    if best is not None:
+        record(tracks_dir, resumes=1)
+        _, until, tracks, tracker = best
+        return Replay(tracks, until, complete=False, overlap=overlap, tracker=tracker)
+    record(tracks_dir, misses=1)
+    return None
+
+
+def _group(path: str) -> str:
+    # entrada (.parquet, .json, parciais) ou vídeo guardado: nome até o primeiro ponto
+    return os.path.basename(path).split(".", 1)[0]
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def usage(tracks_dir: str = TRACKS_DIR) -> Dict[str, Tuple[int, float]]:
+    """
+    Bytes e último uso (mtime mais recente) de cada entrada/vídeo do cache.
+    """
+    groups: Dict[str, Tuple[int, float]] = {}
+    for entry in os.scandir(tracks_dir) if os.path.isdir(tracks_dir) else ():
+        if not entry.is_file() or entry.name == "metrics.json" or entry.name.startswith("."):
+            continue
+        st = entry.stat()
+        size, used = groups.get(_group(entry.name), (0, 0.0))
+        groups[_group(entry.name)] = (size + st.st_size, max(used, st.st_mtime))
+    return groups
+
+
+def evict(tracks_dir: str = TRACKS_DIR, max_bytes: int = MAX_BYTES, keep=()) -> int:
+    """
+    Remove as entradas usadas há mais tempo até o cache caber em `max_bytes`
+    (exceto as de `keep`). Retorna os bytes liberados; após `defer`, nada é removido.
+    """
+    if _deferred is not None:
+        return 0
+    groups = usage(tracks_dir)
+    total  = sum(size for size, _ in groups.values())
+    freed, removed = 0, 0
+    for group, (size, _) in sorted(groups.items(), key=lambda g: g[1][1]):
+        if total - freed <= max_bytes:
+            break
+        if group in keep:
+            continue
+        for path in glob.glob(f"{glob.escape(tracks_dir)}/{glob.escape(group)}.*"):
+            _remove(path)
+        freed   += size
+        removed += 1
+    if removed:
+        record(tracks_dir, evictions=removed, evicted_bytes=freed)
+    return freed
+
+
+def load_metrics(tracks_dir: str = TRACKS_DIR) -> Dict[str, int]:
+    try:
+        with open(f"{tracks_dir}/metrics.json", "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record(tracks_dir: str = TRACKS_DIR, **counts: int):
+    """
+    Soma `counts` às métricas do cache (entre processos, a última escrita
+    vence; por isso workers de pool usam `defer`).
+    """
+    with _metrics_lock:
+        if _deferred is not None:
+            for key, value in counts.items():
+                _deferred[key] = _deferred.get(key, 0) + int(value)
+            return
+        metrics = load_metrics(tracks_dir)
+        for key, value in counts.items():
+            metrics[key] = metrics.get(key, 0) + int(value)
+        tmp = f"{tracks_dir}/.metrics-{os.getpid()}.json"
+        with open(tmp, "w") as f:
+            json.dump(metrics, f, indent=4)
+        os.replace(tmp, f"{tracks_dir}/metrics.json")
+
+
+def defer():
+    """
+    Worker de pool: `record` só acumula (ver `take_deferred`) e `evict` não
+    remove nada, para que workers não disputem metrics.json nem apaguem os
+    parciais uns dos outros.
+    """
+    global _deferred
+    with _metrics_lock:
+        if _deferred is None:
+            _deferred = {}
+
+
+def take_deferred() -> Dict[str, int]:
+    """
+    Métricas acumuladas desde a última chamada (vazio sem `defer`).
+    """
+    with _metrics_lock:
+        if _deferred is None:
+            return {}
+        counts = dict(_deferred)
+        _deferred.clear()
+        return counts
@@ -1,35 +1,105 @@
 import cv2
+import hashlib
+import os
 import random
+import time
 import numpy as np
-from typing import Tuple
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
-def select_random_frame(video: str) -> np.ndarray:
+UPLOAD_DIR     = ".uploads"
+UPLOAD_CHUNK   = 8 * 1024 * 1024
+# uploads (e miniaturas) sem uso há mais que isso (s) são apagados por prune_uploads
+UPLOAD_MAX_AGE = 24 * 3600
+THUMB_WIDTH    = 1280
+
+
+def store_upload(upload: BinaryIO, upload_dir: str = UPLOAD_DIR, ext: str = ".mp4") -> str:
+    """
+    Copia `upload` para `upload_dir` em blocos de UPLOAD_CHUNK, calculando o
+    SHA-256 no caminho; o arquivo final se chama `<hash><ext>` e, se já
+    existe (mesmo conteúdo enviado antes), a cópia é descartada.
+    """
+    os.makedirs(upload_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp    = f"{upload_dir}/.upload-{os.getpid()}-{id(upload)}{ext}"
+    upload.seek(0)
+    with open(tmp, "wb") as f:
+        while chunk := upload.read(UPLOAD_CHUNK):
+            digest.update(chunk)
+            f.write(chunk)
+
+    path = f"{upload_dir}/{digest.hexdigest()}{ext}"
+    if os.path.exists(path):
+        os.remove(tmp)
+        # reenviado: conta como uso recente para prune_uploads
+        os.utime(path)
+    else:
+        os.replace(tmp, path)
+    return path
+
+
+def prune_uploads(upload_dir: str = UPLOAD_DIR, max_age: float = UPLOAD_MAX_AGE):
+    """
+    Apaga de `upload_dir` os arquivos (vídeos, miniaturas e cópias
+    interrompidas) modificados há mais de `max_age` segundos.
+    """
+    if not os.path.isdir(upload_dir):
+        return
+    limit = time.time() - max_age
+    for entry in os.scandir(upload_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def preview_frame(video: str, thumb_path: Optional[str] = None) -> np.ndarray:
     """
-    Abre o vídeo em `video_path` e retorna um frame aleatório (BGR).
+    Frame de pré-visualização (RGB, até THUMB_WIDTH de largura) de um ponto
+    aleatório do vídeo, salvo em `thumb_path` (padrão: `<video>.jpg`) e lido
+    de lá nas chamadas seguintes.
+
+    O seek é por instante (CAP_PROP_POS_MSEC) e aceita o frame em que o
+    decodificador parar, alinhado ao keyframe; se ele falhar, usa o frame 0.
     """
+    thumb_path = thumb_path or os.path.splitext(video)[0] + ".jpg"
+    if os.path.exists(thumb_path):
+        return cv2.cvtColor(cv2.imread(thumb_path), cv2.COLOR_BGR2RGB)
+
     cap = cv2.VideoCapture(video)
-    
     if not cap.isOpened():
         cap.release()
         raise IOError(f"Não foi possível abrir o vídeo: {video}")
-
+    fps   = cap.get(cv2.CAP_PROP_FPS) or 30.0
     total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 1
-    idx   = random.randint(0, total - 1)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+    ts    = random.uniform(0, (total - 1) / fps)
 
+    cap.set(cv2.CAP_PROP_POS_MSEC, 1e3 * ts)
     ret, frame = cap.read()
+    if not ret:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        ret, frame = cap.read()
     cap.release()
     if not ret:
-        raise ValueError(f"Não conseguiu ler o frame #{idx}")
-    
+        raise ValueError(f"Não conseguiu ler um frame de {video}")
+
+    h, w = frame.shape[:2]
+    if w > THUMB_WIDTH:
+        frame = cv2.resize(frame, (THUMB_WIDTH, int(h * THUMB_WIDTH / w)), interpolation=cv2.INTER_AREA)
+    cv2.imwrite(thumb_path, frame)
     return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
+
 def plot_line_image(
     frame: np.ndarray,
-    points: Tuple[Tuple[float, float], Tuple[float, float]]
+    points: Tuple[Tuple[float, float], Tuple[float, float]],
+    roi: Optional[Tuple[Tuple[float, float], Tuple[float, float]]] = None,
+    zones: Optional[List[Dict[str, Any]]] = None
 ) -> np.ndarray:
     """
-    Desenha a linha definida por `points` em `frame` (BGR) e retorna o resultado em RGB.
+    Desenha a linha definida por `points` (e o retângulo da `roi` e as
+    `zones`, se houver) em `frame` (BGR) e retorna o resultado em RGB.
     """
     h, w = frame.shape[:2]
     def to_px(pt):
@@ -42,7 +112,13 @@ def plot_line_image(
     p2 = to_px(points[1])
 
     annotated = frame.copy()
+    if roi is not None:
+        cv2.rectangle(annotated, to_px(roi[0]), to_px(roi[1]), (255, 255, 0), 2)
     cv2.line(annotated, p1, p2, (0, 255, 0), 2)
+    for zone in zones or []:
+        pts = np.array([to_px(pt) for pt in zone["points"]], dtype=np.int32)
+        cv2.polylines(annotated, [pts], len(pts) > 2, (255, 0, 255), 2)
+        cv2.putText(annotated, str(zone["name"]), tuple(pts[0].tolist()), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 255), 2)
 
     return annotated
 
@@ -50,6 +126,10 @@ infos : dict[str, str] = {
     "iou" : "Limiar de Intersecção sobre União (IoU) para Supressão Não Máxima (NMS). Valores mais baixos resultam em menos detecções através da eliminação de caixas sobrepostas, útil para reduzir duplicados.",
     "conf" : "Define o limite mínimo de confiança para as detecções. Os objectos detectados com confiança inferior a este limite serão ignorados. O ajuste deste valor pode ajudar a reduzir os falsos positivos.",
     "botsort": "BoT-SORT (Biblioteca de Rastreamento de Objetos) é um tracker que combina detecção, rastreamento e re-identificação. Oferece melhor precisão e é mais robusto em cenas complexas, especialmente com oclusões.",
+    "output_mode": "Completo codifica todos os frames anotados. Prévia grava em resolução e frames/s reduzidos. Eventos grava só os trechos em que veículos cruzam a linha. Sobreposição não codifica vídeo: mantém o original e desenha as caixas no navegador (mais rápido).",
+    "zones": "Linhas (2 pontos) e polígonos (3 ou mais pontos) nomeados, contados na mesma passada que a linha principal. Pontos normalizados (0-1) ou em pixels. Cada zona tem suas próprias estatísticas na página de resultados.",
+    "roi": "Envia ao modelo apenas o recorte da imagem em volta da linha, reduzindo o custo de inferência. Veículos fora da região não são detectados nem contados.",
+    "profile": "Mede o tempo de cada etapa (decodificação, inferência, tracker, contagem, desenho, codificação), contadores e pico de memória, exibidos na página de resultados. Etapas + cProfile também grava o perfil completo das funções (mais lento).",
     "bytetrack": "ByteTrack é um tracker mais leve e eficiente que mantém bom desempenho mesmo com baixa confiança de detecção. É mais rápido que o BoT-SORT mas pode ser menos preciso em cenários complexos."
 }
 
@@ -0,0 +1,271 @@
+"""
+Contagem em várias zonas nomeadas na mesma passada pelo vídeo.
+
+Cada zona é {"name": ..., "points": [...]}, com pontos normalizados (0-1) ou
+em px como a linha principal: dois pontos formam uma linha (segmento), três
+ou mais um polígono. Um track está "na zona" quando seu centróide está na
+faixa de `threshold` px do segmento (ou troca de lado dele, com reach > 0)
+ou dentro do polígono; como na linha principal, a primeira vez que um id
+entra em uma zona marca a passagem (1 no verde, -1 no vermelho).
+
+Os testes são vetorizados (centróides x zonas) e filtrados por uma grade:
+cada célula de `cell` px guarda, por zona, se está fora, dentro (polígono
+que cobre a célula inteira) ou na borda. Só pares na borda fazem o teste
+exato, logo o custo por frame depende de quantos veículos estão perto das
+bordas, não do total de zonas e veículos.
+"""
+import cv2
+import numpy as np
+from typing import Any, Dict, Sequence, Tuple
+
+OUTSIDE, BORDER, INSIDE = 0, 1, 2
+
+ZONE_COLOR = (255, 255, 0)
+
+
+def to_px(points, W: int, H: int) -> np.ndarray:
+    """
+    Pontos normalizados (0-1) ou em px -> array (n, 2) em px.
+    """
+    return np.array([
+        (int(x*W) if 0 <= x <= 1 else int(x), int(y*H) if 0 <= y <= 1 else int(y))
+        for x, y in points
+    ], dtype=np.float64)
+
+
+def _segments_hit_boxes(seg: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """
+    Se cada segmento (E, 4: x1,y1,x2,y2) toca cada retângulo (C, 4:
+    x0,y0,x1,y1), por recorte de Liang-Barsky. Retorna (C, E).
+    """
+    x1, y1 = seg[None,:,0], seg[None,:,1]
+    dx, dy = seg[None,:,2] - x1, seg[None,:,3] - y1
+    x0, y0 = boxes[:,0,None], boxes[:,1,None]
+    xm, ym = boxes[:,2,None], boxes[:,3,None]
+    t0  = np.zeros((len(boxes), len(seg)))
+    t1  = np.ones((len(boxes), len(seg)))
+    hit = np.ones((len(boxes), len(seg)), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, x1 - x0), (dx, xm - x1), (-dy, y1 - y0), (dy, ym - y1)):
+            p, q = np.broadcast_to(p, t0.shape), np.broadcast_to(q, t0.shape)
+            hit &= ~((p == 0) & (q < 0))
+            r   = q / p
+            t0  = np.where(p < 0, np.maximum(t0, r), t0)
+            t1  = np.where(p > 0, np.minimum(t1, r), t1)
+    return hit & (t0 <= t1)
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, poly: np.ndarray) -> np.ndarray:
+    """
+    Ray casting vetorizado: se cada ponto (x[i], y[i]) está dentro de `poly` (E, 2).
+    """
+    x1, y1 = poly[:,0], poly[:,1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    x, y   = x[:,None], y[:,None]
+    cross  = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xint = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return (cross & (x < xint)).sum(axis=1) % 2 == 1
+
+
+class ZoneGrid:
+    """
+    Índice espacial: codes[gy, gx, z] em OUTSIDE/BORDER/INSIDE. Para linhas
+    a borda é a faixa de `margin` px em volta do segmento.
+    """
+    def __init__(self, shapes: Sequence[np.ndarray], W: int, H: int, cell: int = 32, margin: float = 5.0):
+        self.cell = cell
+        gw, gh    = -(-W // cell), -(-H // cell)
+        gx, gy    = np.meshgrid(np.arange(gw) * cell, np.arange(gh) * cell)
+        boxes     = np.stack([gx.ravel(), gy.ravel(), gx.ravel() + cell, gy.ravel() + cell], axis=1).astype(np.float64)
+
+        codes = np.zeros((len(boxes), len(shapes)), dtype=np.uint8)
+        for z, pts in enumerate(shapes):
+            if len(pts) == 2:
+                grown = boxes + np.array([-margin, -margin, margin, margin])
+                codes[_segments_hit_boxes(pts.reshape(1, 4), grown)[:,0], z] = BORDER
+                continue
+            edges  = np.concatenate([pts, np.roll(pts, -1, axis=0)], axis=1)
+            border = _segments_hit_boxes(edges, boxes).any(axis=1)
+            # sem aresta cruzando a célula, ela está toda dentro ou toda fora
+            inside = points_in_polygon(boxes[:,0] + cell/2, boxes[:,1] + cell/2, pts)
+            codes[inside, z] = INSIDE
+            codes[border, z] = BORDER
+        self.codes = codes.reshape(gh, gw, len(shapes))
+
+    def lookup(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """
+        Códigos (n, zonas) das células dos pontos; pontos fora do frame ficam na borda mais próxima.
+        """
+        gy = np.clip(cy // self.cell, 0, self.codes.shape[0] - 1).astype(np.int64)
+        gx = np.clip(cx // self.cell, 0, self.codes.shape[1] - 1).astype(np.int64)
+        return self.codes[gy, gx]
+
+
+class ZoneCounter:
+    """
+    Estado de passagem por (id, zona) e contagem vetorizada de um frame.
+      threshold: meia largura (px) da faixa das linhas
+      reach: px que um veículo pode andar entre duas observações (frames
+             pulados); > 0 também conta troca de lado da linha
+      cell: lado (px) das células da grade
+    """
+    def __init__(self, zones: Sequence[Dict[str, Any]], W: int, H: int, threshold: float = 5.0,
+                 reach: float = 0.0, cell: int = 32, capacity: int = 1024):
+        self.names     = [str(z['name']) for z in zones]
+        self.shapes    = [to_px(z['points'], W, H) for z in zones]
+        self.is_line   = np.array([len(pts) == 2 for pts in self.shapes])
+        self.threshold = threshold
+        self.reach     = reach
+        # folga da grade cobre a faixa inteira, inclusive além das pontas do segmento
+        self.grid      = ZoneGrid(self.shapes, W, H, cell, 2*threshold + reach)
+
+        # parâmetros por zona para testar todos os pares da borda de uma vez:
+        # segmentos (x1, y1, dx, dy, comprimento) e arestas dos polígonos,
+        # completadas com nan (nunca cruzam o raio) até o maior polígono
+        n = len(self.shapes)
+        self._seg   = np.zeros((n, 5))
+        self._edges = np.full((n, max([len(pts) for pts in self.shapes] + [1]), 4), np.nan)
+        for z, pts in enumerate(self.shapes):
+            if len(pts) == 2:
+                (x1, y1), (x2, y2) = pts
+                self._seg[z] = (x1, y1, x2 - x1, y2 - y1, np.hypot(x2 - x1, y2 - y1))
+            else:
+                self._edges[z, :len(pts)] = np.concatenate([pts, np.roll(pts, -1, axis=0)], axis=1)
+
+        self.state   = np.zeros((capacity, n), dtype=np.int8)
+        self.seen    = np.zeros((capacity, n), dtype=bool)
+        self.dist    = np.full((capacity, n), np.nan, dtype=np.float32)
+        self.n_seen  = np.zeros(n, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _ensure(self, max_id: int):
+        size = len(self.state)
+        if max_id < size:
+            return
+        while size <= max_id:
+            size *= 2
+        for name, fill in (('state', 0), ('seen', False), ('dist', np.nan)):
+            old = getattr(self, name)
+            new = np.full((size, old.shape[1]), fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _line_hits(self, p: np.ndarray, z: np.ndarray, cx: np.ndarray, cy: np.ndarray,
+                   ids: np.ndarray) -> np.ndarray:
+        """
+        Pares (ponto p[i], linha z[i]) na faixa do segmento.
+        """
+        x1, y1, dx, dy, length = self._seg[z].T
+        px, py = cx[p] - x1, cy[p] - y1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist  = (dx*py - dy*px) / length
+            along = (dx*px + dy*py) / length
+        within = (length > 0) & (along >= -self.threshold) & (along <= length + self.threshold)
+        hit    = within & (np.abs(dist) < self.threshold)
+        if self.reach > 0:
+            # troca de lado só vale entre observações a até threshold+reach px
+            # do segmento (nan na anterior nunca satisfaz), com ou sem a grade
+            band = within & (np.abs(dist) <= self.threshold + self.reach)
+            hit |= band & (self.dist[ids[p], z] * dist < 0)
+            self.dist[ids[p], z] = np.where(band, dist, np.nan)
+        return hit
+
+    def _polygon_hits(self, p: np.ndarray, z: np.ndarray, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """
+        Pares (ponto p[i], polígono z[i]) com o ponto dentro (ray casting).
+        """
+        e      = self._edges[z]
+        x1, y1 = e[:,:,0], e[:,:,1]
+        x2, y2 = e[:,:,2], e[:,:,3]
+        x, y   = cx[p,None], cy[p,None]
+        cross  = (y1 > y) != (y2 > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xint = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        return (cross & (x < xint)).sum(axis=1) % 2 == 1
+
+    def update(self, cx: np.ndarray, cy: np.ndarray, ids: np.ndarray,
+               light: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Atualiza o estado com os centróides de um frame.
+        Retorna:
+          inside: (n, zonas) se cada track está em cada zona,
+          passes: (n, zonas) estado de passagem após o frame,
+          inc_green, inc_red: (zonas,) novas passagens por zona
+        """
+        n, Z   = len(ids), len(self.names)
+        inc_g  = np.zeros(Z, dtype=np.int64)
+        inc_r  = np.zeros(Z, dtype=np.int64)
+        if not n or not Z:
+            empty = np.zeros((n, Z), dtype=bool)
+            return empty, np.zeros((n, Z), dtype=np.int8), inc_g, inc_r
+
+        self._ensure(int(ids.max()))
+        codes  = self.grid.lookup(cx, cy)
+        inside = codes == INSIDE
+        if self.reach > 0:
+            # longe da linha: a próxima observação não pode contar troca de lado
+            r, c = np.nonzero((codes == OUTSIDE) & self.is_line)
+            self.dist[ids[r], c] = np.nan
+        # teste exato só dos pares (ponto, zona) na borda, todos de uma vez
+        p, z = np.nonzero(codes == BORDER)
+        if len(p):
+            line = self.is_line[z]
+            hit  = np.empty(len(p), dtype=bool)
+            hit[line]  = self._line_hits(p[line], z[line], cx, cy, ids)
+            hit[~line] = self._polygon_hits(p[~line], z[~line], cx, cy)
+            inside[p, z] = hit
+
+        p, z = np.nonzero(inside)
+        if len(p):
+            # ids repetidos no mesmo frame contam uma única vez
+            key    = np.unique(ids[p].astype(np.int64) * Z + z)
+            pid, pz = key // Z, key % Z
+            new    = ~self.seen[pid, pz]
+            self.seen[pid[new], pz[new]] = True
+            self.n_seen += np.bincount(pz[new], minlength=Z)
+            first  = self.state[pid, pz] == 0
+            if first.any():
+                self.state[pid[first], pz[first]] = 1 if light == 'green' else -1
+                (inc_g if light == 'green' else inc_r)[:] = np.bincount(pz[first], minlength=Z)
+
+        return inside, self.state[ids], inc_g, inc_r
+
+    def draw(self, frame: np.ndarray):
+        for name, pts in zip(self.names, self.shapes):
+            pts = pts.astype(np.int32)
+            cv2.polylines(frame, [pts], len(pts) > 2, ZONE_COLOR, 2)
+            cv2.putText(frame, name, tuple(pts[0]), cv2.FONT_HERSHEY_SIMPLEX, 0.6, ZONE_COLOR, 2)
+
+
+def zone_rows(inside: np.ndarray, passes: np.ndarray, ts: float,
+              ids: np.ndarray, cx: np.ndarray, cy: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Registros (colunas de detecção + zone) dos tracks em alguma zona neste frame.
+    """
+    p, z = np.nonzero(inside)
+    return {
+        'time': np.full(len(p), ts),
+        'id': ids[p],
+        'x1': cx[p],
+        'y1': cy[p],
+        'pass': passes[p, z],
+        'zone': z,
+    }
+
+
+def count_zones(counter: ZoneCounter, accs: Sequence[Any], ts: float, ids: np.ndarray,
+                cx: np.ndarray, cy: np.ndarray, light: str) -> Dict[str, np.ndarray]:
+    """
+    Contagem de um frame em todas as zonas: atualiza `counter` e as
+    estatísticas de cada zona (`accs`, StatsAccumulator por zona) e retorna
+    os registros de zone_rows.
+    """
+    inside, passes, inc_g, inc_r = counter.update(cx, cy, ids, light)
+    rows     = zone_rows(inside, passes, ts, ids, cx, cy)
+    per_zone = np.bincount(rows['zone'], minlength=len(counter))
+    for z in np.flatnonzero(per_zone):
+        accs[z].update(ts, per_zone[z], counter.n_seen[z], inc_g[z], inc_r[z])
+    return rows
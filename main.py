@@ -5,12 +5,22 @@ import shutil
 os.makedirs(".videos", exist_ok=True)
 os.makedirs(".temp", exist_ok=True)
 
+from lib import utils
+
+# uploads ficam entre os reruns (lib.utils.store_upload); só os abandonados saem
+utils.prune_uploads()
+
 try:
     import streamlit as st
 
     st.set_page_config(layout="wide")
 
     from app.show_results import show_results
+    from app.utils import load_counter
+    from lib import results
+
+    # carrega e aquece o modelo uma única vez ao subir o servidor
+    load_counter()
 
     pages = {
         "New Process" : [
@@ -20,8 +30,8 @@ try:
             st.Page(lambda : show_results("", path="example"), title="Exemplo", icon="📊", url_path=f"result_example")
         ], 
         "Results" : [
-            st.Page(lambda : show_results(entry.name), title=entry.name, icon="📊", url_path=f"result_{entry.name}")
-            for entry in os.scandir(".videos") if entry.is_dir()
+            st.Page(lambda result_id=result_id: show_results(result_id), title=result_id, icon="📊", url_path=f"result_{result_id}")
+            for result_id in results.load_catalog(".videos")
         ],
 
     }
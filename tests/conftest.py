@@ -0,0 +1,15 @@
+import pytest
+from benchmarks.synthetic import TrafficScene
+
+
+@pytest.fixture(scope='session')
+def scene() -> TrafficScene:
+    """
+    Clipe sintético de 15 s (com verde e vermelho) e seu gabarito.
+    """
+    return TrafficScene(seconds=15)
+
+
+@pytest.fixture(scope='session')
+def clip(scene, tmp_path_factory) -> str:
+    return scene.render(str(tmp_path_factory.mktemp('clips') / 'clip.mp4'))
@@ -0,0 +1,79 @@
+"""
+Export int8 do backend onnx: o arquivo quantizado mantém os metadados do
+ultralytics (names, stride, imgsz) e só é gravado depois de carregar com o YOLO.
+"""
+import os
+import numpy as np
+import pytest
+from lib import backends
+
+onnx = pytest.importorskip('onnx')
+quantization = pytest.importorskip('onnxruntime.quantization')
+
+METADATA = {'names': "{0: 'person', 2: 'car'}", 'stride': '32', 'imgsz': '[640, 640]', 'task': 'detect'}
+
+
+def fake_export(path: str, metadata=METADATA):
+    # como o export do ultralytics: um grafo com pesos e os metadata_props
+    from onnx import TensorProto, helper, numpy_helper
+    weight = numpy_helper.from_array(np.random.default_rng(0).random((64, 64), dtype=np.float32), 'W')
+    graph  = helper.make_graph([helper.make_node('MatMul', ['x', 'W'], ['y'])], 'g',
+                               [helper.make_tensor_value_info('x', TensorProto.FLOAT, [1, 64])],
+                               [helper.make_tensor_value_info('y', TensorProto.FLOAT, [1, 64])], [weight])
+    model  = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    for key, value in metadata.items():
+        model.metadata_props.add(key=key, value=value)
+    onnx.save(model, path)
+
+
+class LoadingYOLO:
+    """
+    Como o AutoBackend do ultralytics: lê os metadados ao carregar o .onnx.
+    """
+    loaded: list = []
+
+    def __init__(self, path, task=None):
+        self.names = eval(self.meta(path)['names'])
+        LoadingYOLO.loaded.append(path)
+
+    @staticmethod
+    def meta(path):
+        return {p.key: p.value for p in onnx.load(path).metadata_props}
+
+    def predict(self, img, **kwargs):
+        return []
+
+
+@pytest.fixture
+def weights(tmp_path, monkeypatch):
+    monkeypatch.setattr(backends, 'YOLO', LoadingYOLO)
+    LoadingYOLO.loaded = []
+    path = str(tmp_path / 'yolo.pt')
+    fake_export(backends.artifact_path(path, 'onnx', 'fp32'))
+    return path
+
+
+def test_int8_keeps_ultralytics_metadata(weights, monkeypatch):
+    # quantização que perde os metadata_props (como versões antigas do onnxruntime)
+    quantize = quantization.quantize_dynamic
+    def stripping(source, target, **kwargs):
+        quantize(source, target, **kwargs)
+        model = onnx.load(target)
+        del model.metadata_props[:]
+        onnx.save(model, target)
+    monkeypatch.setattr(quantization, 'quantize_dynamic', stripping)
+
+    target = backends.export(weights, 'onnx', 'int8', imgsz=64)
+    assert target == backends.artifact_path(weights, 'onnx', 'int8')
+    meta = LoadingYOLO.meta(target)
+    assert {k: meta[k] for k in METADATA} == METADATA
+    # carregado (e rodado) antes de virar o artefato
+    assert len(LoadingYOLO.loaded) == 1 and LoadingYOLO.loaded[0].endswith('.partial.onnx')
+    assert any(n.op_type.startswith('MatMulInteger') or 'Quant' in n.op_type for n in onnx.load(target).graph.node)
+
+
+def test_int8_refuses_export_without_metadata(weights):
+    fake_export(backends.artifact_path(weights, 'onnx', 'fp32'), metadata={'task': 'detect'})
+    with pytest.raises(ValueError, match='names'):
+        backends.export(weights, 'onnx', 'int8', imgsz=64)
+    assert sorted(os.listdir(os.path.dirname(weights))) == ['yolo_fp32.onnx']
@@ -0,0 +1,48 @@
+"""
+Blocos de lib.chunked: cada bloco começa exatamente no frame pedido, mesmo
+quando o seek do OpenCV para antes ou depois dele.
+"""
+import cv2
+import pytest
+from benchmarks.synthetic import StubDetector
+from lib import chunked
+from lib.car_counter import CarCounter
+
+BOX_COLUMNS = ['frame', 'x1', 'y1', 'x2', 'y2']
+
+
+class OffsetSeek:
+    """
+    VideoCapture com seek impreciso: para `offset` frames depois do pedido
+    (antes, se negativo).
+    """
+    def __init__(self, path: str, offset: int):
+        self.cap    = cv2.VideoCapture(path)
+        self.offset = offset
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES and value:
+            value += self.offset
+        return self.cap.set(prop, value)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def boxes(tracks):
+    return tracks[BOX_COLUMNS].sort_values(BOX_COLUMNS).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('offset', [0, -3, 2])
+def test_chunk_starts_at_the_requested_frame(scene, clip, monkeypatch, offset):
+    cc = CarCounter(model=StubDetector())
+    full, _, _ = cc.track_frames(clip, 0, 250)
+
+    monkeypatch.setattr(CarCounter, '_open_video', lambda self, path: OffsetSeek(path, offset))
+    job  = {'video': clip, 'warmup': 130, 'start': 150, 'end': 250,
+            'config': {'conf': 0.25, 'iou': 0.45, 'tracker_model': 'bytetrack'}}
+    part = chunked.track_chunk(cc, job)
+
+    assert part['start'] == 150 and part['fps'] == scene.fps
+    assert part['tracks']['frame'].min() == 130
+    assert boxes(part['tracks']).equals(boxes(full[full['frame'] >= 130]))
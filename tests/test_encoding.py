@@ -0,0 +1,30 @@
+"""
+lib.encoding.OverlayOutput: boxes gravadas em row groups de
+OVERLAY_ROW_GROUP linhas durante o processamento, sem acumular o vídeo todo.
+"""
+import numpy as np
+import pyarrow.parquet as pq # type:ignore
+from lib import encoding
+
+
+def test_overlay_streams_row_groups(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoding, 'OVERLAY_ROW_GROUP', 100)
+    source = tmp_path / 'source.mp4'
+    source.write_bytes(b'video')
+    output = str(tmp_path / 'video.mp4')
+
+    out, rng, frames = encoding.OverlayOutput(output, str(source)), np.random.default_rng(0), []
+    for idx in range(60):
+        n     = int(rng.integers(0, 12))
+        boxes = rng.uniform(0, 500, (n, 4)).astype(np.float32)
+        ids   = np.arange(n) + idx
+        out.write(idx, None, (boxes, ids, np.zeros(n, np.int8)), False)
+        frames += [idx] * n
+        assert out.pending < 100
+    out.release()
+
+    pf = pq.ParquetFile(encoding.overlay_path(output))
+    sizes = [pf.metadata.row_group(i).num_rows for i in range(pf.metadata.num_row_groups)]
+    assert sizes[:-1] == [100] * (len(sizes) - 1) and 0 < sizes[-1] <= 100
+    assert pf.read()['frame'].to_pylist() == frames
+    assert (tmp_path / 'video.mp4').read_bytes() == b'video'
@@ -0,0 +1,49 @@
+"""
+lib.jobs.JobQueue: o vídeo enfileirado é um hard link do upload, a cópia da
+fila é apagada quando o job falha e um erro fora de um job (ex.: em _claim)
+não derruba a thread do worker.
+"""
+import os
+import time
+from lib import jobs
+
+
+def wait_for(cond, timeout=10.0):
+    t0 = time.time()
+    while not cond():
+        assert time.time() - t0 < timeout
+        time.sleep(0.05)
+
+
+def test_submit_links_and_failed_job_cleans_up(tmp_path, monkeypatch):
+    video = tmp_path / 'upload.mp4'
+    video.write_bytes(b'video')
+    q = jobs.JobQueue(jobs_dir=str(tmp_path / 'jobs'), results_dir=str(tmp_path / 'results'))
+
+    claims = iter([RuntimeError('database is locked')])
+    claim  = q._claim
+    def flaky_claim():
+        err = next(claims, None)
+        if err is not None:
+            raise err
+        return claim()
+
+    def fail(cc, job):
+        raise ValueError('vídeo inválido')
+
+    monkeypatch.setattr(jobs, 'CarCounter', lambda **kwargs: object())
+    monkeypatch.setattr(q, '_claim', flaky_claim)
+    monkeypatch.setattr(q, '_run', fail)
+
+    job_id = q.submit(str(video), '01 upload', {})
+    stored = q.get(job_id)['video']
+    assert os.path.samefile(stored, video)
+
+    q.start()
+    try:
+        wait_for(lambda: q.get(job_id)['status'] == 'failed')
+    finally:
+        q.stop()
+    assert 'vídeo inválido' in q.get(job_id)['error']
+    assert not os.path.exists(stored)
+    assert video.read_bytes() == b'video'
@@ -0,0 +1,140 @@
+"""
+Memória de CarCounter.process limitada com as detecções em Parquet: o pico
+(tracemalloc, que também vê os arrays NumPy) não cresce com o número de
+detecções; e a API de antes continua valendo: o ProcessResult se desempacota
+em (df, stats, output) e as opções podem ser passadas por nome.
+
+Autocontido: o vídeo é um clipe em branco e as detecções vêm de DenseDetector,
+sem depender do conteúdo dos frames.
+"""
+import functools
+import tracemalloc
+import cv2
+import numpy as np
+import pandas as pd # type:ignore
+import pytest
+from pandas.testing import assert_frame_equal # type:ignore
+from types import SimpleNamespace
+from lib import car_counter
+from lib.car_counter import CarCounter, DETECTION_COLUMNS, ProcessOptions
+from lib.sink import DetectionSink
+
+SIZE = (320, 180)
+FPS  = 30
+# linha horizontal no meio do frame
+POINTS = ((0.0, 0.5), (1.0, 0.5))
+# bytes por detecção nos tipos compactos (time, id, x1, y1, pass)
+ROW_BYTES = 4 + 4 + 4 + 4 + 1
+
+
+class _Array:
+    def __init__(self, a: np.ndarray):
+        self.a = a
+
+    def cpu(self):
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.a
+
+
+class DenseDetector:
+    """
+    `lanes` carros por frame descendo o frame inteiro em `life` frames (cada
+    um cruza a linha do meio uma vez), com ids novos a cada volta. Conta os
+    frames vistos desde o último reset do tracker, como o model.track.
+    """
+    def __init__(self, lanes: int = 100, life: int = 30):
+        self.lanes     = lanes
+        self.life      = life
+        self.predictor = SimpleNamespace(trackers=[self])
+        self.frame     = 0
+
+    def reset(self):
+        self.frame = 0
+
+    def track(self, source: np.ndarray, **kwargs):
+        H, W = source.shape[:2]
+        lane = np.arange(self.lanes)
+        age  = (self.frame + lane) % self.life
+        ids  = (self.frame + lane) // self.life * self.lanes + lane + 1
+        x1   = (lane * W / self.lanes).astype(np.float32)
+        y1   = (age * H / self.life).astype(np.float32)
+        xyxy = np.stack([x1, y1, x1 + 2, y1 + 4], axis=1)
+        self.frame += 1
+        boxes = SimpleNamespace(xyxy=_Array(xyxy), id=_Array(ids), cls=_Array(np.full(self.lanes, 2)),
+                                conf=_Array(np.ones(self.lanes, dtype=np.float32)))
+        return [SimpleNamespace(boxes=boxes, orig_img=source)]
+
+
+def blank_clip(path: str, seconds: float) -> str:
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, SIZE) # type:ignore
+    frame  = np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    for _ in range(int(seconds * FPS)):
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture(scope='module')
+def clips(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('blank')
+    return [blank_clip(str(tmp / f'{seconds}s.mp4'), seconds) for seconds in (2, 8)]
+
+
+def peak(cc, clip, detections_path):
+    tracemalloc.start()
+    try:
+        result = cc.process(clip, POINTS, output=None, detections_path=detections_path)
+        return result.sink.rows, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_peak_memory_does_not_grow_with_detections(clips, tmp_path, monkeypatch):
+    # blocos pequenos para o clipe curto já gravar vários row groups
+    monkeypatch.setattr(car_counter, 'DetectionSink', functools.partial(DetectionSink, chunk_rows=1024))
+    cc = CarCounter(model=DenseDetector())
+    short, long = clips
+    # aquecimento: caches e imports do primeiro process fora da medida
+    peak(cc, short, str(tmp_path / 'warmup.parquet'))
+
+    rows_s, peak_s = peak(cc, short, str(tmp_path / 'short.parquet'))
+    rows_l, peak_l = peak(cc, long, str(tmp_path / 'long.parquet'))
+    extra = (rows_l - rows_s) * ROW_BYTES
+    assert rows_l > 3 * rows_s
+    assert peak_l - peak_s < extra / 4
+
+    # a medida enxerga o acúmulo: sem Parquet os blocos ficam em memória
+    _, mem_s = peak(cc, short, None)
+    _, mem_l = peak(cc, long, None)
+    assert mem_l - mem_s > extra / 2
+
+
+def test_process_result_unpacks_like_before(clips, tmp_path):
+    output = str(tmp_path / 'out.mp4')
+    result = CarCounter(model=DenseDetector(lanes=8)).process(
+        clips[0], POINTS, output=output, detections_path=str(tmp_path / 'detections.parquet'))
+    df, stats, out = result
+
+    assert out == result.output == output
+    assert df is result.detections and stats is result.stats
+    assert list(df.columns) == DETECTION_COLUMNS
+    assert (df['pass'] != 0).any()
+    assert_frame_equal(df, pd.read_parquet(result.detections_path))
+    # as estatísticas incrementais são as de antes, calculadas do DataFrame completo
+    assert_frame_equal(stats, CarCounter.compute_stats_from_detections(df), check_dtype=False)
+    assert len(stats) == df['time'].nunique()
+
+
+def test_options_object_and_keywords_agree(clips):
+    cc   = CarCounter(model=DenseDetector(lanes=8))
+    opts = ProcessOptions(green_duration=3, red_duration=2, stride=2)
+    by_options  = cc.process(clips[0], POINTS, output=None, options=opts)
+    by_keywords = cc.process(clips[0], POINTS, output=None, green_duration=3, red_duration=2, stride=2)
+    assert_frame_equal(by_options.stats, by_keywords.stats)
+    # palavras-chave sobrescrevem o objeto, que não é alterado
+    overridden = cc.process(clips[0], POINTS, output=None, options=opts, stride=1)
+    assert opts.stride == 2 and len(overridden.stats) > len(by_options.stats)
+    with pytest.raises(TypeError):
+        cc.process(clips[0], POINTS, output=None, strid=2)
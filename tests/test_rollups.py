@@ -0,0 +1,32 @@
+"""
+Níveis de lib.rollups, inclusive com o semáforo zerado (ciclo de 0 s).
+"""
+import warnings
+import numpy as np
+import pandas as pd # type:ignore
+from lib.rollups import build_rollups, for_bars
+
+
+def stats(seconds: int, fps: float = 30.0) -> pd.DataFrame:
+    n     = int(seconds * fps)
+    green = (np.arange(n) % 45 == 0).astype(np.int64)
+    return pd.DataFrame({
+        'time': np.arange(n) / fps, 'detected': np.full(n, 3), 'detected_total': np.arange(n) // 10,
+        'green': green, 'green_total': np.cumsum(green), 'red': np.zeros(n, dtype=np.int64),
+        'red_total': np.zeros(n, dtype=np.int64), 'passed': green, 'passed_total': np.cumsum(green),
+    })
+
+
+def test_cycle_level():
+    levels = build_rollups(stats(120), cycle=40)
+    assert list(levels['cycle']['time']) == [0.0, 40.0, 80.0]
+    assert levels['cycle']['passed'].sum() == levels['second']['passed'].sum()
+
+
+def test_zero_cycle_has_no_cycle_level():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        levels = build_rollups(stats(1200), cycle=0)
+    assert 'cycle' not in levels
+    bars, label = for_bars(stats(1200), levels)
+    assert label == 'Minuto' and len(bars) == 20
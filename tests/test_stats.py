@@ -0,0 +1,74 @@
+"""
+CarCounter.compute_stats_from_detections: o exemplo versionado e vários
+carros no mesmo instante (detecções e passagens), conferidos contra uma
+contagem direta, instante a instante, como na versão original.
+"""
+import numpy as np
+import pandas as pd # type:ignore
+import pytest
+from pandas.testing import assert_frame_equal # type:ignore
+from lib.car_counter import CarCounter, STATS_COLUMNS
+
+
+def reference_stats(df: pd.DataFrame) -> pd.DataFrame:
+    # primeira aparição e primeira passagem (≠0) de cada id, somadas instante a instante
+    first_seen, first_pass = {}, {}
+    for t, tid, p in sorted(zip(df['time'], df['id'], df['pass'])):
+        first_seen.setdefault(tid, t)
+        if p != 0:
+            first_pass.setdefault(tid, (t, p))
+    rows, seen, cum = [], 0, {1: 0, -1: 0}
+    for t in sorted(set(df['time'])):
+        seen += sum(1 for s in first_seen.values() if s == t)
+        inc   = {side: sum(1 for ft, p in first_pass.values() if ft == t and p == side) for side in (1, -1)}
+        cum   = {side: cum[side] + inc[side] for side in (1, -1)}
+        rows.append((t, int((df['time'] == t).sum()), seen, inc[1], cum[1], inc[-1], cum[-1],
+                     inc[1] + inc[-1], cum[1] + cum[-1]))
+    return pd.DataFrame(rows, columns=STATS_COLUMNS)
+
+
+@pytest.fixture
+def random_detections() -> pd.DataFrame:
+    """
+    ~2000 tracks de vida curta sobrepostos em 600 frames, cada um podendo
+    passar (verde ou vermelho) uma ou mais vezes.
+    """
+    rng   = np.random.default_rng(0)
+    start = rng.integers(0, 600, 2000)
+    life  = rng.integers(1, 60, 2000)
+    ids   = np.repeat(np.arange(1, 2001), life)
+    frame = np.concatenate([np.arange(s, s + n) for s, n in zip(start, life)])
+    passes = np.where(rng.random(len(ids)) < 0.05, rng.choice([1, -1], len(ids)), 0)
+    return pd.DataFrame({'time': frame / 30.0, 'id': ids, 'x1': 0, 'y1': 0, 'pass': passes})
+
+
+def test_reproduces_example_stats():
+    det = pd.read_csv('.example/detections.csv')
+    assert_frame_equal(CarCounter.compute_stats_from_detections(det), pd.read_csv('.example/stats.csv'))
+
+
+def test_detections_sharing_a_timestamp():
+    # (time, id, pass); fora de ordem, como pode vir de blocos concatenados
+    rows = [
+        (1.0, 1, 1),   # segunda passagem do id 1: não conta de novo
+        (0.0, 1, 0), (0.0, 2, 0), (0.0, 3, 0),
+        (0.5, 1, 1), (0.5, 2, 1), (0.5, 3, -1),  # três passagens no mesmo instante
+        (0.5, 4, 0),   # id novo junto com as passagens
+        (1.0, 4, -1), (1.0, 5, 0),
+    ]
+    det = pd.DataFrame(rows, columns=['time', 'id', 'pass']).assign(x1=0, y1=0)
+    expected = pd.DataFrame([
+        # time, detected, detected_total, green, green_total, red, red_total, passed, passed_total
+        (0.0, 3, 3, 0, 0, 0, 0, 0, 0),
+        (0.5, 4, 4, 2, 2, 1, 1, 3, 3),
+        (1.0, 3, 5, 0, 2, 1, 2, 1, 4),
+    ], columns=STATS_COLUMNS).astype({c: 'int64' for c in STATS_COLUMNS[1:]})
+
+    stats = CarCounter.compute_stats_from_detections(det)
+    assert_frame_equal(stats, expected)
+    assert_frame_equal(stats, reference_stats(det), check_dtype=False)
+
+
+def test_matches_reference_count(random_detections):
+    det = random_detections.sample(frac=1.0, random_state=0)
+    assert_frame_equal(CarCounter.compute_stats_from_detections(det), reference_stats(det), check_dtype=False)
@@ -0,0 +1,50 @@
+"""
+Fonte contínua: o TrackState descarta os ids antigos (IdHorizon) e fica do
+tamanho dos ids recentes, contando igual ao estado completo.
+"""
+import numpy as np
+from lib.counting import LineCounter, TrackState
+from lib.streaming import IdHorizon
+
+FPS = 10.0
+
+
+def traffic(frames: int, per_frame: int = 20, life: int = 50):
+    """
+    ~`per_frame` tracks vivos por frame com ids crescentes, cada um descendo
+    por `life` frames e cruzando a linha y=500 no meio da vida.
+    """
+    slot  = np.arange(per_frame)
+    shift = slot * life // per_frame
+    for f in range(frames):
+        ids = ((f + shift) // life) * per_frame + slot + 1
+        age = (f + shift) % life
+        y   = 250 + age * 10.0
+        boxes = np.stack([slot * 40.0, y - 5, slot * 40.0 + 30, y + 5], axis=1)
+        yield f / FPS, boxes, ids, 'green' if (f // 300) % 2 == 0 else 'red'
+
+
+def test_trimmed_state_counts_like_the_full_state():
+    line = LineCounter((0, 500), (1000, 500), sweep=True)
+    full, trimmed, horizon = TrackState(), TrackState(), IdHorizon(seconds=10)
+    totals = np.zeros((2, 2), dtype=int)
+    for ts, boxes, ids, light in traffic(36_000):   # 1 h a 10 fps, ~14 mil ids
+        *_, pf, gf, rf = line.update(boxes, ids, light, full)
+        *_, pt, gt, rt = line.update(boxes, ids, light, trimmed)
+        assert np.array_equal(pf, pt)
+        totals += [[gf, rf], [gt, rt]]
+        trimmed.trim(horizon.update(ts, ids))
+
+    assert (totals[0] == totals[1]).all() and totals[0].sum() > 10_000
+    assert len(full) == len(trimmed)
+    assert len(trimmed.state) <= 1024 < len(full.state)
+
+
+def test_id_seen_again_below_base_is_a_new_track():
+    state = TrackState(capacity=8)
+    state.observe(np.array([1, 2, 3]))
+    state.state[state.slots(np.array([2]))] = 1
+    state.trim(3)
+    assert state.base == 3 and state.to_dict() == {3: 0}
+    assert state.observe(np.array([2, 40])).tolist() == [0, 0]
+    assert state.to_dict() == {2: 0, 3: 0, 40: 0} and len(state) == 5
@@ -0,0 +1,40 @@
+"""
+Um mesmo modelo reutilizado entre execuções (registro compartilhado, fila
+de jobs, workers do lote e dos chunks) tem de contar igual em todas: o
+tracker é zerado no lugar, sem registrar de novo os callbacks do model.track.
+"""
+from benchmarks.synthetic import StubDetector
+from lib.car_counter import CarCounter
+
+
+def run(cc, scene, clip, **kwargs):
+    return cc.process(clip, scene.points, output=None, green_duration=scene.green,
+                      red_duration=scene.red, **kwargs).stats
+
+
+def test_process_twice_on_one_model_counts_the_same(scene, clip):
+    model = StubDetector()
+    cc    = CarCounter(model=model)
+    first, second = run(cc, scene, clip), run(cc, scene, clip)
+
+    assert second.equals(first)
+    assert len(model.callbacks['on_predict_postprocess_end']) == 1
+    # uma atualização do tracker por frame, não uma por execução anterior
+    assert model.predictor.trackers[0].calls == scene.frames
+
+
+def test_counts_match_ground_truth_after_reuse(scene, clip):
+    cc = CarCounter(model=StubDetector())
+    run(cc, scene, clip, stride=3)
+    last = run(cc, scene, clip).iloc[-1]
+    truth = scene.ground_truth()
+    assert {k: int(last[f'{k}_total']) for k in truth} == truth
+
+
+def test_counters_sharing_one_model_count_the_same(scene, clip):
+    # como o registro de modelos: dois CarCounter, o mesmo modelo
+    model = StubDetector()
+    first  = run(CarCounter(model=model), scene, clip)
+    second = run(CarCounter(model=model), scene, clip)
+    assert second.equals(first)
+    assert len(model.callbacks['on_predict_start']) == 1
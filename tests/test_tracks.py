@@ -0,0 +1,87 @@
+"""
+lib.tracks: defer (workers de lib.batch), com métricas acumuladas em memória
+até o processo pai gravá-las e nenhuma remoção no worker; e a saída
+renderizada guardada ao lado da entrada e reaproveitada num acerto.
+"""
+import os
+import pandas as pd # type:ignore
+from pandas.testing import assert_frame_equal # type:ignore
+from benchmarks.synthetic import StubDetector
+from lib import encoding, tracks
+from lib.car_counter import CarCounter
+
+
+def test_deferred_metrics_and_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracks, '_deferred', None)
+    tracks_dir = str(tmp_path)
+    for name in ('a.parquet', 'b.1234.00000.partial'):
+        (tmp_path / name).write_bytes(b'x' * 100)
+
+    tracks.defer()
+    tracks.record(tracks_dir, hits=1)
+    tracks.record(tracks_dir, hits=2, misses=1)
+    assert tracks.evict(tracks_dir, max_bytes=0) == 0
+    assert sorted(os.listdir(tracks_dir)) == ['a.parquet', 'b.1234.00000.partial']
+    assert tracks.load_metrics(tracks_dir) == {}
+    assert tracks.take_deferred() == {'hits': 3, 'misses': 1}
+    assert tracks.take_deferred() == {}
+
+    # processo pai: grava o que os workers devolveram e aplica o limite uma vez
+    monkeypatch.setattr(tracks, '_deferred', None)
+    tracks.record(tracks_dir, hits=3, misses=1)
+    assert tracks.evict(tracks_dir, max_bytes=0) == 200
+    assert tracks.load_metrics(tracks_dir) == {'hits': 3, 'misses': 1, 'evictions': 2, 'evicted_bytes': 200}
+
+
+def test_deferred_commit_keeps_other_runs(tmp_path, monkeypatch):
+    # dois workers com o mesmo vídeo: a primeira entrada publicada não apaga as partes da outra
+    monkeypatch.setattr(tracks, '_deferred', None)
+    tracks.defer()
+    path    = str(tmp_path / 'video-params.parquet')
+    writers = [tracks.TrackWriter(path), tracks.TrackWriter(path)]
+    for writer in writers:
+        writer.append(tracks.empty_frame(0))
+        writer.checkpoint(0, None)
+        writer.append(tracks.empty_frame(1))
+        writer.close()
+
+    tracks.commit(path, writers[0], {'frames': 2})
+    assert all(os.path.exists(part) for part in writers[1].parts)
+    tracks.commit(path, writers[1], {'frames': 2})
+    assert sorted(os.listdir(tmp_path)) == ['video-params.json', 'video-params.parquet']
+    assert tracks.load_tracks(path)[0]['frame'].tolist() == [0, 1]
+
+
+def test_hit_reuses_rendered_video(scene, clip, tmp_path, monkeypatch):
+    tracks_dir = str(tmp_path / 'tracks')
+    cc = CarCounter(model=StubDetector())
+
+    def run(name, points=scene.points, mode='overlay'):
+        output = str(tmp_path / name / 'video.mp4')
+        os.makedirs(os.path.dirname(output))
+        result = cc.process(clip, points, output=output, output_mode=mode, green_duration=scene.green,
+                            red_duration=scene.red, tracks_dir=tracks_dir)
+        return result, output
+
+    first, out1 = run('miss')
+    assert first.info['cache'] == 'miss'
+
+    # mesma linha, semáforo e modo: nada a decodificar nem codificar
+    init_writer = CarCounter._init_writer
+    def no_writer(*args, **kwargs):
+        raise AssertionError('vídeo renderizado de novo')
+    monkeypatch.setattr(CarCounter, '_init_writer', no_writer)
+    second, out2 = run('hit')
+    assert second.info['cache'] == 'hit'
+    assert tracks.load_metrics(tracks_dir)['render_hits'] == 1
+    for a, b in zip(encoding.output_files('overlay', out1), encoding.output_files('overlay', out2)):
+        assert open(a, 'rb').read() == open(b, 'rb').read()
+    assert_frame_equal(second.stats, first.stats)
+
+    # outra linha: os tracks vêm do cache, mas o vídeo é refeito
+    monkeypatch.setattr(CarCounter, '_init_writer', init_writer)
+    (p1x, p1y), (p2x, p2y) = scene.points
+    moved, out3 = run('moved', ((p1x, p1y - 0.1), (p2x, p2y - 0.1)))
+    assert moved.info['cache'] == 'hit'
+    assert tracks.load_metrics(tracks_dir)['render_hits'] == 1
+    assert not pd.read_parquet(encoding.overlay_path(out3)).equals(pd.read_parquet(encoding.overlay_path(out1)))
@@ -0,0 +1,50 @@
+"""
+Uploads gravados uma vez por conteúdo em UPLOAD_DIR, que sobrevive aos
+reruns, e a miniatura de pré-visualização.
+"""
+import io
+import os
+import time
+import cv2
+import numpy as np
+from lib import utils
+
+
+def test_store_upload_once_per_content(tmp_path):
+    data  = os.urandom(3 * 1024)
+    first = utils.store_upload(io.BytesIO(data), str(tmp_path))
+    again = utils.store_upload(io.BytesIO(data), str(tmp_path))
+    assert first == again and open(first, 'rb').read() == data
+    # só o vídeo: a cópia temporária do segundo envio foi descartada
+    assert os.listdir(tmp_path) == [os.path.basename(first)]
+
+
+def test_prune_uploads_keeps_recent_files(tmp_path):
+    recent = utils.store_upload(io.BytesIO(b'recent'), str(tmp_path))
+    old    = utils.store_upload(io.BytesIO(b'old'), str(tmp_path))
+    thumb  = os.path.splitext(old)[0] + '.jpg'
+    open(thumb, 'wb').close()
+    stale  = time.time() - utils.UPLOAD_MAX_AGE - 60
+    for path in (old, thumb):
+        os.utime(path, (stale, stale))
+
+    utils.prune_uploads(str(tmp_path))
+    assert os.listdir(tmp_path) == [os.path.basename(recent)]
+
+
+def test_preview_frame_seeks_into_the_video(scene, clip, tmp_path, monkeypatch):
+    # ponto sorteado: 10 s; o frame pode vir do keyframe anterior, nunca do início
+    monkeypatch.setattr(utils.random, 'uniform', lambda a, b: 10.0)
+    thumb = str(tmp_path / 'thumb.jpg')
+    image = utils.preview_frame(clip, thumb)
+
+    cap, frames = cv2.VideoCapture(clip), []
+    while (frame := cap.read()[1]) is not None:
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    match = int(np.argmin([np.abs(image.astype(int) - f).mean() for f in frames]))
+    assert 5 * scene.fps <= match <= 10 * scene.fps
+
+    # miniatura gravada e reaproveitada, sem sortear nem decodificar de novo
+    monkeypatch.setattr(utils.random, 'uniform', None)
+    assert np.array_equal(utils.preview_frame(clip, thumb), cv2.cvtColor(cv2.imread(thumb), cv2.COLOR_BGR2RGB))